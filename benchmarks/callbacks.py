@@ -0,0 +1,68 @@
+"""Minimal Taipy app used to time callback round trips without a browser.
+Taipy binds page variables from the module that creates the Gui, so the app
+lives at module level here.
+"""
+
+# Import from standard library
+import threading
+
+# Import from 3rd party libraries
+from taipy.gui import Gui, Markdown, invoke_callback
+
+from utils.background import run_in_background
+
+CLIENT_ID = "benchmark"
+
+# Definição de Variável
+valor = 0
+
+# Definição Pagina
+pagina = Markdown("<|{valor}|text|>")
+gui = Gui(page=pagina)
+
+
+def start():
+    """
+    Starts the Gui without a server and renders the page once for a fake
+    client, so its state variables are bound.
+    """
+    gui.run(run_server=False)
+    gui._bindings()._get_or_create_scope(CLIENT_ID)
+    gui.get_flask_app().test_client().get(
+        f"/taipy-jsx/TaiPy_root_page?client_id={CLIENT_ID}"
+    )
+
+
+def definir_valor(state, novo):
+    state.valor = novo
+
+
+def iniciar_tarefa(state, concluida):
+    run_in_background(state, tarefa, concluida)
+
+
+def tarefa(update, concluida):
+    update(concluir_tarefa, concluida)
+
+
+def concluir_tarefa(state, concluida):
+    state.valor += 1
+    concluida.set()
+
+
+def set_state(novo):
+    """
+    One state update through invoke_callback (what every page callback
+    scheduled by utils.background goes through).
+    """
+    invoke_callback(gui, CLIENT_ID, definir_valor, [novo], __name__)
+
+
+def background_round_trip():
+    """
+    Starts a task with run_in_background from a callback and waits until its
+    result is applied back to the session state.
+    """
+    concluida = threading.Event()
+    invoke_callback(gui, CLIENT_ID, iniciar_tarefa, [concluida], __name__)
+    concluida.wait(10)
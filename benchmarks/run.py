@@ -0,0 +1,246 @@
+"""Offline micro-benchmarks of the app hot paths.
+
+Supabase and the LLM providers are replaced by in-memory stubs (see
+benchmarks/stubs.py), so the suite needs no network and no API keys.
+
+Usage, from the repository root:
+    python -m benchmarks.run [--quick] [--output FILE]
+    python -m benchmarks.run --compare baseline.json [--tolerance 0.25]
+
+Results are written as JSON (median/min/mean milliseconds per benchmark).
+With --compare, benchmarks slower than the baseline by more than the
+tolerance are listed and the exit code is 1.
+"""
+
+# Import from standard library
+import argparse
+import itertools
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+from benchmarks import stubs
+
+import utils.config as config
+
+ROWS = (1_000, 10_000, 100_000)
+SLIDES = (10, 100, 1_000)
+QUICK_ROWS = (1_000, 10_000)
+QUICK_SLIDES = (10, 100)
+
+
+def measure(fn, repeat: int = 5, number: int = 1) -> dict:
+    """
+    Runs fn() `number` times per round, `repeat` rounds, after one warm-up
+    call. Returns the per-call times in milliseconds.
+    """
+    fn()
+    rounds = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for _ in range(number):
+            fn()
+        rounds.append((time.perf_counter() - started) * 1000 / number)
+    return {
+        "median_ms": statistics.median(rounds),
+        "min_ms": min(rounds),
+        "mean_ms": statistics.mean(rounds),
+        "repeat": repeat,
+        "number": number,
+    }
+
+
+def bench_prompts(results: dict, quick: bool):
+    from utils import prompts
+
+    objetivos = (f"Ementa {i}: junções e agregações em SQL" for i in itertools.count())
+    for tipo in config.QST_TIPOS:
+        # Ementas sempre novas: mede a renderização, não o memo do lru_cache
+        results[f"build_prompt[{tipo}]"] = measure(
+            lambda: prompts.build_prompt(
+                "Médio", next(objetivos), tipo, config.QST_AREAS[0], "Sim", "Sim"
+            ),
+            number=200 if quick else 2_000,
+        )
+
+
+def bench_presentation(results: dict, quick: bool):
+    from pages import visualize
+
+    for n in QUICK_SLIDES if quick else SLIDES:
+        stubs.install_supabase(stubs.make_rows(n))
+        results[f"create_presentation[{n}]"] = measure(
+            lambda: visualize.gerar_ppt([], {}), repeat=3
+        )
+
+
+def bench_dataframes(results: dict, quick: bool):
+    import pandas as pd
+
+    from pages import report, visualize
+    from utils.stats import counts
+
+    for n in QUICK_ROWS if quick else ROWS:
+        rows = stubs.make_rows(n)
+        stubs.install_supabase(rows)
+        linhas = [{c: row[c] for c in visualize.COLUNAS} for row in rows]
+        results[f"formatar_dados[{n}]"] = measure(
+            lambda: visualize.formatar_dados(linhas)
+        )
+        results[f"return_dados[{n}]"] = measure(
+            lambda: visualize.return_dados(n // visualize.PAGE_SIZE // 2), number=20
+        )
+        df = pd.DataFrame(rows)
+        df["dia"] = df["created_at"].str[:10]
+        results[f"dashboard_groupby[{n}]"] = measure(
+            lambda: [
+                df.groupby(dim)["id"].count().reset_index(name="contagem_ids")
+                for dim in ("area", "tipo", "nivel", "dia")
+            ]
+        )
+        results[f"dashboard_rollup[{n}]"] = measure(
+            lambda: counts.on_change("load", rows)
+        )
+
+        def recarregar():
+            counts.stale = True
+            report.return_contagens()
+
+        results[f"return_contagens[{n}]"] = measure(recarregar)
+
+
+def bench_search(results: dict, quick: bool):
+    from utils.search import SearchIndex
+
+    for n in QUICK_ROWS if quick else ROWS:
+        rows = stubs.make_rows(n)
+        index = SearchIndex()
+        index.on_change("load", rows)
+        # Pior caso: o parágrafo das linhas sintéticas está em todas elas
+        results[f"search_common[{n}]"] = measure(
+            lambda: index.search("tabela de vendas"), number=5
+        )
+        results[f"search_rare[{n}]"] = measure(
+            lambda: index.search("questão 123"), number=20
+        )
+
+
+def bench_llm(results: dict, quick: bool):
+    from utils.gemini import Gemini
+
+    stubs.install_llm()
+    model = stubs.FakeModel()
+    prompt = Gemini.build_prompt(
+        "Médio", "Ementa", config.QST_TIPOS[0], config.QST_AREAS[0], "Sim", "Sim"
+    )
+    # Custo do conector (cache, métricas, cotas) em volta de um modelo instantâneo
+    results["gemini_complete_overhead"] = measure(
+        lambda: Gemini.complete(prompt, model, cache=False), number=200
+    )
+    results["gemini_stream_overhead"] = measure(
+        lambda: list(Gemini.complete(prompt, model, cache=False, stream=True)),
+        number=200,
+    )
+
+
+def bench_callbacks(results: dict, quick: bool):
+    from benchmarks import callbacks
+
+    callbacks.start()
+    contador = itertools.count()
+    results["taipy_set_state"] = measure(
+        lambda: callbacks.set_state(next(contador)), number=50
+    )
+    results["taipy_background_round_trip"] = measure(
+        callbacks.background_round_trip, number=50
+    )
+
+
+BENCHMARKS = {
+    "prompts": bench_prompts,
+    "presentation": bench_presentation,
+    "dataframes": bench_dataframes,
+    "search": bench_search,
+    "llm": bench_llm,
+    "callbacks": bench_callbacks,
+}
+
+
+def _commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """
+    Returns (name, baseline ms, current ms, ratio) for every benchmark slower
+    than the baseline by more than `tolerance`.
+    """
+    regressoes = []
+    for name, atual in results.items():
+        base = baseline.get(name)
+        if not base or not base["median_ms"]:
+            continue
+        ratio = atual["median_ms"] / base["median_ms"]
+        if ratio > 1 + tolerance:
+            regressoes.append((name, base["median_ms"], atual["median_ms"], ratio))
+    return regressoes
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--output", default="benchmarks/results.json")
+    parser.add_argument("--quick", action="store_true", help="smaller sizes")
+    parser.add_argument(
+        "--only", nargs="+", choices=list(BENCHMARKS), help="groups to run"
+    )
+    parser.add_argument("--compare", help="baseline results JSON")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    args = parser.parse_args(argv)
+
+    results = {}
+    for group in args.only or BENCHMARKS:
+        print(f"# {group}", flush=True)
+        antes = set(results)
+        BENCHMARKS[group](results, args.quick)
+        for name in sorted(set(results) - antes):
+            print(f"{name:45s} {results[name]['median_ms']:10.3f} ms")
+
+    relatorio = {
+        "meta": {
+            "date": datetime.now().isoformat(timespec="seconds"),
+            "commit": _commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "quick": args.quick,
+        },
+        "results": results,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(relatorio, f, indent=2, ensure_ascii=False)
+    print(f"Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+        regressoes = compare(results, baseline, args.tolerance)
+        for name, base, atual, ratio in regressoes:
+            print(f"REGRESSION {name}: {base:.3f} ms -> {atual:.3f} ms ({ratio:.2f}x)")
+        if regressoes:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,169 @@
+"""Offline stand-ins for Supabase and the LLM providers used by the benchmarks."""
+
+# Import from standard library
+import random
+import types
+from collections import Counter
+from datetime import datetime, timedelta
+
+import utils.config as config
+from utils import database, resilience
+from utils.ratelimit import RateLimiter
+
+
+def make_rows(n: int, seed: int = 42) -> list:
+    """
+    Returns `n` synthetic questoes_gemini rows with realistic text sizes.
+    """
+    rng = random.Random(seed)
+    inicio = datetime(2024, 1, 1)
+    paragrafo = (
+        "Considere a tabela de vendas descrita abaixo e responda ao que se pede. " * 8
+    )
+    return [
+        {
+            "id": id,
+            "area": rng.choice(config.QST_AREAS),
+            "tipo": rng.choice(config.QST_TIPOS),
+            "nivel": rng.choice(config.QST_NIVEIS),
+            "prompt": f"Prompt da questão {id}",
+            "resultado": f"Questão {id}\n{paragrafo}\nResposta: alternativa B.",
+            "created_at": (inicio + timedelta(minutes=7 * id)).isoformat(),
+        }
+        for id in range(1, n + 1)
+    ]
+
+
+class _Response:
+    def __init__(self, data, count=None):
+        self.data = data
+        self.count = count
+
+
+class _Query:
+    """Chainable subset of the PostgREST query builder over a list of rows."""
+
+    def __init__(self, rows: list):
+        self._rows = rows
+        self._filters = []
+        self._columns = None
+        self._count = False
+        self._head = False
+        self._order = None
+        self._range = None
+
+    def select(self, columns="*", count=None, head=False):
+        self._columns = None if columns == "*" else columns.split(",")
+        self._count = count is not None
+        self._head = head
+        return self
+
+    def eq(self, column, value):
+        self._filters.append(lambda row: row.get(column) == value)
+        return self
+
+    def gt(self, column, value):
+        self._filters.append(lambda row: row.get(column) > value)
+        return self
+
+    def in_(self, column, values):
+        values = set(values)
+        self._filters.append(lambda row: row.get(column) in values)
+        return self
+
+    def order(self, column, desc=False):
+        self._order = (column, desc)
+        return self
+
+    def range(self, start, end):
+        self._range = (start, end)
+        return self
+
+    def execute(self):
+        rows = self._rows
+        if self._filters:
+            rows = [row for row in rows if all(f(row) for f in self._filters)]
+        total = len(rows)
+        # As linhas já estão em ordem de id: só reordena outras colunas
+        if self._order and self._order != ("id", False):
+            column, desc = self._order
+            rows = sorted(rows, key=lambda row: row[column], reverse=desc)
+        if self._range:
+            rows = rows[self._range[0] : self._range[1] + 1]
+        if self._columns:
+            rows = [{c: row.get(c) for c in self._columns} for row in rows]
+        return _Response([] if self._head else rows, total if self._count else None)
+
+
+class _Table:
+    def __init__(self, rows: list):
+        self._rows = rows
+
+    def select(self, *args, **kwargs):
+        return _Query(self._rows).select(*args, **kwargs)
+
+
+class FakeSupabase:
+    """In-memory Supabase client answering the queries of utils.database."""
+
+    def __init__(self, rows: list):
+        self.rows = rows
+        self._contagens = None
+
+    def table(self, name):
+        return _Table(self.rows)
+
+    def rpc(self, name, params=None):
+        if name != "questoes_contagens":
+            raise NotImplementedError(name)
+        # Agregado uma única vez, como faria o servidor: o benchmark mede o app
+        if self._contagens is None:
+            contagens = Counter()
+            for row in self.rows:
+                contagens[("area", row["area"])] += 1
+                contagens[("tipo", row["tipo"])] += 1
+                contagens[("nivel", row["nivel"])] += 1
+                contagens[("dia", row["created_at"][:10])] += 1
+            self._contagens = [
+                {"dimensao": dim, "valor": valor, "contagem": contagem}
+                for (dim, valor), contagem in contagens.items()
+            ]
+        return types.SimpleNamespace(execute=lambda: _Response(self._contagens))
+
+
+def install_supabase(rows: list) -> FakeSupabase:
+    """
+    Makes utils.database use an in-memory client over `rows`.
+    """
+    database._client = FakeSupabase(rows)
+    return database._client
+
+
+class FakeModel:
+    """GenerativeModel stand-in answering instantly with a fixed text."""
+
+    model_name = "fake-gemini"
+    _generation_config = {}
+
+    def __init__(self, text: str = "Questão gerada.\n" * 40):
+        self._text = text
+
+    def _response(self, prompt):
+        usage = types.SimpleNamespace(
+            prompt_token_count=len(prompt) // 4,
+            candidates_token_count=len(self._text) // 4,
+        )
+        return types.SimpleNamespace(text=self._text, usage_metadata=usage)
+
+    def generate_content(self, prompt, stream=False):
+        if stream:
+            return iter([self._response(prompt)])
+        return self._response(prompt)
+
+
+def install_llm():
+    """
+    Lifts the Gemini quota so the benchmarks measure the connector, not the
+    rate limiter.
+    """
+    resilience.gemini.limiter = RateLimiter(10**9)
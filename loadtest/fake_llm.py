@@ -0,0 +1,286 @@
+"""Local stand-in for the Gemini and OpenAI HTTP APIs.
+
+Answers the endpoints the app calls with a synthetic question (a JSON object
+matching the response schema, when one is sent), with latency, streaming and
+injected errors set by a profile:
+
+    Gemini (REST transport):
+        POST /v1beta/models/{model}:generateContent
+        POST /v1beta/models/{model}:streamGenerateContent  (streamed JSON array)
+        POST /v1beta/models/{model}:countTokens
+    OpenAI (0.x SDK, OPENAI_API_BASE=http://host:port/v1):
+        POST /v1/chat/completions  (server-sent events when stream=true)
+        POST /v1/moderations
+
+Point the app at it with GEMINI_API_ENDPOINT=http://host:port and
+GEMINI_TRANSPORT=rest.
+
+Usage:
+    python -m loadtest.fake_llm --port 8083 --profile typical
+"""
+
+# Import from standard library
+import argparse
+import json
+import random
+import threading
+import time
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+
+@dataclass(frozen=True)
+class Profile:
+    """Latency and error behaviour of the fake server.
+    Times are in seconds; `jitter` scales every wait by a random factor in
+    [1 - jitter, 1 + jitter]. A call fails with one of `error_codes` with
+    probability `error_rate`, before the first token.
+    """
+
+    ttft: float
+    chunks: int
+    chunk_interval: float
+    jitter: float = 0.0
+    error_rate: float = 0.0
+    error_codes: tuple = (429, 500, 503)
+
+
+PROFILES = {
+    "fast": Profile(ttft=0.02, chunks=4, chunk_interval=0.01),
+    "typical": Profile(ttft=0.8, chunks=20, chunk_interval=0.15, jitter=0.3),
+    "slow": Profile(ttft=3.0, chunks=40, chunk_interval=0.4, jitter=0.5),
+    "flaky": Profile(
+        ttft=0.8, chunks=20, chunk_interval=0.15, jitter=0.3, error_rate=0.2
+    ),
+}
+
+TEXTO = (
+    "Introdução: listas e dicionários são estruturas fundamentais em Python. "
+    "Enunciado: considere o código abaixo e assinale a alternativa correta. "
+    "a) imprime 3. b) imprime 4. c) gera um erro. d) imprime None. e) laço infinito. "
+    "Resposta correta: alternativa b, pois o laço percorre os quatro itens da lista. "
+)
+
+STATUS = {
+    429: "RESOURCE_EXHAUSTED",
+    500: "INTERNAL",
+    503: "UNAVAILABLE",
+}
+
+
+def _chunks(n: int, texto: str = None) -> list:
+    """Splits the answer (by default a synthetic question) into `n` pieces."""
+    texto = texto or TEXTO * 3
+    tamanho = -(-len(texto) // n)
+    return [texto[i : i + tamanho] for i in range(0, len(texto), tamanho)]
+
+
+# Tipos do esquema de resposta: nomes ou os números do enum Type (a API REST
+# do SDK envia os enums como inteiros)
+TIPOS = {1: "STRING", 2: "NUMBER", 3: "INTEGER", 4: "BOOLEAN", 5: "ARRAY", 6: "OBJECT"}
+
+
+def _sample(schema: dict, rng: random.Random):
+    """Returns a value matching a Gemini response schema."""
+    tipo = schema.get("type")
+    tipo = TIPOS.get(tipo, str(tipo).upper())
+    if tipo == "OBJECT":
+        return {k: _sample(v, rng) for k, v in schema.get("properties", {}).items()}
+    if tipo == "ARRAY":
+        return [_sample(schema.get("items", {}), rng) for _ in range(rng.randint(2, 5))]
+    if tipo in ("INTEGER", "NUMBER"):
+        return rng.randint(1, 10)
+    if tipo == "BOOLEAN":
+        return rng.random() < 0.5
+    return " ".join(rng.sample(TEXTO.split(" "), 12))
+
+
+def _tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    profile: Profile = PROFILES["fast"]
+    rng = random.Random()
+
+    def log_message(self, format, *args):
+        pass
+
+    # Envio -------------------------------------------------------------
+
+    def _wait(self, seconds: float):
+        jitter = self.profile.jitter
+        time.sleep(max(0.0, seconds * self.rng.uniform(1 - jitter, 1 + jitter)))
+
+    def _send_json(self, status: int, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _start_stream(self, content_type: str):
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+    def _write_chunk(self, data: bytes):
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+    def _end_stream(self):
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+    def _fail(self, openai: bool) -> bool:
+        """Sends an injected error (after the first-token wait) when drawn."""
+        if self.rng.random() >= self.profile.error_rate:
+            return False
+        self._wait(self.profile.ttft)
+        code = self.rng.choice(self.profile.error_codes)
+        if openai:
+            erro = {"message": "injected error", "type": "server_error", "code": None}
+        else:
+            erro = {"code": code, "message": "injected error", "status": STATUS[code]}
+        self._send_json(code, {"error": erro})
+        return True
+
+    # Rotas -------------------------------------------------------------
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        body = json.loads(self.rfile.read(length) or b"{}")
+        path = urlsplit(self.path).path
+        if path.endswith(":countTokens"):
+            texto = json.dumps(body.get("contents", ""))
+            return self._send_json(200, {"totalTokens": _tokens(texto)})
+        if path.endswith(":generateContent"):
+            return self._gemini(body, stream=False)
+        if path.endswith(":streamGenerateContent"):
+            return self._gemini(body, stream=True)
+        if path == "/v1/chat/completions":
+            return self._openai(body)
+        if path == "/v1/moderations":
+            resultado = {"flagged": False, "categories": {}, "category_scores": {}}
+            return self._send_json(
+                200, {"id": "modr-fake", "model": "fake", "results": [resultado]}
+            )
+        self._send_json(404, {"error": {"code": 404, "message": f"unknown {path}"}})
+
+    def _gemini(self, body: dict, stream: bool):
+        if self._fail(openai=False):
+            return
+        entrada = _tokens(json.dumps(body.get("contents", "")))
+        geracao = body.get("generationConfig", {})
+        texto = None
+        if geracao.get("responseMimeType") == "application/json":
+            schema = geracao.get("responseSchema") or {"type": "OBJECT"}
+            texto = json.dumps(_sample(schema, self.rng), ensure_ascii=False)
+        partes = _chunks(self.profile.chunks, texto)
+        saida = _tokens("".join(partes))
+
+        def resposta(texto, final):
+            candidato = {
+                "content": {"parts": [{"text": texto}], "role": "model"},
+                "index": 0,
+            }
+            if final:
+                candidato["finishReason"] = "STOP"
+            return {
+                "candidates": [candidato],
+                "usageMetadata": {
+                    "promptTokenCount": entrada,
+                    "candidatesTokenCount": saida if final else 0,
+                    "totalTokenCount": entrada + (saida if final else 0),
+                },
+            }
+
+        self._wait(self.profile.ttft)
+        if not stream:
+            self._wait(self.profile.chunk_interval * (len(partes) - 1))
+            return self._send_json(200, resposta("".join(partes), True))
+        # Um array JSON enviado aos poucos, como a API REST do Gemini
+        self._start_stream("application/json")
+        for i, texto in enumerate(partes):
+            if i:
+                self._wait(self.profile.chunk_interval)
+            prefixo = "[" if i == 0 else ",\r\n"
+            item = json.dumps(resposta(texto, i == len(partes) - 1))
+            self._write_chunk((prefixo + item).encode())
+        self._write_chunk(b"]")
+        self._end_stream()
+
+    def _openai(self, body: dict):
+        if self._fail(openai=True):
+            return
+        entrada = _tokens(json.dumps(body.get("messages", "")))
+        partes = _chunks(self.profile.chunks)
+        modelo = body.get("model", "fake")
+        self._wait(self.profile.ttft)
+        if not body.get("stream"):
+            self._wait(self.profile.chunk_interval * (len(partes) - 1))
+            texto = "".join(partes)
+            mensagem = {"role": "assistant", "content": texto}
+            return self._send_json(
+                200,
+                {
+                    "id": "chatcmpl-fake",
+                    "object": "chat.completion",
+                    "model": modelo,
+                    "choices": [
+                        {"index": 0, "message": mensagem, "finish_reason": "stop"}
+                    ],
+                    "usage": {
+                        "prompt_tokens": entrada,
+                        "completion_tokens": _tokens(texto),
+                        "total_tokens": entrada + _tokens(texto),
+                    },
+                },
+            )
+        self._start_stream("text/event-stream")
+        for i, texto in enumerate(partes):
+            if i:
+                self._wait(self.profile.chunk_interval)
+            evento = {
+                "id": "chatcmpl-fake",
+                "object": "chat.completion.chunk",
+                "model": modelo,
+                "choices": [
+                    {"index": 0, "delta": {"content": texto}, "finish_reason": None}
+                ],
+            }
+            self._write_chunk(f"data: {json.dumps(evento)}\n\n".encode())
+        self._write_chunk(b"data: [DONE]\n\n")
+        self._end_stream()
+
+
+def serve(
+    port: int = 0, profile: str = "fast", seed: int = None
+) -> ThreadingHTTPServer:
+    """
+    Starts the server in a daemon thread and returns it (server_port holds
+    the port when 0 was given).
+    """
+    handler = type(
+        "ProfileHandler",
+        (Handler,),
+        {"profile": PROFILES[profile], "rng": random.Random(seed)},
+    )
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fake Gemini/OpenAI server")
+    parser.add_argument("--port", type=int, default=8083)
+    parser.add_argument("--profile", choices=list(PROFILES), default="typical")
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+    server = serve(args.port, args.profile, args.seed)
+    print(f"Fake LLM ({args.profile}) on http://127.0.0.1:{server.server_port}")
+    threading.Event().wait()
@@ -0,0 +1,254 @@
+"""PostgREST-compatible stand-in for the questoes_gemini table.
+
+Serves the subset of the PostgREST API used by utils.database (select with
+filters, order, offset/limit and exact counts, insert, update, delete and the
+questoes_contagens function) from memory, so the app can run against it by
+pointing SUPABASE_URL at this server. Like PostgREST's max-rows setting,
+every select returns at most `max_rows` rows.
+
+Usage:
+    python -m loadtest.fake_postgrest --port 8082 --rows 1000 --max-rows 1000
+"""
+
+# Import from standard library
+import argparse
+import json
+import re
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+
+from benchmarks.stubs import make_rows
+
+TABLE = "questoes_gemini"
+# Chave no formato JWT (o cliente do Supabase valida o formato, não a assinatura)
+API_KEY = "eyJhbGciOiJIUzI1NiJ9.eyJyb2xlIjoiYW5vbiJ9.loadtest"
+
+
+def _parse_value(value: str):
+    value = value.strip()
+    if len(value) > 1 and value[0] == value[-1] == '"':
+        return value[1:-1]
+    try:
+        return int(value)
+    except ValueError:
+        return value
+
+
+def _compare(row_value, op: str, value) -> bool:
+    if row_value is None:
+        return op == "is" and value in ("null", None)
+    if isinstance(row_value, int) and not isinstance(value, int):
+        try:
+            value = int(value)
+        except (TypeError, ValueError):
+            return False
+    if isinstance(value, int) and not isinstance(row_value, int):
+        value = str(value)
+    if op == "eq":
+        return row_value == value
+    if op == "neq":
+        return row_value != value
+    if op == "gt":
+        return row_value > value
+    if op == "gte":
+        return row_value >= value
+    if op == "lt":
+        return row_value < value
+    if op == "lte":
+        return row_value <= value
+    raise ValueError(f"unsupported operator {op}")
+
+
+def _filter(column: str, expression: str):
+    """
+    Returns a predicate for one PostgREST filter (column=op.value).
+    """
+    op, _, value = expression.partition(".")
+    if op == "in":
+        valores = {_parse_value(v) for v in value.strip("()").split(",") if v}
+        return lambda row: row.get(column) in valores
+    value = _parse_value(value)
+    return lambda row: _compare(row.get(column), op, value)
+
+
+def _or_filter(expression: str):
+    # or=(id.gt.10,updated_at.gt."2024-01-01T00:00:00")
+    partes = re.findall(r'([^,().]+)\.(\w+)\.("[^"]*"|[^,()]+)', expression)
+    filtros = [_filter(column, f"{op}.{value}") for column, op, value in partes]
+    return lambda row: any(f(row) for f in filtros)
+
+
+class Store:
+    """In-memory table with PostgREST-like queries."""
+
+    def __init__(self, rows: list):
+        self._lock = threading.Lock()
+        self.rows = {row["id"]: dict(row) for row in rows}
+        for row in self.rows.values():
+            row.setdefault("updated_at", row.get("created_at"))
+        self._next_id = max(self.rows, default=0) + 1
+
+    def query(self, params: list, max_rows: int = None) -> tuple:
+        filtros, columns, order, offset, limit = [], None, None, 0, None
+        for key, value in params:
+            if key == "select":
+                columns = None if value == "*" else value.split(",")
+            elif key == "order":
+                column, _, direction = value.partition(".")
+                order = (column, direction.startswith("desc"))
+            elif key == "offset":
+                offset = int(value)
+            elif key == "limit":
+                limit = int(value)
+            elif key == "or":
+                filtros.append(_or_filter(value))
+            else:
+                filtros.append(_filter(key, value))
+        with self._lock:
+            rows = [row for row in self.rows.values() if all(f(row) for f in filtros)]
+        if order:
+            column, desc = order
+            rows.sort(key=lambda row: (row.get(column) is None, row.get(column)))
+            if desc:
+                rows.reverse()
+        total = len(rows)
+        if max_rows is not None:
+            limit = max_rows if limit is None else min(limit, max_rows)
+        rows = rows[offset : None if limit is None else offset + limit]
+        if columns:
+            rows = [{c: row.get(c) for c in columns} for row in rows]
+        return rows, total, offset
+
+    def insert(self, rows: list) -> list:
+        agora = datetime.now(timezone.utc).isoformat()
+        novas = []
+        with self._lock:
+            for row in rows:
+                row = {**row, "id": self._next_id, "created_at": agora}
+                row["updated_at"] = agora
+                self.rows[row["id"]] = row
+                self._next_id += 1
+                novas.append(dict(row))
+        return novas
+
+    def update(self, params: list, campos: dict) -> list:
+        ids = [row["id"] for row in self.query(params)[0]]
+        agora = datetime.now(timezone.utc).isoformat()
+        with self._lock:
+            for id in ids:
+                self.rows[id].update(campos, updated_at=agora)
+            return [dict(self.rows[id]) for id in ids]
+
+    def delete(self, params: list) -> list:
+        ids = [row["id"] for row in self.query(params)[0]]
+        with self._lock:
+            return [self.rows.pop(id) for id in ids if id in self.rows]
+
+    def contagens(self) -> list:
+        contagens = Counter()
+        with self._lock:
+            for row in self.rows.values():
+                for dim in ("area", "tipo", "nivel"):
+                    contagens[(dim, row.get(dim))] += 1
+                contagens[("dia", (row.get("created_at") or "")[:10] or None)] += 1
+        return [
+            {"dimensao": dim, "valor": valor, "contagem": contagem}
+            for (dim, valor), contagem in contagens.items()
+        ]
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    store: Store = None
+    latency = 0.0
+    max_rows = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status: int, body=None, headers=None):
+        data = b"" if body is None else json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(data)
+
+    def _route(self):
+        # Sempre consome o corpo: a conexão é reaproveitada (keep-alive)
+        length = int(self.headers.get("Content-Length") or 0)
+        self.body = json.loads(self.rfile.read(length) or b"null")
+        url = urlsplit(self.path)
+        params = parse_qsl(url.query, keep_blank_values=True)
+        if self.latency:
+            time.sleep(self.latency)
+        return url.path, params
+
+    def do_GET(self):
+        path, params = self._route()
+        if path != f"/rest/v1/{TABLE}":
+            return self._send(404, {"message": f"unknown path {path}"})
+        rows, total, offset = self.store.query(params, self.max_rows)
+        headers = {}
+        if "count=exact" in (self.headers.get("Prefer") or ""):
+            fim = offset + len(rows) - 1
+            intervalo = f"{offset}-{fim}" if rows else "*"
+            headers["Content-Range"] = f"{intervalo}/{total}"
+        self._send(200, rows, headers)
+
+    do_HEAD = do_GET
+
+    def do_POST(self):
+        path, params = self._route()
+        if path == "/rest/v1/rpc/questoes_contagens":
+            return self._send(200, self.store.contagens())
+        if path != f"/rest/v1/{TABLE}":
+            return self._send(404, {"message": f"unknown path {path}"})
+        body = self.body
+        rows = self.store.insert(body if isinstance(body, list) else [body])
+        self._send(201, rows)
+
+    def do_PATCH(self):
+        path, params = self._route()
+        self._send(200, self.store.update(params, self.body))
+
+    def do_DELETE(self):
+        path, params = self._route()
+        self._send(200, self.store.delete(params))
+
+
+def serve(
+    port: int = 0, rows: int = 1000, latency: float = 0.0, max_rows: int = 1000
+) -> ThreadingHTTPServer:
+    """
+    Starts the server in a daemon thread and returns it (server_port holds
+    the port when 0 was given). `max_rows` caps every select, as PostgREST's
+    max-rows setting does; None disables the cap.
+    """
+    handler = type(
+        "StoreHandler",
+        (Handler,),
+        {"store": Store(make_rows(rows)), "latency": latency, "max_rows": max_rows},
+    )
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fake PostgREST server")
+    parser.add_argument("--port", type=int, default=8082)
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds")
+    parser.add_argument("--max-rows", type=int, default=1000, help="0: no cap")
+    args = parser.parse_args()
+    server = serve(args.port, args.rows, args.latency, args.max_rows or None)
+    print(f"Fake PostgREST on http://127.0.0.1:{server.server_port}")
+    threading.Event().wait()
@@ -0,0 +1,378 @@
+"""End-to-end load test of the Taipy app.
+
+Starts the fake PostgREST and LLM servers (loadtest/fake_postgrest.py and
+loadtest/fake_llm.py), runs main.py against them in a subprocess and drives
+N concurrent sessions over the same socket.io protocol the browser uses:
+
+    Gerador     generate a question (send_question) until the final alert
+    Salvar      save it (send_database)
+    Visualizar  open the page, refresh it and fetch the first table page
+    Exportar    select a few questions and export them to Powerpoint
+
+Prints throughput and p50/p95/p99 latency per action and writes them as JSON.
+
+Usage, from the repository root:
+    python -m loadtest.run --sessions 20 --iterations 3 --profile typical
+"""
+
+# Import from standard library
+import argparse
+import itertools
+import json
+import os
+import re
+import signal
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+from datetime import datetime
+
+# Import from 3rd party libraries
+import socketio
+
+from loadtest import fake_llm, fake_postgrest
+
+ACTIONS = ("Gerador", "Salvar", "Visualizar", "Exportar")
+
+
+class SessionError(Exception):
+    """Raised when an action fails or does not finish in time."""
+
+
+class Session:
+    """One simulated teacher: a socket.io connection speaking the Taipy
+    websocket protocol (ID, A, DU messages; MU, AL, ACK replies).
+    """
+
+    _ack_ids = itertools.count()
+
+    def __init__(self, base_url: str, timeout: float):
+        self.base_url = base_url
+        self.timeout = timeout
+        self.client_id = None
+        self.contexts = {}
+        self.tabelas = {}
+        self.linhas = []
+        self._acks = set()
+        self._alerts = []
+        self._cond = threading.Condition()
+        self._sio = socketio.Client(reconnection=False)
+        self._sio.on("message", self._on_message)
+
+    def _on_message(self, message: dict):
+        with self._cond:
+            tipo = message.get("type")
+            if tipo == "ID":
+                self.client_id = message["id"]
+            elif tipo == "ACK":
+                self._acks.add(message["id"])
+            elif tipo == "AL":
+                self._alerts.append(message)
+            elif tipo == "MU":
+                for update in message["payload"]:
+                    valor = update["payload"].get("value")
+                    if isinstance(valor, dict) and "data" in valor:
+                        self.linhas = valor["data"]
+            self._cond.notify_all()
+
+    def _wait(self, predicate, what: str):
+        with self._cond:
+            if not self._cond.wait_for(predicate, self.timeout):
+                raise SessionError(f"timeout waiting for {what}")
+
+    def connect(self):
+        self._sio.connect(self.base_url, transports=["websocket"])
+        self._sio.emit("message", {"type": "ID", "payload": ""})
+        self._wait(lambda: self.client_id, "client id")
+        self.open("TaiPy_root_page")
+
+    def close(self):
+        self._sio.disconnect()
+
+    def open(self, page: str) -> dict:
+        """
+        Renders a page for this client, as the browser does on navigation
+        (binds its variables and runs on_navigate).
+        """
+        url = f"{self.base_url}/taipy-jsx/{page}?client_id={self.client_id}"
+        with urllib.request.urlopen(url, timeout=self.timeout) as response:
+            pagina = json.load(response)
+        self.contexts[page] = pagina.get("context")
+        tabela = re.search(r"data=\{(_TpD_\w+)\}", pagina.get("jsx", ""))
+        if tabela:
+            self.tabelas[page] = tabela.group(1)
+        return pagina
+
+    def _send(self, page: str, tipo: str, name: str, payload: dict) -> str:
+        ack_id = f"lt{next(self._ack_ids)}"
+        self._sio.emit(
+            "message",
+            {
+                "type": tipo,
+                "name": name,
+                "payload": payload,
+                "client_id": self.client_id,
+                "module_context": self.contexts[page],
+                "ack_id": ack_id,
+            },
+        )
+        return ack_id
+
+    def action(self, page: str, function: str, **payload):
+        """
+        Calls a page callback (a button press) and waits until it returns.
+        """
+        payload = {"action": function, "args": [], **payload}
+        ack_id = self._send(page, "A", function, payload)
+        self._wait(lambda: ack_id in self._acks, f"{function} ack")
+
+    def action_alert(self, page: str, function: str) -> dict:
+        """
+        Calls a page callback and waits for the next notification it (or the
+        background work it started) shows; error notifications raise.
+        """
+        with self._cond:
+            self._alerts.clear()
+        self.action(page, function)
+        self._wait(lambda: self._alerts, f"{function} notification")
+        alerta = self._alerts[0]
+        if alerta["atype"] == "error":
+            raise SessionError(alerta["message"])
+        return alerta
+
+    def request_table(self, page: str, rows: int = 15):
+        """
+        Fetches the first page of the page's table, as the table component
+        does after its data changes.
+        """
+        payload = {"pagekey": f"0-{rows - 1}--asc", "start": 0, "end": rows - 1}
+        ack_id = self._send(page, "DU", self.tabelas[page], payload)
+        self._wait(lambda: ack_id in self._acks, "table data")
+
+
+def run_session(session: Session, args, latencias: dict, erros: dict, lock):
+    """
+    Runs the Gerador → Salvar → Visualizar → Exportar flow `iterations` times.
+    """
+
+    def timed(nome, fn):
+        inicio = time.perf_counter()
+        try:
+            fn()
+        except Exception as e:
+            with lock:
+                erros[nome].append(str(e))
+            return False
+        with lock:
+            latencias[nome].append(time.perf_counter() - inicio)
+        return True
+
+    def visualizar():
+        session.open("Visualizar")
+        session.action("Visualizar", "refresh_dados")
+        session.request_table("Visualizar")
+
+    def exportar():
+        session.action_alert("Visualizar", "exportar_ppt")
+
+    session.open("Gerador")
+    for _ in range(args.iterations):
+        if timed("Gerador", lambda: session.action_alert("Gerador", "send_question")):
+            timed("Salvar", lambda: session.action_alert("Gerador", "send_database"))
+        time.sleep(args.think)
+        if not timed("Visualizar", visualizar):
+            continue
+        # Seleção das questões (não cronometrada): cliques na tabela
+        for linha in session.linhas[: args.export_size]:
+            if not linha.get("selecionado"):
+                session.action(
+                    "Visualizar",
+                    "selecionar_questao",
+                    index=linha["_tp_index"],
+                    col="selecionado",
+                    value=True,
+                )
+        timed("Exportar", exportar)
+        time.sleep(args.think)
+
+
+def percentiles(valores: list) -> dict:
+    """
+    Returns count and p50/p95/p99/max in milliseconds.
+    """
+    if not valores:
+        return {"count": 0}
+    ms = sorted(v * 1000 for v in valores)
+    cortes = (
+        statistics.quantiles(ms, n=100, method="inclusive") if len(ms) > 1 else ms * 99
+    )
+    return {
+        "count": len(ms),
+        "p50_ms": cortes[49],
+        "p95_ms": cortes[94],
+        "p99_ms": cortes[98],
+        "max_ms": ms[-1],
+    }
+
+
+def start_app(args, supabase_url: str, llm_url: str) -> subprocess.Popen:
+    """
+    Starts main.py against the fake servers and waits until it answers.
+    """
+    env = {
+        **os.environ,
+        "PORT": str(args.port),
+        "SUPABASE_URL": supabase_url,
+        "SUPABASE_KEY": fake_postgrest.API_KEY,
+        "GEMINIAI_API_KEY": "loadtest",
+        "GEMINI_API_ENDPOINT": llm_url,
+        "GEMINI_TRANSPORT": "rest",
+        # Cotas fora do caminho: o teste mede o app, não o limitador
+        "GEMINI_RPM": str(10**6),
+        "GEMINI_TPM": str(10**9),
+        "OPENAI_RPM": str(10**6),
+        "OPENAI_TPM": str(10**9),
+    }
+    if args.openai:
+        env.update(OPENAI_API_KEY="loadtest", OPENAI_API_BASE=f"{llm_url}/v1")
+    else:
+        env.pop("OPENAI_API_KEY", None)
+    app = subprocess.Popen(
+        [sys.executable, "main.py"],
+        env=env,
+        stdout=subprocess.DEVNULL if not args.verbose else None,
+        stderr=subprocess.DEVNULL if not args.verbose else None,
+        start_new_session=True,
+    )
+    limite = time.monotonic() + args.startup_timeout
+    while time.monotonic() < limite:
+        if app.poll() is not None:
+            raise RuntimeError(f"main.py exited with code {app.returncode}")
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{args.port}/", timeout=1)
+            return app
+        except OSError:
+            time.sleep(0.5)
+    stop_app(app)
+    raise RuntimeError("main.py did not start in time")
+
+
+def stop_app(app: subprocess.Popen):
+    # O reloader do Taipy cria um processo filho: encerra o grupo todo
+    try:
+        os.killpg(app.pid, signal.SIGTERM)
+        app.wait(10)
+    except (ProcessLookupError, subprocess.TimeoutExpired):
+        os.killpg(app.pid, signal.SIGKILL)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=10)
+    parser.add_argument("--iterations", type=int, default=3, help="flows per session")
+    parser.add_argument("--profile", choices=list(fake_llm.PROFILES), default="typical")
+    parser.add_argument("--rows", type=int, default=1000, help="questions in the bank")
+    parser.add_argument("--db-latency", type=float, default=0.005, help="seconds")
+    parser.add_argument("--export-size", type=int, default=5)
+    parser.add_argument("--think", type=float, default=1.0, help="pause between steps")
+    parser.add_argument("--ramp", type=float, default=5.0, help="seconds to start all")
+    parser.add_argument("--timeout", type=float, default=120.0, help="per action")
+    parser.add_argument("--openai", action="store_true", help="enable the OpenAI fake")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--startup-timeout", type=float, default=120.0)
+    parser.add_argument("--output", default="loadtest/results.json")
+    parser.add_argument("--verbose", action="store_true", help="show the app output")
+    args = parser.parse_args(argv)
+
+    banco = fake_postgrest.serve(0, args.rows, args.db_latency)
+    llm = fake_llm.serve(0, args.profile)
+    app = start_app(
+        args,
+        f"http://127.0.0.1:{banco.server_port}",
+        f"http://127.0.0.1:{llm.server_port}",
+    )
+    latencias = {nome: [] for nome in ACTIONS}
+    erros = {nome: [] for nome in ACTIONS}
+    lock = threading.Lock()
+    falhas_sessao = []
+
+    def sessao(i):
+        time.sleep(args.ramp * i / max(1, args.sessions))
+        session = Session(f"http://127.0.0.1:{args.port}", args.timeout)
+        try:
+            session.connect()
+            run_session(session, args, latencias, erros, lock)
+        except Exception as e:
+            falhas_sessao.append(repr(e))
+        finally:
+            session.close()
+
+    print(
+        f"{args.sessions} sessions x {args.iterations} flows, "
+        f"profile {args.profile}, {args.rows} questions",
+        flush=True,
+    )
+    inicio = time.perf_counter()
+    try:
+        threads = [
+            threading.Thread(target=sessao, args=(i,)) for i in range(args.sessions)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        duracao = time.perf_counter() - inicio
+        stop_app(app)
+        banco.shutdown()
+        llm.shutdown()
+
+    fluxos = len(latencias["Exportar"])
+    resultados = {nome: percentiles(latencias[nome]) for nome in ACTIONS}
+    print(
+        f"{'action':12s} {'ok':>6s} {'errors':>6s} {'p50':>9s} {'p95':>9s} {'p99':>9s}"
+    )
+    for nome in ACTIONS:
+        r = resultados[nome]
+        r["errors"] = len(erros[nome])
+        linha = f"{nome:12s} {r['count']:6d} {r['errors']:6d}"
+        if r["count"]:
+            linha += f" {r['p50_ms']:7.0f}ms {r['p95_ms']:7.0f}ms {r['p99_ms']:7.0f}ms"
+        print(linha)
+    print(
+        f"{fluxos} flows in {duracao:.1f}s: {fluxos / duracao * 60:.1f} flows/min, "
+        f"{sum(r['count'] for r in resultados.values()) / duracao:.2f} actions/s"
+    )
+    for falha in falhas_sessao:
+        print(f"SESSION FAILED {falha}")
+
+    relatorio = {
+        "meta": {
+            "date": datetime.now().isoformat(timespec="seconds"),
+            "sessions": args.sessions,
+            "iterations": args.iterations,
+            "profile": args.profile,
+            "rows": args.rows,
+            "think": args.think,
+            "openai": args.openai,
+            "duration_s": duracao,
+        },
+        "throughput": {
+            "flows_per_min": fluxos / duracao * 60,
+            "actions_per_s": sum(r["count"] for r in resultados.values()) / duracao,
+        },
+        "actions": resultados,
+        "errors": {nome: erros[nome][:20] for nome in ACTIONS if erros[nome]},
+        "session_failures": falhas_sessao,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(relatorio, f, indent=2, ensure_ascii=False)
+    print(f"Results written to {args.output}")
+    return 1 if falhas_sessao or any(erros.values()) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,6 +1,7 @@
 # -*- coding: utf-8 -*-
 import os
 
+from flask import Flask, Response
 from taipy.gui import Gui
 from dotenv import load_dotenv
 
@@ -11,6 +12,9 @@ from pages.generate_question import gen_q_md
 from pages.visualize import tbl_q_md
 from pages.report import sum_q_md
 from pages.validate_content import val_q_md
+from pages import generate_question, report, validate_content, visualize
+from utils import metrics
+from utils.gemini import Gemini
 
 # from pages.generate_code import code_q_md
 
@@ -24,11 +28,41 @@ pages = {
 }
 
 
+# Carregamento preguiçoso: os dados de cada página são buscados em segundo
+# plano na primeira visita, e não na importação dos módulos
+carregadores = {
+    "Gerador": generate_question.carregar,
+    "Visualizar": visualize.carregar,
+    "Dashboard": report.carregar,
+    "Validar": validate_content.carregar,
+}
+
+
+def on_navigate(state, page_name):
+    carregar = carregadores.get(page_name)
+    if carregar:
+        carregar(state)
+    return page_name
+
+
+# Métricas das chamadas aos modelos, no formato texto do Prometheus
+app = Flask(__name__)
+
+
+@app.route("/metrics")
+def exportar_metricas():
+    return Response(
+        metrics.registry.export_prometheus(),
+        mimetype="text/plain; version=0.0.4",
+    )
+
+
 # ----------------------------------------------------------------
 # Main
 # ----------------------------------------------------------------
 if __name__ == "__main__":
-    Gui(pages=pages).run(
+    Gemini.warmup(os.getenv("GEMINIAI_API_KEY"))
+    Gui(pages=pages, flask=app).run(
         title="Demonstração GenAI",
         host="0.0.0.0",
         port=os.getenv("PORT"),
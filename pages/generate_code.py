@@ -1,19 +1,27 @@
 # -*- coding: utf-8 -*-
 import os
 from taipy.gui import Gui, notify, Markdown
-from supabase import create_client, Client
 
 import utils.gemini as genai
 import utils.config as config
+from utils import metrics
+from utils.background import run_async
 
 
 def send_question(state, id, action):
     state.resultado = "Waiting ..."
-    resultado = None
+    run_async(state, gerar_codigo, state.prompt, on_error=(concluir_codigo, None))
 
+
+async def gerar_codigo(update, prompt):
     gemini = genai.Gemini()
-    gemini.set_key(os.getenv("GEMINIAI_API_KEY"))
-    resultado = gemini.complete(state.prompt)
+    model = gemini.get_model(os.getenv("GEMINIAI_API_KEY"))
+    with metrics.labels(pagina="Código"):
+        resultado = await gemini.acomplete(prompt, model)
+    update(concluir_codigo, resultado)
+
+
+def concluir_codigo(state, resultado):
     if resultado:
         state.resultado = resultado
         notify(state, "success", "Geração de código concluída!")
@@ -1,10 +1,11 @@
 # -*- coding: utf-8 -*-
 import os
 from taipy.gui import Gui, notify, Markdown
-from supabase import create_client, Client
 
 import utils.gemini as genai
 import utils.config as config
+from utils import metrics
+from utils.background import run_async
 
 
 def upload_file(state):
@@ -13,12 +14,28 @@ def upload_file(state):
 
 def send_question(state, id, action):
     state.resultado = "Waiting ..."
-    resultado = None
+    run_async(
+        state,
+        analisar_arquivo,
+        state.arquivo,
+        state.prompt,
+        on_error=(
+            concluir_analise,
+            {"success": False, "text": "Falha inesperada, detalhes no log"},
+        ),
+    )
 
+
+async def analisar_arquivo(update, arquivo, prompt):
     gemini = genai.Gemini()
-    gemini.set_key(os.getenv("GEMINIAI_API_KEY"))
-    arquivo_bin = gemini.upload_to_gemini(state.arquivo)
-    resultado = gemini.analyze(state.prompt, arquivo_bin)
+    model = gemini.get_model(os.getenv("GEMINIAI_API_KEY"))
+    with metrics.labels(pagina="Analisar"):
+        arquivo_bin = await gemini.aupload(arquivo)
+        resultado = await gemini.aanalyze(prompt, arquivo_bin, model)
+    update(concluir_analise, resultado)
+
+
+def concluir_analise(state, resultado):
     if resultado["success"]:
         state.resultado = resultado["text"]
         notify(state, "success", "Análise concluída!")
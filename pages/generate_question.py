@@ -1,33 +1,87 @@
 # -*- coding: utf-8 -*-
-import os
+import json
 from taipy.gui import Gui, notify, Markdown
-from supabase import create_client, Client
+import pandas as pd
 
 import utils.gemini as genai
 import utils.config as config
+from utils import database, dedup, metrics, schemas, sync
+from utils.background import run_in_background, throttle
+from utils.batch import build_matrix, generate_batch, save_batch
+from utils.router import get_router
+
+# Intervalo mínimo (segundos) entre atualizações da caixa de resultado
+STREAM_INTERVALO = 0.25
 
 
 def send_database(state, id, action):
+    duplicatas = dedup.index.similares(state.resultado)
+    if duplicatas and config.DEDUP_MODE == "block":
+        duplicata, similaridade = duplicatas[0]
+        notify(
+            state,
+            "error",
+            f"Questão não salva: quase idêntica à questão {duplicata} ({similaridade:.0%})",
+        )
+        return
     try:
-        url: str = os.environ.get("SUPABASE_URL")
-        key: str = os.environ.get("SUPABASE_KEY")
-        supabase: Client = create_client(url, key)
-        tbl = supabase.table("questoes_gemini")
-        tbl.insert(
-            {
-                "area": state.area,
-                "tipo": state.tipo,
-                "nivel": state.nivel,
-                "prompt": state.prompt,
-                "resultado": state.resultado,
-            }
-        ).execute()
-        notify(state, "sucesso", "Questão salva!")
+        questao = {
+            "area": state.area,
+            "tipo": state.tipo,
+            "nivel": state.nivel,
+            "prompt": state.prompt,
+            "resultado": state.resultado,
+        }
+        if state.estrutura:
+            questao.update(json.loads(state.estrutura))
+        questao = database.insert_question(questao)
+        sync.questions.apply_insert(questao)
+        if duplicatas:
+            duplicata, similaridade = duplicatas[0]
+            notify(
+                state,
+                "warning",
+                f"Questão salva, mas parecida com a questão {duplicata} ({similaridade:.0%})",
+            )
+        else:
+            notify(state, "sucesso", "Questão salva!")
         state.salvar = False
     except:
         notify(state, "error", "Erro ao salvar a questão")
 
 
+def carregar(state):
+    # O índice de duplicatas carrega em segundo plano na primeira visita
+    dedup.index.warmup()
+
+
+def buscar_existente(state, var_name=None, value=None):
+    # Oferece uma questão já salva com a mesma ementa, tipo e nível
+    existentes = dedup.index.existentes(state.objetivo, state.tipo, state.nivel)
+    if existentes:
+        id, similaridade = existentes[0]
+        state.existente = id
+        state.existente_texto = (
+            f"Já existe a questão {id} com ementa parecida ({similaridade:.0%})"
+        )
+    else:
+        state.existente = 0
+        state.existente_texto = ""
+
+
+def usar_existente(state, id, action):
+    questao = database.get_question(state.existente)
+    if not questao:
+        notify(state, "error", "Questão não encontrada")
+        buscar_existente(state)
+        return
+    state.prompt = questao["prompt"]
+    state.resultado = questao["resultado"]
+    state.estrutura = ""
+    state.salvar = False
+    notify(state, "info", f"Questão {questao['id']} carregada do banco")
+
+
 def send_question(state, id, action):
     state.resultado = "Waiting ..."
     resultado = None
@@ -35,6 +89,7 @@ def send_question(state, id, action):
         notify(state, "error", "Defina a ementa da questão!")
         return None
 
+    estruturada = state.estruturada == "Sim"
     gemini = genai.Gemini()
     state.prompt = gemini.build_prompt(
         state.nivel,
@@ -43,19 +98,132 @@ def send_question(state, id, action):
         state.area,
         state.tem_introducao,
         state.tem_resposta,
+        estruturada=estruturada,
     )
-    gemini.set_key(os.getenv("GEMINIAI_API_KEY"))
-    resultado = gemini.complete(state.prompt)
+    state.salvar = False
+    state.estrutura = ""
+    if estruturada:
+        run_in_background(
+            state,
+            gerar_questao_estruturada,
+            state.prompt,
+            state.tipo,
+            state.tem_introducao,
+            state.tem_resposta,
+        )
+    else:
+        run_in_background(state, gerar_questao, state.prompt, state.tipo)
+
+
+def gerar_questao(update, prompt, tipo):
+    resultado = ""
+    with metrics.labels(pagina="Gerador", tipo=tipo):
+        chunks = get_router().complete(prompt, stream=True)
+        try:
+            for resultado in throttle(chunks, STREAM_INTERVALO):
+                update(mostrar_parcial, resultado)
+        except Exception:
+            # Stream interrompido (já registrado no log pelo provedor): o
+            # texto parcial não é uma questão
+            resultado = None
+    update(concluir_questao, resultado)
+
+
+def gerar_questao_estruturada(update, prompt, tipo, tem_introducao, tem_resposta):
+    with metrics.labels(pagina="Gerador", tipo=tipo):
+        campos = genai.Gemini.complete_structured(
+            prompt, tipo, tem_introducao, tem_resposta
+        )
+    update(concluir_questao_estruturada, campos)
+
+
+def concluir_questao_estruturada(state, campos):
+    # Os campos vão para as colunas da tabela; o texto para o resultado
+    if campos:
+        state.estrutura = json.dumps(campos, ensure_ascii=False)
+    concluir_questao(state, schemas.render(campos) if campos else None)
+
+
+def mostrar_parcial(state, resultado):
+    state.resultado = resultado
+
+
+def concluir_questao(state, resultado):
     if resultado:
         state.resultado = resultado
         notify(state, "success", "Questão criada!")
         state.salvar = True
     else:
-        state.resultado = "Erro ao utilizar o Gemini. Verifique o Log"
-        notify(state, "success", "Questão criada!")
+        state.resultado = "Erro ao utilizar o modelo. Verifique o Log"
+        notify(state, "error", "Questão não criada!")
         state.salvar = False
 
 
+def send_batch(state, id, action):
+    if state.objetivo == "":
+        notify(state, "error", "Defina a ementa da questão!")
+        return None
+    itens = build_matrix(state.lote_tipos, state.lote_niveis, state.lote_areas)
+    if not itens:
+        notify(state, "error", "Selecione ao menos um tipo, um nível e uma área!")
+        return None
+
+    state.lote = []
+    state.lote_salvar = False
+    state.lote_progresso = f"0/{len(itens)} questões geradas"
+    state.lote_resultados = pd.DataFrame(itens).assign(status="Aguardando")
+    run_in_background(
+        state,
+        gerar_lote,
+        state.objetivo,
+        itens,
+        state.tem_introducao,
+        state.tem_resposta,
+        int(state.lote_por_chamada),
+    )
+
+
+def gerar_lote(update, objetivo, itens, tem_introducao, tem_resposta, por_chamada):
+    def progresso(concluidos, total, idx, item):
+        update(mostrar_progresso_lote, concluidos, total, idx, item["erro"])
+
+    resultados = generate_batch(
+        objetivo,
+        itens,
+        tem_introducao,
+        tem_resposta,
+        on_progress=progresso,
+        por_chamada=por_chamada,
+    )
+    update(concluir_lote, resultados)
+
+
+def mostrar_progresso_lote(state, concluidos, total, idx, erro):
+    lote_resultados = state.lote_resultados.copy()
+    lote_resultados.loc[idx, "status"] = f"Falha: {erro}" if erro else "Gerada"
+    state.lote_resultados = lote_resultados
+    state.lote_progresso = f"{concluidos}/{total} questões geradas"
+
+
+def concluir_lote(state, resultados):
+    falhas = sum(1 for item in resultados if item["erro"])
+    state.lote = resultados
+    state.lote_salvar = falhas < len(resultados)
+    if falhas:
+        notify(state, "warning", f"Lote concluído com {falhas} falha(s)")
+    else:
+        notify(state, "success", "Lote concluído!")
+
+
+def send_batch_database(state, id, action):
+    try:
+        inseridas = save_batch(state.lote)
+        notify(state, "success", f"{inseridas} questões salvas!")
+        state.lote_salvar = False
+    except Exception:
+        notify(state, "error", "Erro ao salvar o lote")
+
+
 # Definição de Variável
 area = "Lógica e Linguagens de Programaçao"
 nivel = "Fácil"
@@ -63,14 +231,27 @@ tipo = "Escolha Simples"
 objetivo = "Lógica de Programação com Python: if, for, dicionários e listas"
 tem_resposta = "Sim"
 tem_introducao = "Sim"
+estruturada = "Não"
+estrutura = ""  # Campos da saída estruturada (JSON), salvos com a questão
 lkp_tipos = config.QST_TIPOS
 lkp_niveis = config.QST_NIVEIS
 lkp_areas = config.QST_AREAS
 salvar = False
+existente = 0  # Questão salva com a mesma ementa, oferecida antes de gerar
+existente_texto = ""
 
 prompt = ""
 resultado = ""
 
+lote_tipos = []
+lote_niveis = []
+lote_areas = []
+lote_por_chamada = config.BATCH_QUESTIONS_PER_CALL
+lote = []
+lote_salvar = False
+lote_progresso = ""
+lote_resultados = pd.DataFrame(columns=["tipo", "nivel", "area", "status"])
+
 # Definição Pagina
 gen_q_md = Markdown(
     """<|container|
@@ -87,26 +268,52 @@ gen_q_md = Markdown(
 <|c3|
 <|{area}|selector|lov={lkp_areas}|dropdown|label=Selecione a Área da Questão|class_name=fullwidth|>
 <br/>
-<|{objetivo}|input|label="Descreva os conteúdos que a questão deve abordar:"|multiline=true|class_name=fullwidth|>
+<|{objetivo}|input|label="Descreva os conteúdos que a questão deve abordar:"|multiline=true|on_change=buscar_existente|class_name=fullwidth|>
 |>
 <|c4|
-<|{tipo}|selector|lov={lkp_tipos}|dropdown|label=Selecione o Tipo da Questão|>
+<|{tipo}|selector|lov={lkp_tipos}|dropdown|label=Selecione o Tipo da Questão|on_change=buscar_existente|>
 <br/>
-<|{nivel}|selector|lov={lkp_niveis}|dropdown|label=Selecione o Nível da Questão|>
+<|{nivel}|selector|lov={lkp_niveis}|dropdown|label=Selecione o Nível da Questão|on_change=buscar_existente|>
 <br/>
 Inclui Introdução?<br/><|{tem_introducao}|toggle|lov=Sim;Não|>
 <br/>
 Inclui Resposta?<br/><|{tem_resposta}|toggle|lov=Sim;Não|>
+<br/>
+Saída Estruturada?<br/><|{estruturada}|toggle|lov=Sim;Não|>
 |>
 |>
 
 <br/>
 <center><|Gerar Questão|button|on_action=send_question|> <|Salvar Questão|button|on_action=send_database|active={salvar}|></center>
+<center><|{existente_texto}|text|> <|Usar Questão Existente|button|on_action=usar_existente|active={existente > 0}|></center>
 <br/>
 <br/>
 <|{prompt}|input|multiline|label=Prompt|class_name=fullwidth|>
 <br/>
 <|{resultado}|input|multiline|label=Resultado|class_name=fullwidth|>
+
+---
+## Geração em Lote
+
+<|layout|columns=1fr 1fr 1fr|gap=5px|class_name=card|
+<|c5|
+<|{lote_tipos}|selector|lov={lkp_tipos}|multiple|dropdown|label=Tipos|class_name=fullwidth|>
+|>
+<|c6|
+<|{lote_niveis}|selector|lov={lkp_niveis}|multiple|dropdown|label=Níveis|class_name=fullwidth|>
+|>
+<|c7|
+<|{lote_areas}|selector|lov={lkp_areas}|multiple|dropdown|label=Áreas|class_name=fullwidth|>
+|>
+|>
+
+<br/>
+Questões por chamada ao modelo<br/><|{lote_por_chamada}|slider|min=1|max=8|>
+<br/>
+<center><|Gerar Lote|button|on_action=send_batch|> <|Salvar Lote|button|on_action=send_batch_database|active={lote_salvar}|></center>
+<br/>
+<|{lote_progresso}|text|>
+<|{lote_resultados}|table|columns=tipo;nivel;area;status|page_size=15|class_name=fullwidth|>
 |>
 """
 )
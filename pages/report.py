@@ -1,38 +1,69 @@
 # -*- coding: utf-8 -*-
-import os
-from taipy.gui import notify, Markdown
-from supabase import create_client, Client
+from taipy.gui import notify, Markdown, get_state_id
 import pandas as pd
 
+from utils import metrics
+from utils.background import run_in_background
+from utils.stats import counts
 
-def return_dados():
-    tbl = None
-    df = None
-    try:
-        tbl = supabase.table("questoes_gemini").select("*").order("id").execute()
-        df = pd.DataFrame(tbl.data)
-    except:
-        pass
-    return df
+
+def return_contagens():
+    return (
+        counts.frame("area"),
+        counts.frame("tipo"),
+        counts.frame("nivel"),
+        counts.frame("dia"),
+    )
+
+
+def contagens_vazias():
+    return tuple(
+        pd.DataFrame(columns=[dim, "contagem_ids"])
+        for dim in ("area", "tipo", "nivel", "dia")
+    )
 
 
 # Definição de Variável
-url: str = os.environ.get("SUPABASE_URL")
-key: str = os.environ.get("SUPABASE_KEY")
-supabase: Client = create_client(url, key)
-dados = return_dados()
-areas = dados.groupby("area")["id"].count().reset_index()
-areas.rename(columns={"id": "contagem_ids"}, inplace=True)
-tipos = dados.groupby("tipo")["id"].count().reset_index()
-tipos.rename(columns={"id": "contagem_ids"}, inplace=True)
+areas, tipos, niveis, dias = contagens_vazias()
+desempenho = metrics.registry.summary()  # Chamadas aos modelos neste processo
+status = "Carregando..."
+sessoes_carregadas = set()  # Sessões que já carregaram o dashboard
+
+
+def carregar(state):
+    """
+    Carrega as contagens em segundo plano na primeira visita da sessão.
+    """
+    state_id = get_state_id(state)
+    if state_id in sessoes_carregadas:
+        return
+    sessoes_carregadas.add(state_id)
+    run_in_background(state, carregar_contagens)
+
+
+def carregar_contagens(update):
+    try:
+        update(aplicar_contagens, *return_contagens())
+    except Exception:
+        update(falha_contagens)
+
+
+def aplicar_contagens(state, areas, tipos, niveis, dias):
+    state.areas, state.tipos, state.niveis, state.dias = areas, tipos, niveis, dias
+    state.desempenho = metrics.registry.summary()
+    state.status = ""
+
+
+def falha_contagens(state):
+    state.status = "Erro ao carregar os dados"
 
 
 def refresh_dados(state):
-    state.dados = return_dados()
-    state.areas = state.dados.groupby("area")["id"].count().reset_index()
-    state.areas.rename(columns={"id": "contagem_ids"}, inplace=True)
-    state.tipos = state.dados.groupby("tipo")["id"].count().reset_index()
-    state.tipos.rename(columns={"id": "contagem_ids"}, inplace=True)
+    try:
+        counts.load()
+        aplicar_contagens(state, *return_contagens())
+    except:
+        notify(state, "error", "Erro ao atualizar os dados")
 
 
 # Definição Pagina
@@ -42,14 +73,31 @@ sum_q_md = Markdown(
 # Dashboard
 
 <center><|Atualizar|button|on_action=refresh_dados|></center>
+<center><|{status}|text|></center>
 
-<|layout|columns=1fr 1fr|gap=5px|class_name=card|
+<|layout|columns=1fr 1fr 1fr|gap=5px|class_name=card|
 <|c1|
 <|{areas}|chart|type=pie|values=contagem_ids|labels=area|>
 |>
 <|c2|
 <|{tipos}|chart|type=pie|values=contagem_ids|labels=tipo|>
 |>
+<|c3|
+<|{niveis}|chart|type=pie|values=contagem_ids|labels=nivel|>
+|>
+|>
+<|layout|columns=1fr|gap=5px|class_name=card|
+<|c4|
+<|{dias}|chart|type=bar|x=dia|y=contagem_ids|>
+|>
+|>
+
+## Desempenho dos Modelos
+
+<|layout|columns=1fr|gap=5px|class_name=card|
+<|c5|
+<|{desempenho}|table|page_size=10|>
+|>
 |>
 |>
 """
@@ -1,18 +1,28 @@
 # -*- coding: utf-8 -*-
 import os
 from taipy.gui import Gui, notify, Markdown
-from supabase import create_client, Client
 
 import utils.gemini as genai
 import utils.config as config
+from utils import metrics, plagiarism
+from utils.background import run_async
+
+
+def carregar(state):
+    # O índice de plágio carrega em segundo plano na primeira visita
+    plagiarism.index.warmup()
 
 
 def validar_plagio(state, id, action):
+    # Triagem local: o Gemini só é consultado quando ela é inconclusiva
+    triagem = plagiarism.index.screen(state.conteudo)
+    relatorio = plagiarism.report(triagem)
+    conclusiva = triagem["veredito"] != plagiarism.INCONCLUSIVO
+    if conclusiva and state.sempre_gemini == "Não":
+        state.resultado = relatorio
+        notify(state, "success", "Verificação concluída!")
+        return
     state.resultado = "Waiting ..."
-    resultado = None
-
-    gemini = genai.Gemini()
-    gemini.set_key(os.getenv("GEMINIAI_API_KEY"))
     prompt = f"""
     Dado o conteúdo abaixo, verifique se existe plágio. Os resultados possíveis são: 
     - O texto contem plágio, e aponte que trechos são plágio e se possível, qual é a fonte original; 
@@ -21,28 +31,43 @@ def validar_plagio(state, id, action):
     - O texto é completamente original:
     {state.conteudo}
     """
-    resultado = gemini.complete(prompt)
-    if resultado:
-        state.resultado = resultado
-        notify(state, "success", "Geração de código concluída!")
-    else:
-        state.resultado = "Erro ao utilizar o Gemini. Verifique o Log"
-        notify(state, "failure", "Código não gerado!")
+    if triagem["correspondencias"]:
+        prompt += f"""
+    Considere também os trechos semelhantes encontrados no banco de questões e no corpus de referência:
+    {relatorio}
+    """
+    run_async(
+        state,
+        validar,
+        prompt,
+        "Plágio",
+        relatorio,
+        on_error=(concluir_validacao, None, relatorio),
+    )
 
 
 def validar_iacont(state, id, action):
     state.resultado = "Waiting ..."
-    resultado = None
-
-    gemini = genai.Gemini()
-    gemini.set_key(os.getenv("GEMINIAI_API_KEY"))
     prompt = f"""
     Dado o conteúdo abaixo, verifique se ele foi gerado por uma IA generativa. Aponte que trechos são indicativos de que o conteudo foi gerado por uma IA generativa:
     {state.conteudo}
     """
-    resultado = gemini.complete(prompt)
+    run_async(
+        state, validar, prompt, "Conteúdo IA", on_error=(concluir_validacao, None)
+    )
+
+
+async def validar(update, prompt, tipo, relatorio=""):
+    gemini = genai.Gemini()
+    model = gemini.get_model(os.getenv("GEMINIAI_API_KEY"))
+    with metrics.labels(pagina="Validar", tipo=tipo):
+        resultado = await gemini.acomplete(prompt, model)
+    update(concluir_validacao, resultado, relatorio)
+
+
+def concluir_validacao(state, resultado, relatorio=""):
     if resultado:
-        state.resultado = resultado
+        state.resultado = f"{relatorio}\n\n{resultado}" if relatorio else resultado
         notify(state, "success", "Geração de código concluída!")
     else:
         state.resultado = "Erro ao utilizar o Gemini. Verifique o Log"
@@ -52,6 +77,7 @@ def validar_iacont(state, id, action):
 # Definição de Variável
 conteudo = ""
 resultado = ""
+sempre_gemini = "Não"  # Consulta o Gemini mesmo com a triagem local conclusiva
 
 # Definição Pagina
 val_q_md = Markdown(
@@ -64,6 +90,8 @@ val_q_md = Markdown(
 <|{conteudo}|input|label="Cole aqui o seu conteúdo:"|multiline=true|class_name=fullwidth|>
 |>
 <br/>
+Sempre consultar o Gemini?<br/><|{sempre_gemini}|toggle|lov=Sim;Não|>
+<br/>
 <center><|Validar Plagio|button|on_action=validar_plagio|><|Validar IA Ger|button|on_action=validar_iacont|></center>
 <br/>
 <br/>
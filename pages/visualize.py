@@ -1,41 +1,83 @@
 # -*- coding: utf-8 -*-
-import os
+import math
+from datetime import datetime
 
-from taipy.gui import notify, Markdown
+from taipy.gui import notify, Markdown, get_state_id, invoke_long_callback
 import pandas as pd
 from utils.ppt import create_presentation
-from supabase import create_client, Client
+from utils import database, schemas, search, sync
+from utils.background import run_in_background
 
+# Colunas exibidas na tabela; o resultado só é carregado ao abrir a questão
+COLUNAS = ["id", "area", "tipo", "nivel"]
+PAGE_SIZE = 15
+TEMPLATE = "template/Questoes_Desafio.pptx"
+COLUNAS_BASE = ["id", "area", "tipo", "nivel", "resultado"]
+COLUNAS_EXPORTACAO = ",".join([*COLUNAS_BASE, *schemas.CAMPOS])
+
+
+def selecionar_questao(state, var_name, payload):
+    if payload["col"] != "selecionado":
+        return
+    selecionadas = [i for i in state.linhas_selecionadas if i != payload["index"]]
+    if payload["value"]:
+        selecionadas.append(payload["index"])
+    state.linhas_selecionadas = selecionadas
+    dados = state.dados.copy()
+    dados.loc[payload["index"], "selecionado"] = bool(payload["value"])
+    state.dados = dados
+    state.selecao_label = texto_selecao(selecionadas)
 
-def on_checkbox_change(state, linha):
-    global linhas_selecionadas
-    if state:
-        linhas_selecionadas.append(linha["id"])
-    else:
-        linhas_selecionadas.remove(linha["id"])
+
+def formatar_dados(linhas):
+    df = pd.DataFrame(linhas, columns=COLUNAS)
+    df["label"] = "Questão " + df["id"].astype(str)
+    df["selecionado"] = False
+    df.set_index("id", inplace=True)
+    df.index.name = "index"
+    return df
 
 
-def return_dados():
-    tbl = None
-    df = None
+def return_dados(pagina=0, busca=""):
+    """
+    Retorna a página de questões (apenas as colunas exibidas) e o total; com
+    uma busca, a página dos resultados em ordem de relevância.
+    """
+    df = formatar_dados([])
+    total = 0
     try:
-        supabase: Client = create_client(url, key)
-        tbl = supabase.table("questoes_gemini").select("*").order("id").execute()
-        df = pd.DataFrame(tbl.data)
-        df["label"] = "Questão " + df["id"].astype(str)
-        df["selecionado"] = False
-        df.set_index("id", inplace=True)
-        df.index.name = "index"
+        if busca:
+            linhas, total = search.index.search(busca, pagina * PAGE_SIZE, PAGE_SIZE)
+        else:
+            linhas, total = database.list_page(
+                pagina * PAGE_SIZE, PAGE_SIZE, ",".join(COLUNAS)
+            )
+        df = formatar_dados(linhas)
     except:
         pass
-    return df
+    return df, total
+
+
+def texto_selecao(selecionadas):
+    if not selecionadas:
+        return "Nenhuma questão selecionada: exporta todas"
+    return f"{len(selecionadas)} questão(ões) selecionada(s)"
+
+
+def nome_arquivo():
+    return f"questoes_{datetime.now():%Y%m%d_%H%M%S}.pptx"
+
+
+def texto_pagina(pagina, total, busca=""):
+    texto = f"Página {pagina + 1} de {max(1, math.ceil(total / PAGE_SIZE))}"
+    return f"{texto} ({total} resultado(s))" if busca else texto
 
 
 # Definição de Variável
-url: str = os.environ.get("SUPABASE_URL")
-key: str = os.environ.get("SUPABASE_KEY")
-supabase: Client = create_client(url, key)
-dados = return_dados()
+pagina = 0
+total = 0
+dados = formatar_dados([])
+pagina_label = "Carregando..."
 link = ""
 content = None
 download_active = False
@@ -44,18 +86,150 @@ display_index = None
 display_area = None
 display_label = None
 linhas_selecionadas = []  # Armazena os IDs das linhas selecionadas
+selecao_label = texto_selecao(linhas_selecionadas)
+busca = ""
+busca_ativa = ""  # Busca aplicada à tabela ("" lista todas as questões)
+exportando = False
+export_status = ""
+sessoes_carregadas = set()  # Sessões que já carregaram a página
+
+
+def carregar(state):
+    """
+    Carrega a primeira página em segundo plano na primeira visita da sessão.
+    """
+    state_id = get_state_id(state)
+    if state_id in sessoes_carregadas:
+        return
+    sessoes_carregadas.add(state_id)
+    run_in_background(state, carregar_pagina, 0)
+    # O índice de busca carrega em segundo plano
+    search.index.warmup()
+
+
+def carregar_pagina(update, pagina):
+    dados, total = return_dados(pagina)
+    update(aplicar_pagina, pagina, dados, total)
+
+
+def aplicar_pagina(state, pagina, dados, total):
+    dados["selecionado"] = dados.index.isin(state.linhas_selecionadas)
+    state.dados, state.total = dados, total
+    state.pagina = pagina
+    state.pagina_label = texto_pagina(pagina, total, state.busca_ativa)
+
+
+def mostrar_pagina(state, pagina):
+    dados, total = return_dados(pagina, state.busca_ativa)
+    aplicar_pagina(state, pagina, dados, total)
+
+
+def buscar(state):
+    # Carrega o índice ou atualiza o espelho em segundo plano
+    search.index.warmup()
+    if state.busca.strip() and not search.index.loaded:
+        notify(state, "info", "Carregando o índice de busca, tente novamente")
+        return
+    state.busca_ativa = state.busca.strip()
+    mostrar_pagina(state, 0)
+
+
+def limpar_busca(state):
+    state.busca = ""
+    state.busca_ativa = ""
+    mostrar_pagina(state, 0)
 
 
 def refresh_dados(state):
-    state.dados = return_dados()
+    search.index.warmup()
+    mostrar_pagina(state, state.pagina)
+
+
+def pagina_anterior(state):
+    if state.pagina > 0:
+        mostrar_pagina(state, state.pagina - 1)
+
+
+def pagina_proxima(state):
+    if (state.pagina + 1) * PAGE_SIZE < state.total:
+        mostrar_pagina(state, state.pagina + 1)
 
 
 def exportar_ppt(state):
-    create_presentation(state.dados, "template/Questoes_Desafio.pptx", "questoes.pptx")
-    state.content = open("questoes.pptx", "rb").read()
-    state.download_active = True
-    state.link = "questoes.pptx"
-    notify(state, "success", "Powerpoint Gerado!")
+    progresso = {"feitos": 0, "total": 0}
+    state.exportando = True
+    state.download_active = False
+    state.export_status = "Exportando..."
+    invoke_long_callback(
+        state,
+        gerar_ppt,
+        [list(state.linhas_selecionadas), progresso],
+        status_exportacao,
+        [progresso],
+        period=1000,
+    )
+
+
+def texto_questao(linha):
+    """
+    Texto da caixa "questao": montado dos campos estruturados, a menos que o
+    resultado tenha sido editado depois da geração.
+    """
+    campos = {campo: linha.get(campo) for campo in schemas.CAMPOS if linha.get(campo)}
+    if campos and linha["resultado"] == schemas.render(campos):
+        return schemas.render(campos, markdown=False)
+    return linha["resultado"]
+
+
+def ler_questoes(ids, colunas):
+    if ids:
+        return database.list_questions_by_ids(ids, colunas)
+    return database.list_questions(colunas)
+
+
+def gerar_ppt(ids, progresso):
+    """
+    Gera o Powerpoint fora da thread da interface: apenas as questões
+    selecionadas ou, sem seleção, todas as questões.
+    """
+    try:
+        linhas = ler_questoes(ids, COLUNAS_EXPORTACAO)
+    except Exception:
+        # Banco sem as colunas da saída estruturada (o PostgREST recusa
+        # colunas desconhecidas): sql/questoes_gemini_campos.sql não aplicado
+        linhas = ler_questoes(ids, ",".join(COLUNAS_BASE))
+    progresso["total"] = len(linhas)
+    questoes = formatar_dados(linhas)
+    questoes["resultado"] = [texto_questao(linha) for linha in linhas]
+    # Campos da saída estruturada, lidos das colunas (vazios nas demais)
+    for campo in schemas.CAMPOS:
+        questoes[campo] = [
+            schemas.format_campo(campo, linha[campo]) if linha.get(campo) else ""
+            for linha in linhas
+        ]
+
+    def on_progress(feitos, total):
+        progresso["feitos"] = feitos
+
+    return create_presentation(questoes, TEMPLATE, on_progress=on_progress)
+
+
+def status_exportacao(state, status, progresso, resultado=None):
+    if isinstance(status, bool):
+        state.exportando = False
+        if status:
+            state.content = resultado
+            state.link = nome_arquivo()
+            state.download_active = True
+            state.export_status = f"{progresso['total']} questões exportadas"
+            notify(state, "success", "Powerpoint Gerado!")
+        else:
+            state.export_status = ""
+            notify(state, "error", "Erro ao gerar o Powerpoint")
+    elif progresso["total"]:
+        state.export_status = (
+            f"Exportando {progresso['feitos']}/{progresso['total']} questões..."
+        )
 
 
 def download_start(state):
@@ -63,29 +237,38 @@ def download_start(state):
 
 
 def delete_questao(state, var_name, payload):
-    data = (
-        supabase.table("questoes_gemini").delete().eq("id", payload["index"]).execute()
-    )
-    state.dados = return_dados()
+    # A linha apagada vem completa do banco (com created_at, para o Dashboard)
+    questao = database.delete_question(payload["index"]) or {
+        "id": payload["index"],
+        **state.dados.loc[payload["index"]].to_dict(),
+    }
+    sync.questions.apply_delete(payload["index"], questao)
+    if payload["index"] in state.linhas_selecionadas:
+        state.linhas_selecionadas = [
+            i for i in state.linhas_selecionadas if i != payload["index"]
+        ]
+        state.selecao_label = texto_selecao(state.linhas_selecionadas)
+    if len(state.dados) == 1 and state.pagina > 0:
+        mostrar_pagina(state, state.pagina - 1)
+    else:
+        mostrar_pagina(state, state.pagina)
     state.download_active = False
     notify(state, "success", "Questão removida!")
 
 
 def show_resultado(state, var_name, payload):
+    questao = database.get_question(payload["index"], "resultado")
     state.display_index = payload["index"]
-    state.display_resultado = state.dados["resultado"][payload["index"]]
+    state.display_resultado = questao["resultado"] if questao else None
     state.display_area = state.dados["area"][payload["index"]]
     state.display_label = state.dados["label"][payload["index"]]
 
 
 def salvar_questao(state):
-    data = (
-        supabase.table("questoes_gemini")
-        .update({"resultado": state.display_resultado})
-        .eq("id", state.display_index)
-        .execute()
+    questao = database.update_question(
+        state.display_index, {"resultado": state.display_resultado}
     )
-    state.dados = return_dados()
+    sync.questions.apply_update(questao)
     state.download_active = False
     notify(state, "success", "Questão alterada!")
 
@@ -98,13 +281,17 @@ tbl_q_md = Markdown(
 
 <|layout|columns=1fr|gap=5px|class_name=card|
 <|c1|
-<center><|Atualizar|button|on_action=refresh_dados|> <|Exportar|button|on_action=exportar_ppt|> 
+<center><|Atualizar|button|on_action=refresh_dados|> <|Exportar|button|on_action=exportar_ppt|active={not exportando}|> 
 <|{content}|file_download|label=Download|name={link}|active={download_active}|on_action=download_start|></center>
+<center><|{selecao_label}|text|> <|{export_status}|text|></center>
 |>
 |>
 <|layout|columns=475px 1fr|gap=5px|class_name=card|
 <|c2|
-<|{dados}|table|page_size=15|columns=label;nivel;tipo|class_name=fullwidth|editable=True|on_delete=delete_questao|on_action=show_resultado|>
+<|{busca}|input|label=Buscar questões|on_action=buscar|class_name=fullwidth|>
+<center><|Buscar|button|on_action=buscar|> <|Limpar|button|on_action=limpar_busca|></center>
+<|{dados}|table|page_size=15|columns=selecionado;label;nivel;tipo|class_name=fullwidth|editable=True|editable[label]=False|editable[nivel]=False|editable[tipo]=False|on_edit=selecionar_questao|on_delete=delete_questao|on_action=show_resultado|>
+<center><|Anterior|button|on_action=pagina_anterior|> <|{pagina_label}|text|> <|Próxima|button|on_action=pagina_proxima|></center>
 |>
 <|c3|
 <|{display_label}|text|><br/>
@@ -0,0 +1,16 @@
+-- Contagens pré-agregadas do Dashboard (utils/stats.py), chamadas via
+-- supabase.rpc("questoes_contagens"): uma linha por (dimensão, valor).
+create or replace function questoes_contagens()
+returns table (dimensao text, valor text, contagem bigint)
+language sql
+stable
+as $$
+  select 'area', area, count(*) from questoes_gemini group by area
+  union all
+  select 'tipo', tipo, count(*) from questoes_gemini group by tipo
+  union all
+  select 'nivel', nivel, count(*) from questoes_gemini group by nivel
+  union all
+  select 'dia', to_char(created_at, 'YYYY-MM-DD'), count(*)
+    from questoes_gemini group by 2;
+$$;
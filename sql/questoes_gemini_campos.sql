@@ -0,0 +1,16 @@
+-- Campos da saída estruturada (utils/schemas.py): preenchidos quando a
+-- questão é gerada com um esquema JSON; nulos nas questões em texto livre,
+-- que continuam apenas com a coluna resultado.
+alter table questoes_gemini
+  add column if not exists introducao text,
+  add column if not exists enunciado text,
+  add column if not exists codigo text,
+  add column if not exists alternativas jsonb,
+  add column if not exists resposta_correta text,
+  add column if not exists explicacao text,
+  add column if not exists competencias_bncc jsonb,
+  add column if not exists objetivos_bloom jsonb;
+
+-- Consultas por competência, p.ex. competencias_bncc @> '[{"numero": 5}]'
+create index if not exists questoes_gemini_competencias_bncc_idx
+  on questoes_gemini using gin (competencias_bncc jsonb_path_ops);
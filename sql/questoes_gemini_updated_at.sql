@@ -0,0 +1,22 @@
+-- Coluna updated_at usada pela sincronização incremental (utils/sync.py)
+-- para buscar apenas as questões alteradas desde a última atualização.
+alter table questoes_gemini
+  add column if not exists updated_at timestamptz not null default now();
+
+create index if not exists questoes_gemini_updated_at_idx
+  on questoes_gemini (updated_at);
+
+create or replace function questoes_gemini_touch_updated_at()
+returns trigger
+language plpgsql
+as $$
+begin
+  new.updated_at = now();
+  return new;
+end;
+$$;
+
+drop trigger if exists questoes_gemini_updated_at on questoes_gemini;
+create trigger questoes_gemini_updated_at
+  before update on questoes_gemini
+  for each row execute function questoes_gemini_touch_updated_at();
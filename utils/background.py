@@ -0,0 +1,105 @@
+"""Helpers to run page work off the Taipy callback thread."""
+
+# Import from standard library
+import asyncio
+import logging
+import threading
+import time
+
+# Import from 3rd party libraries
+from taipy.gui import get_state_id, invoke_callback
+
+_loop = None
+_loop_lock = threading.Lock()
+
+
+def _updater(state):
+    gui = state.get_gui()
+    state_id = get_state_id(state)
+
+    def update(callback, *cb_args):
+        invoke_callback(gui, state_id, callback, list(cb_args), callback.__module__)
+
+    return update
+
+
+def run_in_background(state, target, *args) -> threading.Thread:
+    """
+    Runs target(update, *args) in a daemon thread and returns it.
+    `update(callback, *cb_args)` schedules callback(state, *cb_args) on the
+    session that started the task, so results land in the right state. The
+    callback runs in the context of the module that defines it, so it can be
+    started from any page (or from main.py).
+    """
+    update = _updater(state)
+    thread = threading.Thread(target=target, args=(update, *args), daemon=True)
+    thread.start()
+    return thread
+
+
+def get_loop() -> asyncio.AbstractEventLoop:
+    """
+    Returns the process-wide event loop, running in a daemon thread.
+    """
+    global _loop
+    if _loop is None:
+        with _loop_lock:
+            if _loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(
+                    target=loop.run_forever, name="genai-loop", daemon=True
+                ).start()
+                _loop = loop
+    return _loop
+
+
+def run_async(state, target, *args, on_error: tuple = None):
+    """
+    Same as run_in_background for a coroutine function: target(update, *args)
+    runs as a task on the shared event loop, so many generations wait on the
+    providers concurrently without holding a thread each. When the task
+    raises, `on_error` (callback, *cb_args) is scheduled like an update, so
+    the page leaves its waiting state.
+    Returns a concurrent.futures.Future of the task.
+    """
+    update = _updater(state)
+    future = asyncio.run_coroutine_threadsafe(
+        _guarded(target(update, *args), update, on_error), get_loop()
+    )
+    future.add_done_callback(_log_failure)
+    return future
+
+
+async def _guarded(coroutine, update, on_error: tuple):
+    try:
+        return await coroutine
+    except Exception:
+        if on_error is None:
+            raise
+        logging.exception("Background task failed")
+        update(*on_error)
+
+
+def _log_failure(future):
+    if not future.cancelled() and future.exception():
+        logging.error(f"Background task failed: {future.exception()!r}")
+
+
+def throttle(chunks, interval: float = 0.25):
+    """
+    Accumulates streamed text chunks and yields the text received so far at
+    most once per `interval` seconds (plus once at the end).
+    """
+    text = ""
+    pending = False
+    last = 0.0
+    for chunk in chunks:
+        text += chunk
+        pending = True
+        now = time.monotonic()
+        if now - last >= interval:
+            last = now
+            pending = False
+            yield text
+    if pending:
+        yield text
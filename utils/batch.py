@@ -0,0 +1,161 @@
+"""Batch question generation."""
+
+# Import from standard library
+import itertools
+import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import utils.config as config
+from utils import database, metrics, prompts, schemas, sync
+from utils.gemini import Gemini
+from utils.router import get_router
+
+
+def build_matrix(tipos: list, niveis: list, areas: list) -> list:
+    """
+    Returns the cartesian product tipo x nivel x area as a list of items.
+    """
+    return [
+        {"tipo": tipo, "nivel": nivel, "area": area}
+        for tipo, nivel, area in itertools.product(tipos, niveis, areas)
+    ]
+
+
+def generate_batch(
+    objetivo: str,
+    itens: list,
+    tem_introducao: str = "Sim",
+    tem_resposta: str = "Sim",
+    max_workers: int = config.BATCH_MAX_WORKERS,
+    on_progress=None,
+    por_chamada: int = config.BATCH_QUESTIONS_PER_CALL,
+) -> list:
+    """Generates the questions of the items over a bounded worker pool.
+    With por_chamada=1 each question is one call to the fastest healthy
+    provider (see utils.router). With por_chamada > 1 consecutive items are
+    asked to Gemini `por_chamada` at a time, in the structured output mode
+    (see utils.schemas), so the shared prompt prefix is paid once per call;
+    questions missing from a response are generated again one by one.
+    The calls share the process-wide quotas and retries (see
+    utils.resilience) with the interactive pages.
+    Args:
+        objetivo: ementa shared by every question
+        itens: list of {"tipo", "nivel", "area"} dicts (see build_matrix)
+        max_workers: maximum number of concurrent model calls
+        on_progress: optional callback(concluidos, total, idx, item) called as
+            each item finishes
+        por_chamada: questions asked in each model call
+    Return: items, in input order, with "prompt", "resultado", "campos"
+        (structured fields, or None) and "erro" keys
+    """
+    router = get_router()
+
+    def _resultado(item, prompt, resultado, campos=None):
+        return {
+            **item,
+            "prompt": prompt,
+            "resultado": resultado,
+            "campos": campos,
+            "erro": None if resultado else "Erro ao utilizar o modelo",
+        }
+
+    def _generate(item):
+        prompt = Gemini.build_prompt(
+            item["nivel"],
+            objetivo,
+            item["tipo"],
+            item["area"],
+            tem_introducao,
+            tem_resposta,
+        )
+        with metrics.labels(pagina="Gerador", tipo=item["tipo"]):
+            resultado = router.complete(prompt)
+        return _resultado(item, prompt, resultado)
+
+    def _generate_structured(item):
+        prompt = Gemini.build_prompt(
+            item["nivel"],
+            objetivo,
+            item["tipo"],
+            item["area"],
+            tem_introducao,
+            tem_resposta,
+            estruturada=True,
+        )
+        with metrics.labels(pagina="Gerador", tipo=item["tipo"]):
+            campos = Gemini.complete_structured(
+                prompt, item["tipo"], tem_introducao, tem_resposta
+            )
+        return _resultado(item, prompt, campos and schemas.render(campos), campos)
+
+    def _generate_group(grupo):
+        if len(grupo) == 1:
+            if por_chamada == 1:
+                return [_generate(grupo[0])]
+            return [_generate_structured(grupo[0])]
+        chave = tuple((item["tipo"], item["nivel"], item["area"]) for item in grupo)
+        prompt = prompts.render_lote(objetivo, chave, tem_introducao, tem_resposta)
+        with metrics.labels(pagina="Gerador", tipo="lote"):
+            questoes = Gemini.complete_structured_batch(
+                prompt.text, chave, tem_introducao, tem_resposta
+            )
+        questoes = questoes or [None] * len(grupo)
+        return [
+            (
+                _resultado(item, prompt.text, schemas.render(campos), campos)
+                if campos
+                else _generate_structured(item)
+            )
+            for item, campos in zip(grupo, questoes)
+        ]
+
+    por_chamada = max(1, por_chamada)
+    grupos = [
+        list(range(inicio, min(inicio + por_chamada, len(itens))))
+        for inicio in range(0, len(itens), por_chamada)
+    ]
+    resultados = [None] * len(itens)
+    concluidos = 0
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            executor.submit(_generate_group, [itens[idx] for idx in grupo]): grupo
+            for grupo in grupos
+        }
+        for future in as_completed(futures):
+            grupo = futures[future]
+            try:
+                gerados = future.result()
+            except Exception as e:
+                logging.error(f"Batch item failed: {e}")
+                gerados = [
+                    {**itens[idx], "resultado": None, "campos": None, "erro": str(e)}
+                    for idx in grupo
+                ]
+            for idx, gerado in zip(grupo, gerados):
+                resultados[idx] = gerado
+                concluidos += 1
+                if on_progress:
+                    on_progress(concluidos, len(itens), idx, gerado)
+    return resultados
+
+
+def save_batch(resultados: list) -> int:
+    """
+    Bulk-inserts the successful results into questoes_gemini.
+    Return: number of inserted questions
+    """
+    linhas = [
+        {
+            "area": item["area"],
+            "tipo": item["tipo"],
+            "nivel": item["nivel"],
+            "prompt": item["prompt"],
+            "resultado": item["resultado"],
+            **(item.get("campos") or {}),
+        }
+        for item in resultados
+        if item and item.get("resultado")
+    ]
+    questoes = database.insert_questions(linhas)
+    sync.questions.apply_insert(*questoes)
+    return len(questoes)
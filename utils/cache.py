@@ -0,0 +1,155 @@
+"""Persistent response cache for the LLM connectors."""
+
+# Import from standard library
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+
+import utils.config as config
+
+
+class ResponseCache:
+    """Content-addressed response cache backed by SQLite.
+    Entries are keyed on a hash of (provider, model, generation config, prompt),
+    expire after `ttl` seconds and are evicted in LRU order once the cache holds
+    more than `max_entries` responses.
+    Attributes:
+      hits, misses: lookup counters since the cache was opened.
+    """
+
+    def __init__(self, path: str, max_entries: int = 5000, ttl: int = 604800):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                response TEXT NOT NULL,
+                created REAL NOT NULL,
+                accessed REAL NOT NULL
+            )""")
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_responses_accessed ON responses(accessed)"
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(
+        prompt: str, model: str, generation_config: any = None, provider: str = ""
+    ) -> str:
+        """
+        Returns the cache key for a prompt sent to a model with a given config.
+        """
+        payload = json.dumps(
+            {
+                "provider": provider,
+                "model": model,
+                "config": generation_config,
+                "prompt": prompt,
+            },
+            sort_keys=True,
+            ensure_ascii=False,
+            default=str,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> str:
+        """
+        Returns the cached response for the key, or None on a miss.
+        """
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response, created FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or now - row[1] > self.ttl:
+                if row is not None:
+                    self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    self._conn.commit()
+                self.misses += 1
+                return None
+            self._conn.execute(
+                "UPDATE responses SET accessed = ? WHERE key = ?", (now, key)
+            )
+            self._conn.commit()
+            self.hits += 1
+            return row[0]
+
+    def set(self, key: str, response: str):
+        """
+        Stores a response and evicts the least recently used entries.
+        """
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?)",
+                (key, response, now, now),
+            )
+            excess = (
+                self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+                - self.max_entries
+            )
+            if excess > 0:
+                self._conn.execute(
+                    """DELETE FROM responses WHERE key IN (
+                        SELECT key FROM responses ORDER BY accessed LIMIT ?
+                    )""",
+                    (excess,),
+                )
+            self._conn.commit()
+
+    def clear(self):
+        """
+        Removes every cached response and resets the counters.
+        """
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> dict:
+        """
+        Returns hit/miss counters and the number of stored entries.
+        """
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": entries,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache() -> ResponseCache:
+    """
+    Returns the process-wide response cache, or None when it is disabled
+    (config.CACHE_PATH not set).
+    """
+    global _cache
+    if not config.CACHE_PATH:
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                try:
+                    _cache = ResponseCache(
+                        config.CACHE_PATH, config.CACHE_MAX_ENTRIES, config.CACHE_TTL
+                    )
+                except sqlite3.Error as e:
+                    logging.error(f"Response cache unavailable: {e}")
+                    return None
+    return _cache
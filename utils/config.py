@@ -1,3 +1,78 @@
+import os
+
+GEMINI_MODEL = "gemini-1.5-pro"
+OPENAI_MODEL = "gpt-3.5-turbo-16k"
+
+# Endpoint e transporte ("rest" ou "grpc") da API do Gemini; apontar para
+# outro servidor permite rodar o app contra o loadtest/fake_llm.py
+GEMINI_API_ENDPOINT = os.getenv("GEMINI_API_ENDPOINT")
+GEMINI_TRANSPORT = os.getenv("GEMINI_TRANSPORT")
+
+# Cache de respostas (opt-in): defina GENAI_CACHE_PATH para ativar
+CACHE_PATH = os.getenv("GENAI_CACHE_PATH")
+CACHE_MAX_ENTRIES = int(os.getenv("GENAI_CACHE_MAX_ENTRIES", "5000"))
+CACHE_TTL = int(os.getenv("GENAI_CACHE_TTL", "604800"))
+
+# Linhas por requisição nas leituras da tabela inteira: não pode passar do
+# max-rows do PostgREST (1000 por padrão), que corta respostas maiores
+SUPABASE_PAGE_SIZE = int(os.getenv("SUPABASE_PAGE_SIZE", "1000"))
+
+# Sincronização da tabela: defina SUPABASE_REALTIME=1 para receber as
+# alterações pelo Supabase Realtime em vez de comparar a lista de ids
+SYNC_REALTIME = os.getenv("SUPABASE_REALTIME") == "1"
+# Idade máxima (segundos) do espelho antes de uma nova atualização em
+# segundo plano, pedida pelas páginas que o consultam
+SYNC_MAX_AGE = float(os.getenv("SYNC_MAX_AGE", "30"))
+
+# Detecção de questões quase idênticas: "flag" avisa ao salvar, "block"
+# impede o salvamento e "off" desativa; com DEDUP_PATH as assinaturas são
+# guardadas em disco (.npz) entre execuções
+DEDUP_MODE = os.getenv("DEDUP_MODE", "flag")
+DEDUP_PATH = os.getenv("DEDUP_PATH")
+DEDUP_THRESHOLD = float(os.getenv("DEDUP_THRESHOLD", "0.7"))
+DEDUP_EMENTA_THRESHOLD = float(os.getenv("DEDUP_EMENTA_THRESHOLD", "0.8"))
+
+# Triagem local de plágio (página Validar): o Gemini só é consultado quando
+# a maior similaridade fica entre PLAGIO_LIMIAR_ORIGINAL e PLAGIO_LIMIAR;
+# PLAGIO_CORPUS_DIR aponta para textos de referência (.txt ou .md)
+PLAGIO_CORPUS_DIR = os.getenv("PLAGIO_CORPUS_DIR")
+PLAGIO_LIMIAR = float(os.getenv("PLAGIO_LIMIAR", "0.5"))
+PLAGIO_LIMIAR_ORIGINAL = float(os.getenv("PLAGIO_LIMIAR_ORIGINAL", "0.05"))
+PLAGIO_MIN_FINGERPRINTS = int(os.getenv("PLAGIO_MIN_FINGERPRINTS", "10"))
+# Fingerprints presentes em mais documentos que isso são ignoradas
+PLAGIO_MAX_DF = int(os.getenv("PLAGIO_MAX_DF", "50"))
+
+# Busca textual (página Visualizar): índice FTS5 em memória, ou no arquivo
+# SQLite indicado em SEARCH_PATH
+SEARCH_PATH = os.getenv("SEARCH_PATH", ":memory:")
+# Resultados ordenados por relevância (os mais recentes, em buscas amplas)
+SEARCH_RANK_LIMIT = int(os.getenv("SEARCH_RANK_LIMIT", "10000"))
+
+# Geração em lote
+BATCH_MAX_WORKERS = int(os.getenv("BATCH_MAX_WORKERS", "8"))
+# Questões pedidas em cada chamada ao modelo (1 = uma chamada por questão)
+BATCH_QUESTIONS_PER_CALL = int(os.getenv("BATCH_QUESTIONS_PER_CALL", "4"))
+
+# Cotas dos provedores (chamadas e tokens por minuto), compartilhadas pelo processo
+GEMINI_RPM = int(os.getenv("GEMINI_RPM", "60"))
+GEMINI_TPM = int(os.getenv("GEMINI_TPM", "1000000"))
+OPENAI_RPM = int(os.getenv("OPENAI_RPM", "60"))
+OPENAI_TPM = int(os.getenv("OPENAI_TPM", "180000"))
+
+# Novas tentativas com backoff exponencial e circuit breaker
+RETRY_ATTEMPTS = int(os.getenv("RETRY_ATTEMPTS", "4"))
+RETRY_BASE_DELAY = float(os.getenv("RETRY_BASE_DELAY", "1"))
+RETRY_MAX_DELAY = float(os.getenv("RETRY_MAX_DELAY", "30"))
+BREAKER_FAILURES = int(os.getenv("BREAKER_FAILURES", "5"))
+BREAKER_RESET = float(os.getenv("BREAKER_RESET", "30"))
+
+# Roteamento entre provedores: latências e erros das chamadas dos últimos
+# ROUTER_WINDOW segundos; ROUTER_HEDGE=0 desliga a requisição de reserva
+ROUTER_HEDGE = os.getenv("ROUTER_HEDGE", "1") != "0"
+ROUTER_WINDOW = float(os.getenv("ROUTER_WINDOW", "300"))
+ROUTER_MIN_SAMPLES = int(os.getenv("ROUTER_MIN_SAMPLES", "5"))
+ROUTER_MAX_ERROR_RATE = float(os.getenv("ROUTER_MAX_ERROR_RATE", "0.5"))
+
 QST_TIPOS = [
     "Escolha Simples",
     "Escolha Múltipla",
@@ -0,0 +1,216 @@
+"""Supabase data access for the questoes_gemini table."""
+
+# Import from standard library
+import asyncio
+import os
+import threading
+from typing import TypedDict
+
+# Import from 3rd party libraries
+from supabase import create_client, acreate_client, Client, AsyncClient
+
+import utils.config as config
+
+TABLE = "questoes_gemini"
+
+
+class Questao(TypedDict, total=False):
+    id: int
+    area: str
+    tipo: str
+    nivel: str
+    prompt: str
+    resultado: str
+    # Saída estruturada (utils/schemas.py); nulos nas questões em texto livre
+    introducao: str
+    enunciado: str
+    codigo: str
+    alternativas: list
+    resposta_correta: str
+    explicacao: str
+    competencias_bncc: list
+    objetivos_bloom: list
+
+
+# Um único cliente por processo: o pool HTTP (keep-alive) do PostgREST é
+# reaproveitado por todas as sessões em vez de abrir uma conexão por chamada
+_client = None
+_client_lock = threading.Lock()
+_async_client = None
+_async_client_lock = asyncio.Lock()
+
+
+def get_client() -> Client:
+    """
+    Returns the process-wide Supabase client.
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = create_client(
+                    os.environ.get("SUPABASE_URL"), os.environ.get("SUPABASE_KEY")
+                )
+    return _client
+
+
+async def get_async_client() -> AsyncClient:
+    """
+    Returns the process-wide async Supabase client.
+    """
+    global _async_client
+    if _async_client is None:
+        async with _async_client_lock:
+            if _async_client is None:
+                _async_client = await acreate_client(
+                    os.environ.get("SUPABASE_URL"), os.environ.get("SUPABASE_KEY")
+                )
+    return _async_client
+
+
+def _page(query, after: int, page_size: int):
+    # Paginação por chave: as linhas depois do último id lido, não um
+    # deslocamento que muda quando a tabela muda entre as páginas
+    if after is not None:
+        query = query.gt("id", after)
+    return query.order("id").range(0, page_size - 1)
+
+
+def _paged(build, page_size: int = None) -> list:
+    """
+    Runs the query returned by build() page by page, ordered by id, until a
+    page comes back short. PostgREST caps every response at its max-rows
+    setting, so an unpaged full-table read is silently truncated. The
+    selected columns must include id.
+    """
+    page_size = page_size or config.SUPABASE_PAGE_SIZE
+    rows = []
+    while True:
+        after = rows[-1]["id"] if rows else None
+        page = _page(build(), after, page_size).execute().data
+        rows += page
+        if len(page) < page_size:
+            return rows
+
+
+def list_questions(columns: str = "*") -> list[Questao]:
+    """
+    Returns every question ordered by id, fetched in pages.
+    """
+    return _paged(lambda: get_client().table(TABLE).select(columns))
+
+
+def list_questions_by_ids(
+    ids: list[int], columns: str = "*", chunk_size: int = 200
+) -> list[Questao]:
+    """
+    Returns the questions with the given ids ordered by id, fetched in chunks
+    to keep the request URLs short.
+    """
+    rows = []
+    for start in range(0, len(ids), chunk_size):
+        chunk = ids[start : start + chunk_size]
+        rows += (
+            get_client().table(TABLE).select(columns).in_("id", chunk).execute().data
+        )
+    return sorted(rows, key=lambda row: row["id"])
+
+
+def list_page(offset: int, limit: int, columns: str = "*") -> tuple[list, int]:
+    """
+    Returns one page of questions ordered by id, fetched with a range query,
+    and the total number of questions.
+    """
+    response = (
+        get_client()
+        .table(TABLE)
+        .select(columns, count="exact")
+        .order("id")
+        .range(offset, offset + limit - 1)
+        .execute()
+    )
+    return response.data, response.count
+
+
+def get_question(id: int, columns: str = "*") -> Questao:
+    """
+    Returns a single question, or None when it does not exist.
+    """
+    data = get_client().table(TABLE).select(columns).eq("id", id).execute().data
+    return data[0] if data else None
+
+
+def list_questions_since(
+    id: int, updated_at: str = None, columns: str = "*"
+) -> list[Questao]:
+    """
+    Returns the questions inserted after `id` or, when `updated_at` is given,
+    updated after that timestamp, fetched in pages.
+    """
+
+    def build():
+        query = get_client().table(TABLE).select(columns)
+        if updated_at:
+            return query.or_(f'id.gt.{id},updated_at.gt."{updated_at}"')
+        return query.gt("id", id)
+
+    return _paged(build)
+
+
+def list_ids() -> list[int]:
+    """
+    Returns the ids of every question.
+    """
+    return [row["id"] for row in list_questions("id")]
+
+
+def count_questions(**filters) -> int:
+    """
+    Returns the number of questions matching the equality filters, without
+    downloading any row.
+    """
+    query = get_client().table(TABLE).select("id", count="exact", head=True)
+    for column, value in filters.items():
+        query = query.eq(column, value)
+    return query.execute().count
+
+
+def count_by_dimension() -> list[dict]:
+    """
+    Returns the pre-aggregated counts computed by the questoes_contagens
+    function (sql/questoes_contagens.sql) as {dimensao, valor, contagem} rows.
+    """
+    return get_client().rpc("questoes_contagens").execute().data
+
+
+def insert_question(questao: Questao) -> Questao:
+    """
+    Inserts one question and returns the stored row.
+    """
+    return get_client().table(TABLE).insert(questao).execute().data[0]
+
+
+def insert_questions(questoes: list[Questao]) -> list[Questao]:
+    """
+    Inserts several questions in a single request and returns the stored rows.
+    """
+    if not questoes:
+        return []
+    return get_client().table(TABLE).insert(questoes).execute().data
+
+
+def update_question(id: int, campos: Questao) -> Questao:
+    """
+    Updates the given fields of a question and returns the stored row.
+    """
+    data = get_client().table(TABLE).update(campos).eq("id", id).execute().data
+    return data[0] if data else None
+
+
+def delete_question(id: int) -> Questao:
+    """
+    Deletes a question and returns the deleted row, or None when it did not
+    exist.
+    """
+    data = get_client().table(TABLE).delete().eq("id", id).execute().data
+    return data[0] if data else None
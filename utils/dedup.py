@@ -0,0 +1,378 @@
+"""Near-duplicate detection over the question bank."""
+
+# Import from standard library
+import logging
+import os
+import re
+import threading
+import zlib
+
+# Import from 3rd party libraries
+import numpy as np
+
+import utils.config as config
+from utils import sync, text
+
+# Assinaturas MinHash de 128 permutações, guardadas com 16 bits cada
+# (b-bit MinHash); o LSH usa 32 faixas de 4 linhas, que cabem num uint64
+NUM_PERM = 128
+LINHAS = 4
+BANDAS = NUM_PERM // LINHAS
+SEMENTE = 1
+VERSAO = 2
+
+# Hash multiply-shift: (a * x + b) >> 32, com aritmética de 64 bits
+_rng = np.random.default_rng(SEMENTE)
+_A = _rng.integers(0, 2**63, NUM_PERM, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+_B = _rng.integers(0, 2**63, NUM_PERM, dtype=np.uint64)
+
+# Ementa (ou tema) informada no prompt da questão (ver config.PROMPTS)
+_EMENTA = re.compile(r"^\s*(?:Ementa|Tema):\s*(.+?)\s*$", re.MULTILINE)
+
+
+def _combine(codigos: np.ndarray, k: int) -> np.ndarray:
+    # Hash de cada janela de k códigos consecutivos, sem repetições
+    return np.unique(text.window_hashes(codigos, min(k, len(codigos))))
+
+
+def word_shingles(texto: str, k: int = 3) -> np.ndarray:
+    """
+    Returns the hashes of the sequences of k words of a text.
+    """
+    return _combine(text.word_codes(text.normalize(texto)), k)
+
+
+def char_shingles(texto: str, k: int = 4) -> np.ndarray:
+    """
+    Returns the hashes of the sequences of k characters of a text.
+    """
+    texto = " ".join(text.normalize(texto))
+    codigos = np.frombuffer(texto.encode("utf-32-le"), dtype=np.uint32)
+    return _combine(codigos.astype(np.uint64), k)
+
+
+def ementa(prompt: str) -> str:
+    """
+    Returns the ementa of a stored prompt, or "" when it has none.
+    """
+    encontrada = _EMENTA.search(prompt or "")
+    return encontrada.group(1) if encontrada else ""
+
+
+def _crc(texto: str) -> int:
+    return zlib.crc32(texto.encode("utf-8"))
+
+
+def _saved(dados, prefixo: str) -> dict:
+    ids = dados[f"{prefixo}_ids"]
+    crcs = dados[f"{prefixo}_crcs"]
+    sigs = dados[f"{prefixo}_sigs"]
+    return {int(id): (int(crc), sig) for id, crc, sig in zip(ids, crcs, sigs)}
+
+
+class MinHashIndex:
+    """MinHash signatures of a set of texts, searched with LSH.
+    Candidates share at least one band of their signature with the query;
+    their similarity is the fraction of equal signature positions, an
+    estimate of the Jaccard similarity of the shingle sets. Not thread-safe:
+    DuplicateIndex serializes the access.
+    """
+
+    def __init__(self, shingles):
+        self._shingles = shingles
+        self._ids = np.empty(0, np.int64)
+        self._crcs = np.empty(0, np.uint32)
+        self._sigs = np.empty((0, NUM_PERM), np.uint16)
+        self._n = 0
+        self._pos = {}
+
+    def __len__(self) -> int:
+        return len(self._pos)
+
+    def signature(self, texto: str) -> np.ndarray:
+        """
+        Returns the signature of a text, or None when it has no words.
+        """
+        hashes = self._shingles(texto or "")
+        if not len(hashes):
+            return None
+        minimos = ((hashes[:, None] * _A + _B) >> np.uint64(32)).min(axis=0)
+        return (minimos & np.uint64(0xFFFF)).astype(np.uint16)
+
+    def _grow(self):
+        capacidade = max(1024, 2 * len(self._ids))
+        self._ids = np.resize(self._ids, capacidade)
+        self._crcs = np.resize(self._crcs, capacidade)
+        self._sigs = np.resize(self._sigs, (capacidade, NUM_PERM))
+        self._ids[self._n :] = -1
+
+    def add(self, id: int, texto: str):
+        """
+        Indexes (or re-indexes) the text of a question.
+        """
+        crc = _crc(texto or "")
+        pos = self._pos.get(id)
+        if pos is not None and self._crcs[pos] == crc:
+            return
+        sig = self.signature(texto)
+        if sig is None:
+            self.remove(id)
+            return
+        if pos is None:
+            if self._n == len(self._ids):
+                self._grow()
+            pos = self._n
+            self._n += 1
+            self._pos[id] = pos
+            self._ids[pos] = id
+        self._crcs[pos] = crc
+        self._sigs[pos] = sig
+
+    def remove(self, id: int):
+        pos = self._pos.pop(id, None)
+        if pos is not None:
+            self._ids[pos] = -1
+
+    def query(self, texto: str, limiar: float, limite: int = 5) -> list:
+        """
+        Returns up to `limite` (id, similarity) pairs with similarity >= limiar,
+        most similar first.
+        """
+        sig = self.signature(texto)
+        if sig is None or not self._n:
+            return []
+        sigs = self._sigs[: self._n]
+        faixas = sigs.view(np.uint64)
+        candidatos = np.flatnonzero(
+            (faixas == sig.view(np.uint64)).any(axis=1) & (self._ids[: self._n] >= 0)
+        )
+        if not len(candidatos):
+            return []
+        similaridade = (sigs[candidatos] == sig).mean(axis=1)
+        ordem = np.argsort(-similaridade, kind="stable")
+        return [
+            (int(self._ids[candidatos[i]]), float(similaridade[i]))
+            for i in ordem[:limite]
+            if similaridade[i] >= limiar
+        ]
+
+    def arrays(self, prefixo: str) -> dict:
+        vivos = self._ids[: self._n] >= 0
+        return {
+            f"{prefixo}_ids": self._ids[: self._n][vivos],
+            f"{prefixo}_crcs": self._crcs[: self._n][vivos],
+            f"{prefixo}_sigs": self._sigs[: self._n][vivos],
+        }
+
+    def rebuild(self, textos: dict, salvos: dict = None):
+        """
+        Replaces the index with {id: texto}, reusing the saved signatures
+        ({id: (crc, sig)}) of the texts that did not change.
+        """
+        salvos = salvos or {}
+        ids, crcs, sigs = [], [], []
+        for id, texto in textos.items():
+            crc = _crc(texto or "")
+            salvo = salvos.get(id)
+            if salvo is not None and salvo[0] == crc:
+                sig = salvo[1]
+            else:
+                sig = self.signature(texto)
+            if sig is not None:
+                ids.append(id)
+                crcs.append(crc)
+                sigs.append(sig)
+        self._set(ids, crcs, sigs)
+
+    def restore(self, salvos: dict):
+        """
+        Replaces the index with saved signatures ({id: (crc, sig)}).
+        """
+        ids = list(salvos)
+        self._set(ids, [salvos[id][0] for id in ids], [salvos[id][1] for id in ids])
+
+    def entries(self) -> dict:
+        """
+        Returns the indexed signatures as {id: (crc, sig)}.
+        """
+        return {
+            int(self._ids[pos]): (int(self._crcs[pos]), self._sigs[pos].copy())
+            for pos in self._pos.values()
+        }
+
+    def _set(self, ids: list, crcs: list, sigs: list):
+        self._ids = np.array(ids, dtype=np.int64)
+        self._crcs = np.array(crcs, dtype=np.uint32)
+        self._sigs = (
+            np.array(sigs, dtype=np.uint16)
+            if sigs
+            else np.empty((0, NUM_PERM), np.uint16)
+        )
+        self._n = len(ids)
+        self._pos = {id: pos for pos, id in enumerate(ids)}
+
+
+class DuplicateIndex:
+    """Local similarity index of the stored questions.
+    Indexes the resultado of every question (word shingles) and the ementa of
+    its prompt (character shingles), following the changes applied by
+    utils.sync. With `path` the signatures are kept in a compact .npz file
+    (2 bytes per permutation), loaded at startup and saved a few seconds
+    after each change, so a restart only hashes the questions that changed.
+    A restored snapshot answers queries but is still reconciled with the
+    table: `loaded` only turns True once the mirror has been applied.
+    """
+
+    def __init__(self, path: str = None, save_delay: float = 30.0):
+        self.path = path
+        self.save_delay = save_delay
+        self.loaded = False
+        self.restored = False
+        self._lock = threading.Lock()
+        self._textos = MinHashIndex(word_shingles)
+        self._ementas = MinHashIndex(char_shingles)
+        self._meta = {}
+        self._timer = None
+        if path and os.path.exists(path):
+            try:
+                self._open()
+            except Exception as e:
+                logging.warning(f"Could not read the duplicate index {path}: {e}")
+
+    def _open(self):
+        with np.load(self.path, allow_pickle=False) as dados:
+            if tuple(dados["versao"]) != (VERSAO, NUM_PERM, SEMENTE):
+                return
+            textos = _saved(dados, "textos")
+            ementas = _saved(dados, "ementas")
+            self._meta = {
+                int(id): (str(tipo), str(nivel))
+                for id, tipo, nivel in zip(
+                    dados["meta_ids"], dados["meta_tipos"], dados["meta_niveis"]
+                )
+            }
+        # Assinaturas salvas respondem às consultas até o espelho carregar;
+        # o warmup ainda aplica as mudanças feitas desde que foram salvas
+        self._textos.restore(textos)
+        self._ementas.restore(ementas)
+        self.restored = True
+
+    def save(self):
+        """
+        Writes the signatures to `path` (atomically).
+        """
+        if not self.path:
+            return
+        with self._lock:
+            self._timer = None
+            ids = list(self._meta)
+            arrays = {
+                "versao": np.array([VERSAO, NUM_PERM, SEMENTE]),
+                **self._textos.arrays("textos"),
+                **self._ementas.arrays("ementas"),
+                "meta_ids": np.array(ids, dtype=np.int64),
+                "meta_tipos": np.array([self._meta[id][0] for id in ids], dtype=str),
+                "meta_niveis": np.array([self._meta[id][1] for id in ids], dtype=str),
+            }
+        temporario = f"{self.path}.tmp"
+        try:
+            with open(temporario, "wb") as arquivo:
+                np.savez(arquivo, **arrays)
+            os.replace(temporario, self.path)
+        except OSError as e:
+            logging.warning(f"Could not save the duplicate index {self.path}: {e}")
+
+    def _schedule_save(self):
+        if self.path and self._timer is None:
+            self._timer = threading.Timer(self.save_delay, self.save)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _add(self, row: dict):
+        id = row["id"]
+        if "resultado" in row:
+            self._textos.add(id, row["resultado"])
+        if "prompt" in row:
+            self._ementas.add(id, ementa(row["prompt"]))
+        tipo, nivel = self._meta.get(id, (None, None))
+        self._meta[id] = (row.get("tipo", tipo), row.get("nivel", nivel))
+
+    def on_change(self, event: str, rows: list):
+        """
+        utils.sync listener keeping the index in step with applied changes.
+        """
+        if event == "load":
+            # Recalcula fora do lock (as consultas seguem no índice anterior),
+            # reaproveitando as assinaturas dos textos que não mudaram
+            with self._lock:
+                textos = self._textos.entries()
+                ementas = self._ementas.entries()
+            novo_textos = MinHashIndex(word_shingles)
+            novo_textos.rebuild(
+                {row["id"]: row.get("resultado") for row in rows}, textos
+            )
+            novo_ementas = MinHashIndex(char_shingles)
+            novo_ementas.rebuild(
+                {row["id"]: ementa(row.get("prompt")) for row in rows}, ementas
+            )
+            with self._lock:
+                self._textos, self._ementas = novo_textos, novo_ementas
+                self._meta = {
+                    row["id"]: (row.get("tipo"), row.get("nivel")) for row in rows
+                }
+                self.loaded = True
+                self._schedule_save()
+            return
+        with self._lock:
+            for row in rows:
+                if event == "delete":
+                    self._textos.remove(row["id"])
+                    self._ementas.remove(row["id"])
+                    self._meta.pop(row["id"], None)
+                else:
+                    self._add(row)
+            self._schedule_save()
+
+    def warmup(self):
+        """
+        Keeps the question mirror that feeds the index loaded and fresh
+        (see sync.QuestionSync.refresh_in_background()).
+        """
+        sync.questions.refresh_in_background()
+
+    def similares(self, resultado: str, limiar: float = None, limite: int = 5) -> list:
+        """
+        Returns the stored questions whose text is near-identical to
+        `resultado`, as (id, similarity) pairs, most similar first. Returns []
+        while the index is loading or when config.DEDUP_MODE is "off".
+        """
+        if config.DEDUP_MODE == "off":
+            return []
+        self.warmup()
+        limiar = config.DEDUP_THRESHOLD if limiar is None else limiar
+        with self._lock:
+            return self._textos.query(resultado, limiar, limite)
+
+    def existentes(
+        self, objetivo: str, tipo: str, nivel: str, limiar: float = None, limite=5
+    ) -> list:
+        """
+        Returns the stored questions of the same tipo and nivel generated from
+        a near-identical ementa, as (id, similarity) pairs.
+        """
+        if config.DEDUP_MODE == "off":
+            return []
+        self.warmup()
+        limiar = config.DEDUP_EMENTA_THRESHOLD if limiar is None else limiar
+        with self._lock:
+            encontradas = self._ementas.query(objetivo, limiar, limite=50)
+            return [
+                (id, similaridade)
+                for id, similaridade in encontradas
+                if self._meta.get(id) == (tipo, nivel)
+            ][:limite]
+
+
+# Índice de duplicatas do processo; segue o espelho de utils.sync
+index = DuplicateIndex(config.DEDUP_PATH)
+sync.questions.add_listener(index.on_change)
@@ -1,13 +1,23 @@
 """Gemini API connector."""
 
 # Import from standard library
+import asyncio
+import hashlib
+import json
 import logging
+import os
+import threading
 import traceback
+from datetime import datetime, timedelta, timezone
 
 # Import from 3rd party libraries
+import google.ai.generativelanguage as glm
 import google.generativeai as genai
+from google.generativeai import client as genai_client
 
 import utils.config as config
+from utils import metrics, prompts, resilience, schemas
+from utils.cache import get_cache
 
 # Suppress openai request/response logging
 # Handle by manually changing the respective APIRequestor methods in the openai package
@@ -15,28 +25,155 @@ import utils.config as config
 # Alternatively (affects all messages from this logger):
 logging.getLogger("gemini").setLevel(logging.WARNING)
 
+# Pool de modelos compartilhado pelo processo, indexado por
+# (api key, nome do modelo, generation_config)
+_models = {}
+_models_lock = threading.Lock()
+
+
+# Uploads compartilhados pelo processo, indexados por (sha256 do conteúdo, mime type)
+_uploads = {}
+_upload_locks = {}
+_uploads_lock = threading.Lock()
+# Arquivos do Gemini expiram em 48h; renovamos o handle um pouco antes disso
+UPLOAD_TTL = timedelta(hours=48)
+UPLOAD_EXPIRY_MARGIN = timedelta(minutes=10)
+
+
+def _file_digest(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _expires_at(file) -> datetime:
+    expiration = getattr(file, "expiration_time", None)
+    if isinstance(expiration, datetime) and expiration.tzinfo:
+        return expiration
+    return datetime.now(timezone.utc) + UPLOAD_TTL
+
+
+def _record_usage(record: metrics.CallRecord, response):
+    usage = getattr(response, "usage_metadata", None)
+    if usage:
+        record.input_tokens = usage.prompt_token_count
+        record.output_tokens = usage.candidates_token_count
+
+
+def _settle(record: metrics.CallRecord, reserved: int):
+    """Corrects the shared TPM quota with the usage reported by Gemini."""
+    used = record.input_tokens + record.output_tokens
+    resilience.gemini.settle(reserved, used or None)
+
+
+def _cached(store, prompt: str, model) -> tuple:
+    """
+    Looks the prompt up in the response cache. Returns the cache key and the
+    cached text (None on a miss, or when `store` is None); a hit is recorded
+    in the metrics.
+    """
+    if not store:
+        return None, None
+    cache_key = store.make_key(
+        prompt,
+        model.model_name,
+        getattr(model, "_generation_config", None),
+        "gemini",
+    )
+    cached = store.get(cache_key)
+    if cached is not None:
+        with metrics.track("gemini", "complete") as record:
+            record.outcome = "cache_hit"
+    return cache_key, cached
+
+
+def _answer(record, reserved: int, response, store=None, cache_key=None) -> str:
+    """
+    Records the usage of a response, settles the reserved quota and caches
+    the text (with a `store`). Returns the response text.
+    """
+    _record_usage(record, response)
+    _settle(record, reserved)
+    if store:
+        store.set(cache_key, response.text)
+    return response.text
+
+
+def _failed(record, e: Exception):
+    record.outcome = "error"
+    logging.error(f"Gemini API error: {e}")
+
+
+def _chat(model, arquivo, prompt: str) -> tuple:
+    # Sessão com o arquivo no histórico e o prompt que o referencia
+    chat_session = model.start_chat(history=[{"role": "user", "parts": [arquivo]}])
+    master_prompt = f"Usando o arquivo: {arquivo.display_name}, responda o questionamento abaixo:\n{prompt}"
+    return chat_session, master_prompt
+
+
+def _pool_key(key: str, model_name: str, generation_config: dict) -> tuple:
+    return (key, model_name, json.dumps(generation_config, sort_keys=True))
+
+
+def _bind_client(model):
+    """
+    Binds the client of the currently configured key to the model.
+    genai.configure() is process-global, so each pooled model keeps a reference
+    to its own client, and the configuration (key, transport, endpoint) its
+    async client is built from, instead of resolving the default one later.
+    """
+    try:
+        model._client_config = dict(genai_client._client_manager.client_config)
+        model._client = genai_client.get_default_generative_client()
+    except Exception as e:
+        logging.warning(f"Gemini client not bound: {e}")
+
+
+def _bind_async_client(model):
+    """
+    Same as _bind_client for the async client. gRPC async channels belong to
+    the event loop that creates them, so the client is built on the first
+    async call, from the loop that runs it (see utils.background.run_async),
+    with the configuration saved when the model was pooled.
+    """
+    if getattr(model, "_async_client", None) is None:
+        try:
+            model._async_client = glm.GenerativeServiceAsyncClient(
+                **model._client_config
+            )
+        except Exception as e:
+            logging.warning(f"Gemini async client not bound: {e}")
+
 
 class Gemini:
     """Gemini Connector.
     This class provides methods for interacting with the Gemini AI model.
     Methods:
-      build_prompt(nivel, objetivo, tipo, area, tem_introducao, tem_resposta):
+      build_prompt(nivel, objetivo, tipo, area, tem_introducao, tem_resposta, estruturada=False):
         Builds a prompt string based on the provided parameters.
+      get_model(key=None, model_name=config.GEMINI_MODEL, generation_config=None):
+        Returns the pooled Gemini AI model for the given key and configuration.
+      warmup(key=None):
+        Builds and warms the default model in a background thread.
       set_key(key):
         Sets the API key for the Gemini AI model.
       upload_to_gemini(path, mime_type=None):
         Uploads a file to the Gemini AI model.
-      complete(prompt):
+      complete(prompt, model=None, cache=True, stream=False):
         Calls the Gemini AI model to generate a response based on the provided prompt.
-      analyze(prompt, arquivo):
+      complete_structured(prompt, tipo, tem_introducao="Sim", tem_resposta="Sim", cache=True):
+        Calls the Gemini AI model with the JSON response schema of the question type.
+      complete_structured_batch(prompt, itens, tem_introducao="Sim", tem_resposta="Sim", cache=True):
+        Calls the Gemini AI model for several questions in a single request.
+      analyze(prompt, arquivo, model=None):
         Calls the Gemini AI model to generate a response based on the provided prompt and file.
-    Attributes:
-      model:
-        The Gemini AI model instance.
+      aupload(path, mime_type=None), acomplete(prompt, model=None, cache=True),
+      aanalyze(prompt, arquivo, model=None):
+        Async counterparts of upload_to_gemini, complete and analyze.
     """
 
-    model = None
-
     @staticmethod
     def build_prompt(
         nivel: str,
@@ -45,141 +182,330 @@ class Gemini:
         area: str,
         tem_introducao: str,
         tem_resposta: str,
+        estruturada: bool = False,
     ):
         """
         Builds a prompt string based on the provided parameters.
         """
-        if tipo in [
-            "Escolha Simples",
-            "Escolha Múltipla",
-            "Dissertativa",
-            "Completar as Lacunas",
-            "Lógica - O que Faz",
-            "Lógica - Qual o Resultado",
-            "Lógica - Qual o Erro",
-        ]:
-            base_prompt = config.PROMPTS[tipo].format(
-                nivel, objetivo, tipo, area, tem_introducao, tem_resposta
-            )
-        else:
-            base_prompt = f"""Você é um especialista em Ciência de Dados.
-        Elabore uma questão de nível {nivel} sobre a ementa descrita abaixo:
-        Ementa: {objetivo}
-        A questão deve ser do tipo: {tipo}
-        A questão aborda a área: {area}
-        A questão deve ser estruturada da seguinte forma:"""
-
-            if tem_introducao == "Sim":
-                base_prompt = (
-                    base_prompt + """\n- Apresenta-se uma introdução ao conteúdo"""
-                )
+        return prompts.build_prompt(
+            nivel,
+            objetivo,
+            tipo,
+            area,
+            tem_introducao,
+            tem_resposta,
+            estruturada=estruturada,
+        )
 
-            if tipo == "Código SQL":
-                base_prompt = (
-                    base_prompt
-                    + """\n- Apresenta-se o enunciado da questão seguindo o formato:
-            - Gera-se uma tabela de dados ficticios
-            - Imprime-se a tabela de dados
-            - Faz-se uma pergunta que o aluno deve responder com uma instrução SQL"""
-                )
-            elif tipo == "Código Python":
-                base_prompt = (
-                    base_prompt
-                    + """\n- Apresenta-se o enunciado da questão seguindo o formato:
-            - Gera-se uma tabela de dados ficticios
-            - Mostra-se a tabela de dados
-            - Faz-se uma pergunta que o aluno deve responder com um script Python que pode utilizar as bibliotecas pandas, matplotlib, requests e todas as biliotecas nativas do python"""
+    @staticmethod
+    def get_model(
+        key: str = None,
+        model_name: str = config.GEMINI_MODEL,
+        generation_config: dict = None,
+    ) -> genai.GenerativeModel:
+        """
+        Returns the pooled Gemini AI model for the given key and configuration.
+        The model is built and configured only once per process; later calls
+        (from any session) reuse the same instance.
+        Args:
+          key (str, optional): API key. Defaults to GEMINIAI_API_KEY.
+          model_name (str, optional): Gemini model name.
+          generation_config (dict, optional): Defaults to config.generation_config.
+        Returns:
+          GenerativeModel: the shared model instance.
+        """
+        key = key or os.getenv("GEMINIAI_API_KEY")
+        generation_config = generation_config or config.generation_config
+        pool_key = _pool_key(key, model_name, generation_config)
+        model = _models.get(pool_key)
+        if model is not None:
+            return model
+        with _models_lock:
+            model = _models.get(pool_key)
+            if model is None:
+                genai.configure(
+                    api_key=key,
+                    transport=config.GEMINI_TRANSPORT,
+                    client_options=(
+                        {"api_endpoint": config.GEMINI_API_ENDPOINT}
+                        if config.GEMINI_API_ENDPOINT
+                        else None
+                    ),
                 )
-            else:
-                base_prompt = (
-                    base_prompt + """\n- Apresenta-se o enunciado da questão"""
+                model = genai.GenerativeModel(
+                    model_name=model_name,
+                    safety_settings=config.safety_settings,
+                    generation_config=generation_config,
                 )
+                _bind_client(model)
+                _models[pool_key] = model
+        return model
 
-            if tem_resposta == "Sim":
-                base_prompt = (
-                    base_prompt
-                    + """\n- Apresenta-se a resposta correta, e explique a resposta."""
-                )
+    @staticmethod
+    def warmup(key: str = None):
+        """
+        Builds the default model and opens its connection in a background
+        thread, so the first request does not pay the setup latency.
+        """
 
-        competencias = "\n".join(
-            [
-                f'{comp["titulo"]} - {comp["descricao"]}'
-                for comp in config.bncc_competencias
-            ]
-        )
-        bncc = f"""\n- Relacione a questão gerada com até duas competências da BNCC que estão listadas abaixo: 
-                    - Apresente as duas competências selecionadas com o seguinte formato
-                    Compentencia <numero>. <titulo competência> - <descricao competência> - <explicacao sobre como a questão se relaciona com a competência>
-                    {competencias}"""
+        def _warm():
+            try:
+                Gemini.get_model(key).count_tokens("ping")
+            except Exception as e:
+                logging.warning(f"Gemini warmup failed: {e}")
 
-        objetivos = """\n Gere dois objetivos de ensino, seguindo a taxonomia de Bloom, para a questão."""
-        return base_prompt + bncc + objetivos
+        threading.Thread(target=_warm, daemon=True).start()
 
     @staticmethod
-    def set_key(key: str):
+    def set_key(key: str) -> genai.GenerativeModel:
         """
         Sets the API key for the Gemini AI model.
+        Kept for compatibility: returns the pooled model for the key.
         """
-        global model
-        genai.configure(api_key=key)
-        model = genai.GenerativeModel(
-            model_name="gemini-1.5-pro",
-            safety_settings=config.safety_settings,
-            generation_config=config.generation_config,
-        )
+        return Gemini.get_model(key)
 
     @staticmethod
     def upload_to_gemini(path: str, mime_type: str = None) -> any:
         """
         Uploads a file to Gemini.
+        Uploads are deduplicated by content hash and MIME type: the remote file
+        handle is shared across sessions and reused until it is about to
+        expire, when the file is uploaded again.
         Args:
           path (str): The path of the file to upload.
           mime_type (str, optional): The MIME type of the file. Defaults to None.
         Returns:
           any: The uploaded file object.
         """
-        file = genai.upload_file(path, mime_type=mime_type)
-        print(f"Uploaded file '{file.display_name}' as: {file.uri}")
+        upload_key = (_file_digest(path), mime_type)
+        with _uploads_lock:
+            lock = _upload_locks.setdefault(upload_key, threading.Lock())
+        with lock, metrics.track("gemini", "upload") as record:
+            cached = _uploads.get(upload_key)
+            if cached and cached[1] - UPLOAD_EXPIRY_MARGIN > datetime.now(timezone.utc):
+                record.outcome = "cache_hit"
+                return cached[0]
+            file = resilience.gemini.call(
+                genai.upload_file, path, mime_type=mime_type, record=record
+            )
+            print(f"Uploaded file '{file.display_name}' as: {file.uri}")
+            _uploads[upload_key] = (file, _expires_at(file))
         return file
 
     @staticmethod
-    def complete(prompt: str) -> str:
+    def complete(
+        prompt: str,
+        model: genai.GenerativeModel = None,
+        cache: bool = True,
+        stream: bool = False,
+    ) -> str:
         """Call Gemini AI with text prompt.
         Args:
             prompt: text prompt
-        Return: predicted response text
+            model: pooled model (defaults to Gemini.get_model())
+            cache: set to False to bypass the response cache for this call
+            stream: return a generator of text chunks instead of the full text
+        Return: predicted response text (or chunk generator when streaming)
         """
-        global model
+        model = model or Gemini.get_model()
+        store = get_cache() if cache else None
+        cache_key, cached = _cached(store, prompt, model)
+        if cached is not None:
+            return iter([cached]) if stream else cached
+        if stream:
+            return Gemini._complete_stream(prompt, model, store, cache_key)
+        with metrics.track("gemini", "complete") as record:
+            reserved = prompts.estimate_tokens(prompt)
+            try:
+                response = resilience.gemini.call(
+                    model.generate_content, prompt, tokens=reserved, record=record
+                )
+                return _answer(record, reserved, response, store, cache_key)
+            except Exception as e:
+                _failed(record, e)
+                return None
+
+    @staticmethod
+    def complete_structured(
+        prompt: str,
+        tipo: str,
+        tem_introducao: str = "Sim",
+        tem_resposta: str = "Sim",
+        cache: bool = True,
+    ) -> dict:
+        """Call Gemini AI with the JSON response schema of the question type.
+        Args:
+            prompt: text prompt (see build_prompt(..., estruturada=True))
+            tipo, tem_introducao, tem_resposta: select the schema fields
+            cache: set to False to bypass the response cache for this call
+        Return: the structured fields (see utils.schemas.parse), or None on failure
+        """
+        model = Gemini.get_model(
+            generation_config=schemas.generation_config(
+                tipo, tem_introducao, tem_resposta
+            )
+        )
+        texto = Gemini.complete(prompt, model, cache=cache)
+        if texto is None:
+            return None
         try:
-            response = model.generate_content(prompt)
-            return response.text
-        except Exception as e:
-            logging.error(f"OpenAI API error: {e}")
+            return schemas.parse(texto)
+        except ValueError as e:
+            logging.error(f"Gemini structured response invalid: {e}")
+            return None
+
+    @staticmethod
+    def complete_structured_batch(
+        prompt: str,
+        itens: tuple,
+        tem_introducao: str = "Sim",
+        tem_resposta: str = "Sim",
+        cache: bool = True,
+    ) -> list:
+        """Call Gemini AI for several questions in a single request.
+        Args:
+            prompt: text prompt (see utils.prompts.render_lote)
+            itens: tuple of (tipo, nivel, area), one per question
+            tem_introducao, tem_resposta: select the schema fields
+            cache: set to False to bypass the response cache for this call
+        Return: the structured fields of each question, in the order of
+            itens (None for questions missing from the response), or None on
+            failure
+        """
+        tipos = tuple(dict.fromkeys(tipo for tipo, _, _ in itens))
+        model = Gemini.get_model(
+            generation_config=schemas.generation_config_lote(
+                tipos, tem_introducao, tem_resposta
+            )
+        )
+        texto = Gemini.complete(prompt, model, cache=cache)
+        if texto is None:
+            return None
+        try:
+            return schemas.parse_lote(texto, len(itens))
+        except ValueError as e:
+            logging.error(f"Gemini structured response invalid: {e}")
             return None
 
     @staticmethod
-    def analyze(prompt: str, arquivo: any) -> str:
+    def _complete_stream(prompt, model, store, cache_key):
+        """Yields the response text chunks as Gemini produces them.
+        Only opening the stream is retried: chunks already shown are never
+        produced twice, so a failure after the first chunk is raised.
+        """
+        chunks = []
+        with metrics.track("gemini", "complete") as record:
+            reserved = prompts.estimate_tokens(prompt)
+            try:
+                response = resilience.gemini.call(
+                    model.generate_content,
+                    prompt,
+                    stream=True,
+                    tokens=reserved,
+                    record=record,
+                )
+                for chunk in response:
+                    record.mark_first_token()
+                    _record_usage(record, chunk)
+                    chunks.append(chunk.text)
+                    yield chunk.text
+            except Exception as e:
+                _failed(record, e)
+                # Texto parcial não é resposta: quem consome precisa saber
+                raise
+            finally:
+                _settle(record, reserved)
+        if store:
+            store.set(cache_key, "".join(chunks))
+
+    @staticmethod
+    def analyze(prompt: str, arquivo: any, model: genai.GenerativeModel = None) -> str:
         """Call Gemini AI with text prompt and file.
         Args:
             prompt: text prompt
             arquivo: file object
+            model: pooled model (defaults to Gemini.get_model())
         Return: predicted response text and status
         """
-        global model
-        result = {"success": None, "text": None}
-        try:
-            history = {
-                "role": "user",
-                "parts": [arquivo],
-            }
-            chat_session = model.start_chat(history=[history])
-            master_prompt = f"Usando o arquivo: {arquivo.display_name}, responda o questionamento abaixo:\n{prompt}"
-            response = chat_session.send_message(master_prompt)
-            chat_session = None
-            result["success"] = True
-            result["text"] = response.text
-        except Exception as e:
-            logging.error(f"OpenAI API error: {e}")
-            result["success"] = False
-            result["text"] = traceback.format_exc()
-        return result
+        model = model or Gemini.get_model()
+        with metrics.track("gemini", "analyze") as record:
+            try:
+                chat_session, master_prompt = _chat(model, arquivo, prompt)
+                reserved = prompts.estimate_tokens(master_prompt)
+                response = resilience.gemini.call(
+                    chat_session.send_message,
+                    master_prompt,
+                    tokens=reserved,
+                    record=record,
+                )
+                return {"success": True, "text": _answer(record, reserved, response)}
+            except Exception as e:
+                _failed(record, e)
+                return {"success": False, "text": traceback.format_exc()}
+
+    @staticmethod
+    async def aupload(path: str, mime_type: str = None) -> any:
+        """
+        Async counterpart of upload_to_gemini. The SDK has no async upload,
+        so the (deduplicated) upload runs in a worker thread.
+        """
+        return await asyncio.to_thread(Gemini.upload_to_gemini, path, mime_type)
+
+    @staticmethod
+    async def acomplete(
+        prompt: str, model: genai.GenerativeModel = None, cache: bool = True
+    ) -> str:
+        """Async counterpart of complete, on the SDK async client.
+        Args:
+            prompt: text prompt
+            model: pooled model (defaults to Gemini.get_model())
+            cache: set to False to bypass the response cache for this call
+        Return: predicted response text
+        """
+        model = model or Gemini.get_model()
+        _bind_async_client(model)
+        store = get_cache() if cache else None
+        cache_key, cached = _cached(store, prompt, model)
+        if cached is not None:
+            return cached
+        with metrics.track("gemini", "complete") as record:
+            reserved = prompts.estimate_tokens(prompt)
+            try:
+                response = await resilience.gemini.acall(
+                    model.generate_content_async,
+                    prompt,
+                    tokens=reserved,
+                    record=record,
+                )
+                return _answer(record, reserved, response, store, cache_key)
+            except Exception as e:
+                _failed(record, e)
+                return None
+
+    @staticmethod
+    async def aanalyze(
+        prompt: str, arquivo: any, model: genai.GenerativeModel = None
+    ) -> str:
+        """Async counterpart of analyze, on the SDK async client.
+        Args:
+            prompt: text prompt
+            arquivo: file object
+            model: pooled model (defaults to Gemini.get_model())
+        Return: predicted response text and status
+        """
+        model = model or Gemini.get_model()
+        _bind_async_client(model)
+        with metrics.track("gemini", "analyze") as record:
+            try:
+                chat_session, master_prompt = _chat(model, arquivo, prompt)
+                reserved = prompts.estimate_tokens(master_prompt)
+                response = await resilience.gemini.acall(
+                    chat_session.send_message_async,
+                    master_prompt,
+                    tokens=reserved,
+                    record=record,
+                )
+                return {"success": True, "text": _answer(record, reserved, response)}
+            except Exception as e:
+                _failed(record, e)
+                return {"success": False, "text": traceback.format_exc()}
@@ -0,0 +1,301 @@
+"""Instrumentation of LLM provider calls."""
+
+# Import from standard library
+import contextvars
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+
+# Import from 3rd party libraries
+import pandas as pd
+
+from utils.cache import get_cache
+
+# Limites (segundos) dos buckets dos histogramas de latência
+BUCKETS = (0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120)
+# Quantidade de latências recentes guardadas por série para o p95
+RECENT = 500
+
+LABELS = ("provider", "operation", "pagina", "tipo", "outcome")
+
+_context = contextvars.ContextVar("metric_labels", default={})
+_records = contextvars.ContextVar("metric_records", default=None)
+
+
+@contextmanager
+def labels(**values):
+    """
+    Labels every provider call made inside the block (e.g. pagina, tipo).
+    Context variables do not cross threads: open the block in the thread
+    that makes the calls.
+    """
+    token = _context.set({**_context.get(), **values})
+    try:
+        yield
+    finally:
+        _context.reset(token)
+
+
+@contextmanager
+def records():
+    """
+    Collects the CallRecord of every provider call finished inside the block
+    (in the yielded list), e.g. to tell cache hits from real calls.
+    """
+    collected = []
+    token = _records.set(collected)
+    try:
+        yield collected
+    finally:
+        _records.reset(token)
+
+
+class CallRecord:
+    """Measurements of one provider call, filled in by the connector."""
+
+    def __init__(self, provider: str, operation: str):
+        self.provider = provider
+        self.operation = operation
+        self.labels = _context.get()
+        self.started = time.perf_counter()
+        self.first_token = None
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self.retries = 0
+        self.outcome = "ok"
+
+    def mark_first_token(self):
+        if self.first_token is None:
+            self.first_token = time.perf_counter() - self.started
+
+
+class _Histogram:
+    def __init__(self):
+        self.buckets = [0] * len(BUCKETS)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.count += 1
+        self.sum += value
+        for idx, limit in enumerate(BUCKETS):
+            if value <= limit:
+                self.buckets[idx] += 1
+
+
+class _Series:
+    def __init__(self):
+        self.calls = 0
+        self.duration = _Histogram()
+        self.ttft = _Histogram()
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self.retries = 0
+        self.recent = deque(maxlen=RECENT)
+
+
+class Registry:
+    """Thread-safe aggregation of CallRecords by label set."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._series = defaultdict(_Series)
+
+    def observe(self, record: CallRecord):
+        duration = time.perf_counter() - record.started
+        key = (
+            record.provider,
+            record.operation,
+            record.labels.get("pagina", ""),
+            record.labels.get("tipo", ""),
+            record.outcome,
+        )
+        with self._lock:
+            series = self._series[key]
+            series.calls += 1
+            series.duration.observe(duration)
+            if record.first_token is not None:
+                series.ttft.observe(record.first_token)
+            series.input_tokens += record.input_tokens
+            series.output_tokens += record.output_tokens
+            series.retries += record.retries
+            series.recent.append(duration)
+
+    def reset(self):
+        with self._lock:
+            self._series.clear()
+
+    def export_prometheus(self) -> str:
+        """
+        Returns every series in the Prometheus text exposition format.
+        """
+        lines = []
+
+        def label_str(key, **extra):
+            pairs = list(zip(LABELS, key)) + list(extra.items())
+            escaped = (
+                (name, str(value).replace("\\", "\\\\").replace('"', '\\"'))
+                for name, value in pairs
+            )
+            return "{" + ",".join(f'{name}="{value}"' for name, value in escaped) + "}"
+
+        def histogram(name, help_text, attr):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} histogram")
+            for key, series in items:
+                hist = getattr(series, attr)
+                if not hist.count:
+                    continue
+                for limit, count in zip(BUCKETS, hist.buckets):
+                    lines.append(f"{name}_bucket{label_str(key, le=limit)} {count}")
+                lines.append(f'{name}_bucket{label_str(key, le="+Inf")} {hist.count}')
+                lines.append(f"{name}_sum{label_str(key)} {hist.sum}")
+                lines.append(f"{name}_count{label_str(key)} {hist.count}")
+
+        def counter(name, help_text, value, **extra):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} counter")
+            for key, series in items:
+                lines.append(f"{name}{label_str(key, **extra)} {value(series)}")
+
+        with self._lock:
+            items = [
+                (key, _copy_series(series)) for key, series in self._series.items()
+            ]
+
+        counter("genai_llm_calls_total", "Provider calls.", lambda s: s.calls)
+        histogram(
+            "genai_llm_call_duration_seconds",
+            "Wall time of provider calls.",
+            "duration",
+        )
+        histogram(
+            "genai_llm_time_to_first_token_seconds",
+            "Time until the first streamed chunk.",
+            "ttft",
+        )
+        lines.append("# HELP genai_llm_tokens_total Tokens sent and received.")
+        lines.append("# TYPE genai_llm_tokens_total counter")
+        for key, series in items:
+            lines.append(
+                f'genai_llm_tokens_total{label_str(key, direction="input")} '
+                f"{series.input_tokens}"
+            )
+            lines.append(
+                f'genai_llm_tokens_total{label_str(key, direction="output")} '
+                f"{series.output_tokens}"
+            )
+        counter("genai_llm_retries_total", "Retried attempts.", lambda s: s.retries)
+
+        cache = get_cache()
+        if cache:
+            stats = cache.stats()
+            for name in ("hits", "misses"):
+                lines.append(f"# TYPE genai_cache_{name}_total counter")
+                lines.append(f"genai_cache_{name}_total {stats[name]}")
+            lines.append("# TYPE genai_cache_entries gauge")
+            lines.append(f"genai_cache_entries {stats['entries']}")
+        return "\n".join(lines) + "\n"
+
+    def summary(self) -> pd.DataFrame:
+        """
+        Returns one row per (provider, operation, tipo) with call counts,
+        errors, mean/p95 latency, mean time to first token and token totals.
+        """
+        grupos = defaultdict(list)
+        with self._lock:
+            for key, series in self._series.items():
+                provider, operation, pagina, tipo, outcome = key
+                grupos[(provider, operation, tipo)].append(
+                    (outcome, _copy_series(series))
+                )
+        linhas = []
+        for (provider, operation, tipo), series_list in sorted(grupos.items()):
+            recent = sorted(d for _, s in series_list for d in s.recent)
+            calls = sum(s.calls for _, s in series_list)
+            ttft_count = sum(s.ttft.count for _, s in series_list)
+            linhas.append(
+                {
+                    "provider": provider,
+                    "operacao": operation,
+                    "tipo": tipo,
+                    "chamadas": calls,
+                    "erros": sum(
+                        s.calls for outcome, s in series_list if outcome == "error"
+                    ),
+                    "cache": sum(
+                        s.calls for outcome, s in series_list if outcome == "cache_hit"
+                    ),
+                    "latencia_media": round(
+                        sum(s.duration.sum for _, s in series_list) / calls, 2
+                    ),
+                    "latencia_p95": round(recent[int(0.95 * (len(recent) - 1))], 2),
+                    "ttft_medio": (
+                        round(sum(s.ttft.sum for _, s in series_list) / ttft_count, 2)
+                        if ttft_count
+                        else None
+                    ),
+                    "tokens_entrada": sum(s.input_tokens for _, s in series_list),
+                    "tokens_saida": sum(s.output_tokens for _, s in series_list),
+                }
+            )
+        return pd.DataFrame(
+            linhas,
+            columns=[
+                "provider",
+                "operacao",
+                "tipo",
+                "chamadas",
+                "erros",
+                "cache",
+                "latencia_media",
+                "latencia_p95",
+                "ttft_medio",
+                "tokens_entrada",
+                "tokens_saida",
+            ],
+        )
+
+
+def _copy_series(series: _Series) -> _Series:
+    copy = _Series()
+    copy.calls = series.calls
+    copy.input_tokens = series.input_tokens
+    copy.output_tokens = series.output_tokens
+    copy.retries = series.retries
+    copy.recent = deque(series.recent, maxlen=RECENT)
+    for attr in ("duration", "ttft"):
+        hist = getattr(series, attr)
+        target = getattr(copy, attr)
+        target.buckets = list(hist.buckets)
+        target.count = hist.count
+        target.sum = hist.sum
+    return copy
+
+
+# Registro compartilhado por todo o processo
+registry = Registry()
+
+
+@contextmanager
+def track(provider: str, operation: str):
+    """
+    Measures one provider call. The connector fills the yielded CallRecord
+    (tokens, first token, outcome); an exception escaping the block is
+    recorded as an error, a stream abandoned by its consumer as cancelled.
+    """
+    record = CallRecord(provider, operation)
+    try:
+        yield record
+    except GeneratorExit:
+        record.outcome = "cancelled"
+        raise
+    except BaseException:
+        record.outcome = "error"
+        raise
+    finally:
+        registry.observe(record)
+        collected = _records.get()
+        if collected is not None:
+            collected.append(record)
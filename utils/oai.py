@@ -7,6 +7,8 @@ import logging
 import openai
 
 import utils.config as config
+from utils import metrics, prompts, resilience
+from utils.cache import get_cache
 
 # Suppress openai request/response logging
 # Handle by manually changing the respective APIRequestor methods in the openai package
@@ -15,6 +17,62 @@ import utils.config as config
 logging.getLogger("openai").setLevel(logging.WARNING)
 
 
+def _request(prompt: str, temperature: float, max_tokens: int) -> dict:
+    return {
+        "model": config.OPENAI_MODEL,
+        "messages": [{"role": "user", "content": prompt}],
+        "temperature": temperature,
+        "max_tokens": max_tokens,
+        "top_p": 1,  # default
+        "frequency_penalty": 0,  # default,
+        "presence_penalty": 0,  # default
+    }
+
+
+def _cache_key(store, kwargs: dict) -> str:
+    return store.make_key(
+        kwargs["messages"][0]["content"],
+        kwargs["model"],
+        {k: v for k, v in kwargs.items() if k not in ("model", "messages")},
+        "openai",
+    )
+
+
+def _record_usage(record: metrics.CallRecord, response, reserved: int):
+    usage = response.get("usage") or {}
+    record.input_tokens = usage.get("prompt_tokens", 0)
+    record.output_tokens = usage.get("completion_tokens", 0)
+    resilience.openai.settle(reserved, usage.get("total_tokens"))
+
+
+def _cached(store, kwargs: dict) -> tuple:
+    """
+    Looks the request up in the response cache. Returns the cache key and
+    the cached text (None on a miss, or when `store` is None); a hit is
+    recorded in the metrics.
+    """
+    if not store:
+        return None, None
+    cache_key = _cache_key(store, kwargs)
+    cached = store.get(cache_key)
+    if cached is not None:
+        with metrics.track("openai", "complete") as record:
+            record.outcome = "cache_hit"
+    return cache_key, cached
+
+
+def _answer(record, reserved: int, response, store=None, cache_key=None) -> str:
+    """
+    Records the usage of a response and settles the reserved quota, then
+    joins and caches (with a `store`) the text of its choices.
+    """
+    _record_usage(record, response, reserved)
+    texto = "\n".join(x["message"]["content"] for x in response["choices"])
+    if store:
+        store.set(cache_key, texto)
+    return texto
+
+
 class Openai:
     """OpenAI Connector."""
 
@@ -27,59 +85,9 @@ class Openai:
         tem_introducao: str,
         tem_resposta: str,
     ):
-        if tipo in [
-            "Escolha Simples",
-            "Escolha Múltipla",
-            "Dissertativa",
-            "Completar as Lacunas",
-            "Lógica - O que Faz",
-            "Lógica - Qual o Resultado",
-            "Lógica - Qual o Erro",
-        ]:
-            base_prompt = config.PROMPTS[tipo].format(
-                nivel, objetivo, tipo, area, tem_introducao, tem_resposta
-            )
-        else:
-            base_prompt = f"""Você é um especialista em Ciência de Dados.
-        Elabore uma questão de nível {nivel} sobre a ementa descrita abaixo:
-        Ementa: {objetivo}
-        A questão deve ser do tipo: {tipo}
-        A questão aborda a área: {area}
-        A questão deve ser estruturada da seguinte forma:"""
-
-            if tem_introducao == "Sim":
-                base_prompt = (
-                    base_prompt + """\n- Apresenta-se uma introdução ao conteúdo"""
-                )
-
-            if tipo == "Código SQL":
-                base_prompt = (
-                    base_prompt
-                    + """\n- Apresenta-se o enunciado da questão seguindo o formato:
-            - Gera-se uma tabela de dados ficticios
-            - Imprime-se a tabela de dados
-            - Faz-se uma pergunta que o aluno deve responder com uma instrução SQL"""
-                )
-            elif tipo == "Código Python":
-                base_prompt = (
-                    base_prompt
-                    + """\n- Apresenta-se o enunciado da questão seguindo o formato:
-            - Gera-se uma tabela de dados ficticios
-            - Mostra-se a tabela de dados
-            - Faz-se uma pergunta que o aluno deve responder com um script Python que pode utilizar as bibliotecas pandas, matplotlib, requests e todas as biliotecas nativas do python"""
-                )
-            else:
-                base_prompt = (
-                    base_prompt + """\n- Apresenta-se o enunciado da questão"""
-                )
-
-            if tem_resposta == "Sim":
-                base_prompt = (
-                    base_prompt
-                    + """\n- Apresenta-se a resposta correta, e explique a resposta."""
-                )
-
-        return base_prompt
+        return prompts.build_prompt(
+            nivel, objetivo, tipo, area, tem_introducao, tem_resposta, bncc=False
+        )
 
     @staticmethod
     def set_key(key: str):
@@ -92,36 +100,122 @@ class Openai:
             prompt: text prompt
         Return: boolean if flagged
         """
-        try:
-            response = openai.Moderation.create(prompt)
-            return response["results"][0]["flagged"]
-        except Exception as e:
-            logging.error(f"OpenAI API error: {e}")
+        with metrics.track("openai", "moderate") as record:
+            try:
+                response = resilience.openai.call(
+                    openai.Moderation.create, prompt, record=record
+                )
+                return response["results"][0]["flagged"]
+            except Exception as e:
+                record.outcome = "error"
+                logging.error(f"OpenAI API error: {e}")
 
     @staticmethod
-    def complete(prompt: str, temperature: float = 0.9, max_tokens: int = 2048) -> str:
+    def complete(
+        prompt: str,
+        temperature: float = 0.9,
+        max_tokens: int = 2048,
+        cache: bool = True,
+        stream: bool = False,
+    ) -> str:
         """Call OpenAI GPT Completion with text prompt.
         Args:
             prompt: text prompt
+            cache: set to False to bypass the response cache for this call
+            stream: return a generator of text chunks instead of the full text
+        Return: predicted response text (or chunk generator when streaming)
+        """
+        kwargs = _request(prompt, temperature, max_tokens)
+        store = get_cache() if cache else None
+        cache_key, cached = _cached(store, kwargs)
+        if cached is not None:
+            return iter([cached]) if stream else cached
+        if stream:
+            return Openai._complete_stream(kwargs, store, cache_key)
+        with metrics.track("openai", "complete") as record:
+            reserved = prompts.estimate_tokens(prompt)
+            try:
+                response = resilience.openai.call(
+                    openai.ChatCompletion.create,
+                    tokens=reserved,
+                    record=record,
+                    **kwargs,
+                )
+                return _answer(record, reserved, response, store, cache_key)
+            except Exception as e:
+                record.outcome = "error"
+                logging.error(f"OpenAI API error: {e}")
+
+    @staticmethod
+    async def acomplete(
+        prompt: str,
+        temperature: float = 0.9,
+        max_tokens: int = 2048,
+        cache: bool = True,
+    ) -> str:
+        """Async counterpart of complete (ChatCompletion.acreate).
+        Args:
+            prompt: text prompt
+            cache: set to False to bypass the response cache for this call
         Return: predicted response text
         """
-        kwargs = {
-            "model": "gpt-3.5-turbo-16k",
-            "messages": [{"role": "user", "content": prompt}],
-            "temperature": temperature,
-            "max_tokens": max_tokens,
-            "top_p": 1,  # default
-            "frequency_penalty": 0,  # default,
-            "presence_penalty": 0,  # default
-        }
-        try:
-            response = openai.ChatCompletion.create(**kwargs)
-
-            lst_resp = [x["message"]["content"] for x in response["choices"]]
-            return "\n".join(lst_resp)
-
-        except Exception as e:
-            logging.error(f"OpenAI API error: {e}")
+        kwargs = _request(prompt, temperature, max_tokens)
+        store = get_cache() if cache else None
+        cache_key, cached = _cached(store, kwargs)
+        if cached is not None:
+            return cached
+        with metrics.track("openai", "complete") as record:
+            reserved = prompts.estimate_tokens(prompt)
+            try:
+                response = await resilience.openai.acall(
+                    openai.ChatCompletion.acreate,
+                    tokens=reserved,
+                    record=record,
+                    **kwargs,
+                )
+                return _answer(record, reserved, response, store, cache_key)
+            except Exception as e:
+                record.outcome = "error"
+                logging.error(f"OpenAI API error: {e}")
+
+    @staticmethod
+    def _complete_stream(kwargs: dict, store, cache_key: str):
+        """Yields the response text chunks as OpenAI produces them.
+        Only opening the stream is retried: chunks already shown are never
+        produced twice, so a failure after the first chunk is raised.
+        """
+        chunks = []
+        with metrics.track("openai", "complete") as record:
+            # A API não informa o uso de tokens em streaming: estimamos
+            record.input_tokens = prompts.estimate_tokens(
+                kwargs["messages"][0]["content"]
+            )
+            try:
+                response = resilience.openai.call(
+                    openai.ChatCompletion.create,
+                    stream=True,
+                    tokens=record.input_tokens,
+                    record=record,
+                    **kwargs,
+                )
+                for chunk in response:
+                    text = chunk["choices"][0]["delta"].get("content")
+                    if text:
+                        record.mark_first_token()
+                        chunks.append(text)
+                        record.output_tokens += prompts.estimate_tokens(text)
+                        yield text
+            except Exception as e:
+                record.outcome = "error"
+                logging.error(f"OpenAI API error: {e}")
+                # Texto parcial não é resposta: quem consome precisa saber
+                raise
+            finally:
+                resilience.openai.settle(
+                    record.input_tokens, record.input_tokens + record.output_tokens
+                )
+        if store:
+            store.set(cache_key, "".join(chunks))
 
     @staticmethod
     def image(prompt: str) -> str:
@@ -130,14 +224,18 @@ class Openai:
             prompt: text prompt
         Return: image url
         """
-        try:
-            response = openai.Image.create(
-                prompt=prompt,
-                n=1,
-                size="512x512",
-                response_format="url",
-            )
-            return response["data"][0]["url"]
+        with metrics.track("openai", "image") as record:
+            try:
+                response = resilience.openai.call(
+                    openai.Image.create,
+                    prompt=prompt,
+                    n=1,
+                    size="512x512",
+                    response_format="url",
+                    record=record,
+                )
+                return response["data"][0]["url"]
 
-        except Exception as e:
-            logging.error(f"OpenAI API error: {e}")
+            except Exception as e:
+                record.outcome = "error"
+                logging.error(f"OpenAI API error: {e}")
@@ -0,0 +1,388 @@
+"""Local plagiarism pre-screen for the Validar page."""
+
+# Import from standard library
+import logging
+import os
+import threading
+
+# Import from 3rd party libraries
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+import utils.config as config
+from utils import sync, text
+
+# Winnowing sobre sequências de K palavras com janelas de W hashes: todo
+# trecho comum com pelo menos K + W - 1 palavras é encontrado
+K = 5
+W = 6
+
+# Origens dos documentos indexados
+QUESTAO = "questao"
+CORPUS = "corpus"
+EXTENSOES_CORPUS = (".txt", ".md")
+
+# Resultados da triagem
+PLAGIO = "plagio"
+ORIGINAL = "original"
+INCONCLUSIVO = "inconclusivo"
+
+
+def words(texto: str) -> list:
+    """
+    Returns the lower-case words of a text, without the offsets of
+    tokenize() (fingerprints() removes the accents).
+    """
+    return text.WORD.findall((texto or "").lower())
+
+
+def tokenize(texto: str) -> tuple:
+    """
+    Returns the normalized words of a text (lower case, without accents) and
+    their (start, end) offsets in the text.
+    """
+    palavras, posicoes = [], []
+    for encontrada in text.WORD.finditer(texto or ""):
+        palavras.append(text.fold(encontrada.group()))
+        posicoes.append(encontrada.span())
+    return palavras, posicoes
+
+
+def fingerprints(palavras: list) -> tuple:
+    """
+    Returns the winnowed fingerprints of a word list: the hashes and the
+    position of their first word. Texts shorter than K words have none.
+    """
+    hashes = text.window_hashes(text.word_codes(palavras), K)
+    total = len(hashes)
+    if not total:
+        return np.empty(0, np.uint64), np.empty(0, np.int32)
+    if total <= W:
+        escolhidos = np.array([hashes.argmin()])
+    else:
+        janelas = sliding_window_view(hashes, W)
+        escolhidos = janelas.argmin(axis=1) + np.arange(len(janelas))
+        # Janelas vizinhas costumam escolher o mesmo hash (índices crescentes)
+        escolhidos = escolhidos[np.diff(escolhidos, prepend=-1) != 0]
+    return hashes[escolhidos], escolhidos.astype(np.int32)
+
+
+def _trecho(texto: str, posicoes: list, inicio: int, fim: int) -> str:
+    # Texto original entre a palavra `inicio` e a palavra `fim` (exclusive)
+    fim = min(fim, len(posicoes))
+    return texto[posicoes[inicio][0] : posicoes[fim - 1][1]]
+
+
+class FingerprintIndex:
+    """Winnowing fingerprints of the question bank and of a local corpus.
+    Fingerprints live in sorted arrays (hash, document, word position)
+    searched with np.searchsorted; new documents go to a small unsorted
+    delta merged once it grows, and removed documents are masked until the
+    next merge, which also renumbers the documents left. The bank follows the changes applied by utils.sync; the
+    corpus is every .txt/.md file under config.PLAGIO_CORPUS_DIR.
+    """
+
+    def __init__(self, corpus_dir: str = None, max_delta: int = 20000):
+        self.corpus_dir = corpus_dir
+        self.max_delta = max_delta
+        self.loaded = False
+        self._corpus = False
+        self._lock = threading.Lock()
+        self._docs = []  # número do documento -> (origem, chave)
+        self._numeros = {}  # (origem, chave) -> número do documento
+        self._vivos = np.zeros(0, dtype=bool)
+        self._hashes = np.empty(0, np.uint64)
+        self._doc = np.empty(0, np.int32)
+        self._pos = np.empty(0, np.int32)
+        self._delta = []
+
+    def __len__(self) -> int:
+        return len(self._numeros)
+
+    # Atualização -------------------------------------------------------
+
+    def _add(self, origem: str, chave, hashes, posicoes):
+        self._remove(origem, chave)
+        if not len(hashes):
+            return
+        numero = len(self._docs)
+        self._docs.append((origem, chave))
+        self._numeros[(origem, chave)] = numero
+        if numero >= len(self._vivos):
+            self._vivos = np.resize(self._vivos, max(1024, 2 * len(self._vivos)))
+        self._vivos[numero] = True
+        self._delta.append((hashes, np.full(len(hashes), numero, np.int32), posicoes))
+
+    def _remove(self, origem: str, chave):
+        numero = self._numeros.pop((origem, chave), None)
+        if numero is not None:
+            self._vivos[numero] = False
+
+    def _merge(self):
+        partes = [(self._hashes, self._doc, self._pos), *self._delta]
+        hashes = np.concatenate([h for h, _, _ in partes])
+        docs = np.concatenate([d for _, d, _ in partes])
+        posicoes = np.concatenate([p for _, _, p in partes])
+        vivos = self._vivos[docs]
+        ordem = np.argsort(hashes[vivos], kind="stable")
+        # Renumera os documentos vivos: números de documentos removidos ou
+        # reindexados não ficam ocupando espaço
+        numeros = np.flatnonzero(self._vivos[: len(self._docs)])
+        novos = np.zeros(len(self._docs), dtype=np.int32)
+        novos[numeros] = np.arange(len(numeros), dtype=np.int32)
+        self._docs = [self._docs[numero] for numero in numeros]
+        self._numeros = {doc: numero for numero, doc in enumerate(self._docs)}
+        self._vivos = np.ones(max(1024, len(self._docs)), dtype=bool)
+        self._hashes = hashes[vivos][ordem]
+        self._doc = novos[docs[vivos][ordem]]
+        self._pos = posicoes[vivos][ordem]
+        self._delta = []
+
+    def _merge_due(self) -> bool:
+        # Delta grande (busca linear) ou muitos documentos mortos
+        mortos = len(self._docs) - len(self._numeros)
+        return sum(len(h) for h, _, _ in self._delta) > self.max_delta or mortos > max(
+            1024, len(self._numeros)
+        )
+
+    def add_many(self, origem: str, textos: dict, replace: bool = False):
+        """
+        Indexes (or re-indexes) the documents {chave: texto} of an origin;
+        with replace=True the other documents of that origin are dropped.
+        """
+        # As fingerprints são calculadas fora do lock: as consultas seguem
+        calculadas = {
+            chave: fingerprints(words(texto)) for chave, texto in textos.items()
+        }
+        with self._lock:
+            if replace:
+                for doc in [doc for doc in self._numeros if doc[0] == origem]:
+                    self._remove(*doc)
+            for chave, (hashes, posicoes) in calculadas.items():
+                self._add(origem, chave, hashes, posicoes)
+            if replace or self._merge_due():
+                self._merge()
+
+    def on_change(self, event: str, rows: list):
+        """
+        utils.sync listener keeping the bank fingerprints in step with
+        applied changes.
+        """
+        if event == "delete":
+            with self._lock:
+                for row in rows:
+                    self._remove(QUESTAO, row["id"])
+                if self._merge_due():
+                    self._merge()
+            return
+        textos = {row["id"]: row["resultado"] for row in rows if "resultado" in row}
+        self.add_many(QUESTAO, textos, replace=event == "load")
+        if event == "load":
+            self.loaded = True
+
+    def load_corpus(self):
+        """
+        Indexes the files of the reference corpus.
+        """
+        if not self.corpus_dir:
+            self._corpus = True
+            return
+        textos = {}
+        for raiz, _, arquivos in os.walk(self.corpus_dir):
+            for arquivo in sorted(arquivos):
+                if not arquivo.lower().endswith(EXTENSOES_CORPUS):
+                    continue
+                caminho = os.path.join(raiz, arquivo)
+                try:
+                    with open(caminho, encoding="utf-8", errors="ignore") as f:
+                        textos[caminho] = f.read()
+                except OSError as e:
+                    logging.warning(f"Could not read {caminho}: {e}")
+        self.add_many(CORPUS, textos, replace=True)
+        self._corpus = True
+
+    def warmup(self):
+        """
+        Loads the corpus and the question mirror in the background, or
+        refreshes the mirror when stale (sync.QuestionSync.refresh_in_background).
+        """
+        if self._corpus:
+            sync.questions.refresh_in_background()
+        else:
+            # O espelho pode já ter sido carregado por outro índice
+            sync.questions.refresh_in_background(0, before=self.load_corpus)
+
+    # Consulta ----------------------------------------------------------
+
+    def _lookup(self, hashes: np.ndarray) -> tuple:
+        # Pares (fingerprint da consulta, documento, posição) encontrados;
+        # hashes presentes em muitos documentos (trechos padrão dos
+        # prompts) não indicam cópia e são ignorados
+        inicio = np.searchsorted(self._hashes, hashes, side="left")
+        fim = np.searchsorted(self._hashes, hashes, side="right")
+        contagem = fim - inicio
+        encontrados = []
+        frequencia = contagem.copy()
+        for delta_hashes, delta_docs, delta_pos in self._delta:
+            i, j = np.nonzero(hashes[:, None] == delta_hashes[None, :])
+            encontrados.append((i, delta_docs[j], delta_pos[j]))
+            frequencia += np.bincount(i, minlength=len(hashes))
+        # A frequência soma os dois segmentos: o corte vale para ambos
+        comuns = frequencia > max(config.PLAGIO_MAX_DF, len(self._numeros) // 100)
+        contagem[comuns] = 0
+        consulta = np.repeat(np.arange(len(hashes)), contagem)
+        deslocamento = np.arange(contagem.sum()) - np.repeat(
+            np.cumsum(contagem) - contagem, contagem
+        )
+        indices = np.repeat(inicio, contagem) + deslocamento
+        consulta, docs, posicoes = (
+            [consulta],
+            [self._doc[indices]],
+            [self._pos[indices]],
+        )
+        for i, delta_docs, delta_pos in encontrados:
+            raros = ~comuns[i]
+            consulta.append(i[raros])
+            docs.append(delta_docs[raros])
+            posicoes.append(delta_pos[raros])
+        consulta = np.concatenate(consulta)
+        docs = np.concatenate(docs)
+        posicoes = np.concatenate(posicoes)
+        vivos = self._vivos[docs]
+        return consulta[vivos], docs[vivos], posicoes[vivos]
+
+    def _texto(self, origem: str, chave) -> str:
+        if origem == QUESTAO:
+            row = sync.questions.get(chave)
+            return row.get("resultado") if row else None
+        try:
+            with open(chave, encoding="utf-8", errors="ignore") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def _trechos(self, texto, posicoes, texto_fonte, consulta, fonte) -> list:
+        # Agrupa os pares (posição na consulta, posição no documento) em
+        # trechos contíguos
+        posicoes_fonte = tokenize(texto_fonte)[1] if texto_fonte else []
+        grupos = []
+        for q, d in sorted(zip(consulta.tolist(), fonte.tolist())):
+            if grupos and q <= grupos[-1][1] + W:
+                grupo = grupos[-1]
+                grupo[1] = q
+                grupo[2] = min(grupo[2], d)
+                grupo[3] = max(grupo[3], d)
+            else:
+                grupos.append([q, q, d, d])
+        return [
+            {
+                "trecho": _trecho(texto, posicoes, q_ini, q_fim + K),
+                "fonte": (
+                    _trecho(texto_fonte, posicoes_fonte, d_ini, d_fim + K)
+                    if d_ini < len(posicoes_fonte)
+                    else ""
+                ),
+            }
+            for q_ini, q_fim, d_ini, d_fim in grupos
+        ]
+
+    def search(self, texto: str, limite: int = 5) -> tuple:
+        """
+        Returns the number of fingerprints of the text and up to `limite`
+        matching documents, most similar first, as dicts with origem, chave,
+        similaridade (share of the text's fingerprints found in the
+        document) and trechos (the matching passages of the text and of the
+        document).
+        """
+        palavras, posicoes = tokenize(texto)
+        hashes, inicios = fingerprints(palavras)
+        if not len(hashes):
+            return 0, []
+        with self._lock:
+            consulta, docs, fonte = self._lookup(hashes)
+            # Similaridade: fingerprints distintos da consulta no documento
+            unicos = np.unique(np.stack([docs, consulta]), axis=1)
+            numeros, achados = np.unique(unicos[0], return_counts=True)
+            melhores = np.argsort(-achados, kind="stable")[:limite]
+            documentos = [self._docs[numeros[i]] for i in melhores]
+        correspondencias = []
+        # Os textos das fontes são lidos fora do lock (o espelho tem o seu)
+        for i, (origem, chave) in zip(melhores, documentos):
+            mascara = docs == numeros[i]
+            correspondencias.append(
+                {
+                    "origem": origem,
+                    "chave": chave,
+                    "similaridade": float(achados[i] / len(hashes)),
+                    "trechos": self._trechos(
+                        texto,
+                        posicoes,
+                        self._texto(origem, chave),
+                        inicios[consulta[mascara]],
+                        fonte[mascara],
+                    ),
+                }
+            )
+        return len(hashes), correspondencias
+
+    def screen(self, texto: str) -> dict:
+        """
+        Screens a text against the local sources. The veredito is PLAGIO when
+        a document holds at least config.PLAGIO_LIMIAR of the text, ORIGINAL
+        when none holds more than config.PLAGIO_LIMIAR_ORIGINAL, and
+        INCONCLUSIVO in between, for texts too short to fingerprint or while
+        the index is loading.
+        """
+        self.warmup()
+        total, correspondencias = self.search(texto)
+        maior = correspondencias[0]["similaridade"] if correspondencias else 0.0
+        if maior >= config.PLAGIO_LIMIAR:
+            veredito = PLAGIO
+        elif (
+            self.loaded
+            and self._corpus
+            and total >= config.PLAGIO_MIN_FINGERPRINTS
+            and maior <= config.PLAGIO_LIMIAR_ORIGINAL
+        ):
+            veredito = ORIGINAL
+        else:
+            veredito = INCONCLUSIVO
+        return {"veredito": veredito, "correspondencias": correspondencias}
+
+
+def _resumo(texto: str, limite: int = 300) -> str:
+    return texto if len(texto) <= limite else texto[:limite].rstrip() + "..."
+
+
+def describe(origem: str, chave) -> str:
+    if origem == QUESTAO:
+        return f"Questão {chave}"
+    return f"Corpus: {os.path.basename(chave)}"
+
+
+def report(triagem: dict) -> str:
+    """
+    Returns the screening result as text for the Resultado box.
+    """
+    conclusao = {
+        PLAGIO: "O texto contém trechos copiados das fontes locais abaixo.",
+        ORIGINAL: "Nenhum trecho relevante encontrado no banco de questões "
+        "nem no corpus de referência.",
+        INCONCLUSIVO: "Verificação local inconclusiva.",
+    }[triagem["veredito"]]
+    linhas = [f"Verificação local: {conclusao}"]
+    for item in triagem["correspondencias"]:
+        linhas.append(
+            f"\n{describe(item['origem'], item['chave'])} - "
+            f"similaridade {item['similaridade']:.0%}"
+        )
+        for trecho in item["trechos"]:
+            linhas.append(f'- Trecho: "{_resumo(trecho["trecho"])}"')
+            if trecho["fonte"]:
+                linhas.append(f'  Fonte: "{_resumo(trecho["fonte"])}"')
+    return "\n".join(linhas)
+
+
+# Fingerprints do banco e do corpus, mantidos uma vez por processo
+index = FingerprintIndex(config.PLAGIO_CORPUS_DIR)
+sync.questions.add_listener(index.on_change)
@@ -1,70 +1,167 @@
 from pptx import Presentation
+from pptx.opc.constants import RELATIONSHIP_TYPE as RT
+from pptx.opc.packuri import PackURI
+from pptx.oxml import parse_xml
+from pptx.oxml.ns import nsdecls, qn
+from pptx.parts.slide import SlidePart
+from xml.sax.saxutils import escape
 from copy import deepcopy
-import os
+import functools
+import io
+import re
 
+SLD_LAYOUT = 0
 
-def copy_slide(prs, slide):
-    SLD_LAYOUT = 0
+# Texto das caixas do template -> coluna da questão que as substitui.
+# As caixas dos campos estruturados são opcionais no template.
+CAMPOS = {
+    "id": "label",
+    "nivel": "nivel",
+    "tipo": "tipo",
+    "area": "area",
+    "questao": "resultado",
+    "introducao": "introducao",
+    "enunciado": "enunciado",
+    "codigo": "codigo",
+    "alternativas": "alternativas",
+    "resposta": "resposta_correta",
+    "explicacao": "explicacao",
+}
+
+# Caracteres de controle que o PowerPoint representa como "_xHHHH_"
+_CTRL_CHARS = re.compile(r"([\x00-\x08\x0B-\x1F])")
+
+
+class SlideTemplate:
+    """Template slide compiled once per process.
+    Keeps the template file bytes, the XML of every shape of its first slide,
+    which of those shapes are placeholders (see CAMPOS) and the relationship
+    ids of the images they embed, so exports neither re-read the template
+    nor round-trip images through the filesystem.
+    """
+
+    def __init__(self, template_filename):
+        with open(template_filename, "rb") as f:
+            self.blob = f.read()
+        slide = Presentation(io.BytesIO(self.blob)).slides[0]
+        self.shapes = []
+        self.image_rids = set()
+        for shp in slide.shapes:
+            campo = None
+            if shp.has_text_frame:
+                campo = CAMPOS.get(shp.text)
+            self.shapes.append((shp.element, campo))
+            for blip in shp.element.iter(qn("a:blip")):
+                self.image_rids.add(blip.get(qn("r:embed")))
+
+    def open(self):
+        """
+        Returns a new presentation loaded from the template bytes and the image
+        parts of its first slide, by relationship id.
+        """
+        prs = Presentation(io.BytesIO(self.blob))
+        rels = prs.slides[0].part.rels
+        images = {rId: rels[rId].target_part for rId in self.image_rids}
+        return prs, images
+
+
+@functools.lru_cache(maxsize=8)
+def load_template(template_filename):
+    return SlideTemplate(template_filename)
+
+
+def paragraphs_xml(text):
+    """
+    Returns the <a:p> elements python-pptx writes for `shape.text = text`:
+    one paragraph per line feed, a line break per vertical tab.
+    """
+    paragraphs = []
+    for linha in text.split("\n"):
+        runs = []
+        for idx, trecho in enumerate(linha.split("\v")):
+            if idx > 0:
+                runs.append("<a:br/>")
+            if trecho:
+                trecho = _CTRL_CHARS.sub(lambda m: "_x%04X_" % ord(m.group(1)), trecho)
+                runs.append(f"<a:r><a:t>{escape(trecho)}</a:t></a:r>")
+        paragraphs.append(f"<a:p>{''.join(runs)}</a:p>" if runs else "<a:p/>")
+    return parse_xml(f"<a:txBody {nsdecls('a')}>{''.join(paragraphs)}</a:txBody>")
+
+
+def set_text(shape_element, text):
+    txBody = shape_element.find(qn("p:txBody"))
+    for p in txBody.findall(qn("a:p")):
+        txBody.remove(p)
+    for p in list(paragraphs_xml(text)):
+        txBody.append(p)
+
+
+def add_slide(prs, slide_layout, slide_id):
+    """
+    Same as prs.slides.add_slide(), without the scans over every existing
+    slide relationship and id that make python-pptx quadratic on large decks.
+    """
+    sldIdLst = prs.slides._sldIdLst
+    partname = PackURI("/ppt/slides/slide%d.xml" % (len(sldIdLst) + 1))
+    slide_part = SlidePart.new(partname, prs.part.package, slide_layout.part)
+    rId = prs.part.rels._add_relationship(RT.SLIDE, slide_part)
+    sldIdLst._add_sldId(id=slide_id, rId=rId)
+    return slide_part.slide
+
+
+def copy_slide(prs, template, images, slide_id):
     slide_layout = prs.slide_layouts[SLD_LAYOUT]
+    new_slide = add_slide(prs, slide_layout, slide_id)
+
+    # Todos os slides apontam para as mesmas partes de imagem do template
+    rids = {
+        rId: new_slide.part.relate_to(part, RT.IMAGE) for rId, part in images.items()
+    }
+
+    placeholders = []
+    for el, campo in template.shapes:
+        newel = deepcopy(el)
+        for blip in newel.iter(qn("a:blip")):
+            blip.set(qn("r:embed"), rids[blip.get(qn("r:embed"))])
+        new_slide.shapes._spTree.insert_element_before(newel, "p:extLst")
+        if campo:
+            placeholders.append((newel, campo))
+
+    return new_slide, placeholders
+
 
-    new_slide = prs.slides.add_slide(slide_layout)
-
-    imgDict = {}
-
-    for shp in slide.shapes:
-        print(shp.name)
-        if "Google" in shp.name:
-            # save image
-            with open(shp.name + ".jpg", "wb") as f:
-                try:
-                    f.write(shp.image.blob)
-                    imgDict[shp.name + ".jpg"] = [
-                        shp.left,
-                        shp.top,
-                        shp.width,
-                        shp.height,
-                    ]
-                except:
-                    el = shp.element
-                    newel = deepcopy(el)
-                    new_slide.shapes._spTree.insert_element_before(newel, "p:extLst")
-
-        else:
-            el = shp.element
-            newel = deepcopy(el)
-            new_slide.shapes._spTree.insert_element_before(newel, "p:extLst")
-
-    for k, v in imgDict.items():
-        new_slide.shapes.add_picture(k, v[0], v[1], v[2], v[3])
-        os.remove(k)
-
-    return new_slide
-
-
-def create_slide(prs, slide_to_copy, item):
-    slide = copy_slide(prs, slide_to_copy)
-    for shape in slide.shapes:
-        if shape.has_text_frame:
-            if shape.text == "id":
-                shape.text = item["label"]
-            elif shape.text == "nivel":
-                shape.text = item["nivel"]
-            elif shape.text == "tipo":
-                shape.text = item["tipo"]
-            elif shape.text == "area":
-                shape.text = item["area"]
-            elif shape.text == "questao":
-                shape.text = item["resultado"]
+def create_slide(prs, template, images, slide_id, item):
+    slide, placeholders = copy_slide(prs, template, images, slide_id)
+    for el, campo in placeholders:
+        valor = item.get(campo)
+        set_text(el, "" if valor is None else str(valor))
     return slide
 
 
-def create_presentation(slides, template_filename, presentation_filename):
-    # Carregue a apresentação existente
-    prs = Presentation(template_filename)
-    slide_to_copy = prs.slides[0]
+def create_presentation(
+    slides, template_filename, presentation_filename=None, on_progress=None
+):
+    """
+    Creates one slide per row of `slides` from the template. The presentation
+    is saved to `presentation_filename` (a path or a writable stream) or, when
+    it is None, returned as bytes without touching the disk.
+    `on_progress(feitos, total)` is called after each slide.
+    """
+    # Carregue a apresentação a partir do template compilado
+    template = load_template(template_filename)
+    prs, images = template.open()
+    slide_id = max(int(s.get("id")) for s in prs.slides._sldIdLst) + 1
 
-    for idx, slide in slides.iterrows():
-        create_slide(prs, slide_to_copy, slide)
+    for feitos, (idx, slide) in enumerate(slides.iterrows(), start=1):
+        create_slide(prs, template, images, slide_id, slide)
+        slide_id += 1
+        if on_progress:
+            on_progress(feitos, len(slides))
 
-    # Salvar a apresentação em um arquivo
-    prs.save(presentation_filename)
+    # Salvar a apresentação em um arquivo, stream ou em memória
+    if presentation_filename is not None:
+        prs.save(presentation_filename)
+        return None
+    buffer = io.BytesIO()
+    prs.save(buffer)
+    return buffer.getvalue()
@@ -0,0 +1,189 @@
+"""Prompt templates shared by the LLM connectors."""
+
+# Import from standard library
+import functools
+import string
+import textwrap
+from typing import NamedTuple
+
+import utils.config as config
+
+# Estimativa grosseira de caracteres por token para texto em português
+CHARS_PER_TOKEN = 4
+
+
+class Template:
+    """A config.PROMPTS entry parsed once into literal chunks and positional
+    fields, so rendering is a single join instead of a str.format parse.
+    """
+
+    def __init__(self, text: str):
+        self.parts = []
+        for literal, field, spec, conversion in string.Formatter().parse(text):
+            if spec or conversion or (field is not None and not field.isdigit()):
+                raise ValueError(f"Unsupported prompt field: {{{field}}}")
+            self.parts.append((literal, int(field) if field is not None else None))
+
+    def render(self, *args) -> str:
+        return "".join(
+            literal + (str(args[field]) if field is not None else "")
+            for literal, field in self.parts
+        )
+
+
+class RenderedPrompt(NamedTuple):
+    text: str
+    tokens: int
+
+
+TEMPLATES = {tipo: Template(texto) for tipo, texto in config.PROMPTS.items()}
+
+COMPETENCIAS = "\n".join(
+    [f'{comp["titulo"]} - {comp["descricao"]}' for comp in config.bncc_competencias]
+)
+BNCC = f"""\n- Relacione a questão gerada com até duas competências da BNCC que estão listadas abaixo: 
+                    - Apresente as duas competências selecionadas com o seguinte formato
+                    Compentencia <numero>. <titulo competência> - <descricao competência> - <explicacao sobre como a questão se relaciona com a competência>
+                    {COMPETENCIAS}"""
+OBJETIVOS = """\n Gere dois objetivos de ensino, seguindo a taxonomia de Bloom, para a questão."""
+SUFIXO = BNCC + OBJETIVOS
+# Na saída estruturada o formato vem do esquema JSON (utils/schemas.py)
+SUFIXO_ESTRUTURADO = f"""\n- Relacione a questão com até duas das competências da BNCC abaixo:
+                    {COMPETENCIAS}
+- Gere dois objetivos de ensino, seguindo a taxonomia de Bloom."""
+
+CODIGO_SQL = """\n- Apresenta-se o enunciado da questão seguindo o formato:
+            - Gera-se uma tabela de dados ficticios
+            - Imprime-se a tabela de dados
+            - Faz-se uma pergunta que o aluno deve responder com uma instrução SQL"""
+CODIGO_PYTHON = """\n- Apresenta-se o enunciado da questão seguindo o formato:
+            - Gera-se uma tabela de dados ficticios
+            - Mostra-se a tabela de dados
+            - Faz-se uma pergunta que o aluno deve responder com um script Python que pode utilizar as bibliotecas pandas, matplotlib, requests e todas as biliotecas nativas do python"""
+
+
+# Várias questões por chamada: o cabeçalho, a lista da BNCC e as instruções
+# de Bloom vão uma única vez, e as regras de cada tipo uma vez por tipo
+MARCADOR_ESTRUTURA = "A questão deve ser estruturada da seguinte forma:"
+PREFIXO_LOTE = """Você é um especialista em Ciência da Computação.
+Elabore {0} questões distintas entre si sobre a ementa descrita abaixo:
+Ementa: {1}
+Cada questão tem o tipo, o nível e a área indicados na lista de questões e
+deve ser estruturada conforme as regras do seu tipo."""
+SUFIXO_LOTE = """\nEm cada questão:""" + SUFIXO_ESTRUTURADO + """
+Responda com uma lista JSON com um item por questão, na ordem da lista,
+informando em "numero" o número da questão."""
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Returns a rough token count for the text (no tokenizer round trip).
+    """
+    return max(1, -(-len(text) // CHARS_PER_TOKEN))
+
+
+def _base_prompt(
+    nivel: str,
+    objetivo: str,
+    tipo: str,
+    area: str,
+    tem_introducao: str,
+    tem_resposta: str,
+) -> str:
+    if tipo in TEMPLATES:
+        return TEMPLATES[tipo].render(
+            nivel, objetivo, tipo, area, tem_introducao, tem_resposta
+        )
+
+    base_prompt = f"""Você é um especialista em Ciência de Dados.
+        Elabore uma questão de nível {nivel} sobre a ementa descrita abaixo:
+        Ementa: {objetivo}
+        A questão deve ser do tipo: {tipo}
+        A questão aborda a área: {area}
+        A questão deve ser estruturada da seguinte forma:"""
+    if tem_introducao == "Sim":
+        base_prompt += """\n- Apresenta-se uma introdução ao conteúdo"""
+    if tipo == "Código SQL":
+        base_prompt += CODIGO_SQL
+    elif tipo == "Código Python":
+        base_prompt += CODIGO_PYTHON
+    else:
+        base_prompt += """\n- Apresenta-se o enunciado da questão"""
+    if tem_resposta == "Sim":
+        base_prompt += """\n- Apresenta-se a resposta correta, e explique a resposta."""
+    return base_prompt
+
+
+@functools.lru_cache(maxsize=2048)
+def render(
+    nivel: str,
+    objetivo: str,
+    tipo: str,
+    area: str,
+    tem_introducao: str,
+    tem_resposta: str,
+    bncc: bool = True,
+    estruturada: bool = False,
+) -> RenderedPrompt:
+    """Renders the question prompt (memoized).
+    Args:
+        bncc: append the BNCC competencies and Bloom objectives suffix
+        estruturada: for a JSON response schema, without the text formatting
+            instructions of the suffix
+    Return: RenderedPrompt(text, tokens) with an estimated token count
+    """
+    text = _base_prompt(nivel, objetivo, tipo, area, tem_introducao, tem_resposta)
+    if bncc:
+        text += SUFIXO_ESTRUTURADO if estruturada else SUFIXO
+    return RenderedPrompt(text, estimate_tokens(text))
+
+
+def build_prompt(
+    nivel: str,
+    objetivo: str,
+    tipo: str,
+    area: str,
+    tem_introducao: str,
+    tem_resposta: str,
+    bncc: bool = True,
+    estruturada: bool = False,
+) -> str:
+    """
+    Returns the text of the question prompt (see render()).
+    """
+    return render(
+        nivel, objetivo, tipo, area, tem_introducao, tem_resposta, bncc, estruturada
+    ).text
+
+
+@functools.lru_cache(maxsize=256)
+def estrutura(tipo: str, tem_introducao: str, tem_resposta: str) -> str:
+    """
+    Returns the structure rules of a question type: its prompt without the
+    shared header (role, nivel, ementa, tipo and area).
+    """
+    text = _base_prompt("", "", tipo, "", tem_introducao, tem_resposta)
+    return textwrap.dedent(text.partition(MARCADOR_ESTRUTURA)[2]).strip()
+
+
+@functools.lru_cache(maxsize=512)
+def render_lote(
+    objetivo: str,
+    itens: tuple,
+    tem_introducao: str,
+    tem_resposta: str,
+) -> RenderedPrompt:
+    """Renders one prompt asking for several questions (memoized).
+    Args:
+        itens: tuple of (tipo, nivel, area), one per question
+    Return: RenderedPrompt(text, tokens); the response is a JSON list in the
+        schema of utils.schemas.schema_lote()
+    """
+    partes = [PREFIXO_LOTE.format(len(itens), objetivo), "\nRegras por tipo:"]
+    for tipo in dict.fromkeys(tipo for tipo, _, _ in itens):
+        partes.append(f"[{tipo}]\n{estrutura(tipo, tem_introducao, tem_resposta)}")
+    partes.append("\nQuestões:")
+    for numero, (tipo, nivel, area) in enumerate(itens, start=1):
+        partes.append(f"{numero}. Tipo: {tipo}; Nível: {nivel}; Área: {area}")
+    text = "\n".join(partes) + SUFIXO_LOTE
+    return RenderedPrompt(text, estimate_tokens(text))
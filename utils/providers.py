@@ -0,0 +1,71 @@
+"""Common interface of the text-generation connectors."""
+
+# Import from standard library
+import os
+
+import utils.config as config
+from utils import resilience
+from utils.gemini import Gemini
+from utils.oai import Openai
+
+
+class Provider:
+    """Text-generation provider.
+    Attributes:
+      name: provider name, as used in the metrics labels
+      model: model name
+    Methods:
+      complete(prompt, cache=True, stream=False):
+        Returns the response text (or a chunk generator when streaming), or
+        None on failure. A stream that breaks midway raises.
+      healthy():
+        False while the provider circuit breaker is open.
+    """
+
+    name = None
+    model = None
+    policy = None
+
+    def complete(self, prompt: str, cache: bool = True, stream: bool = False):
+        raise NotImplementedError
+
+    def healthy(self) -> bool:
+        return self.policy.breaker.state != "open"
+
+    def __repr__(self):
+        return f"{self.name}:{self.model}"
+
+
+class GeminiProvider(Provider):
+    name = "gemini"
+    policy = resilience.gemini
+
+    def __init__(self, key: str = None, model_name: str = config.GEMINI_MODEL):
+        self.model = model_name
+        self._model = Gemini.get_model(key, model_name)
+
+    def complete(self, prompt: str, cache: bool = True, stream: bool = False):
+        return Gemini.complete(prompt, self._model, cache=cache, stream=stream)
+
+
+class OpenaiProvider(Provider):
+    name = "openai"
+    model = config.OPENAI_MODEL
+    policy = resilience.openai
+
+    def __init__(self, key: str = None):
+        Openai.set_key(key or os.getenv("OPENAI_API_KEY"))
+
+    def complete(self, prompt: str, cache: bool = True, stream: bool = False):
+        return Openai.complete(prompt, cache=cache, stream=stream)
+
+
+def available_providers() -> list:
+    """
+    Returns the configured providers: Gemini always, OpenAI only when
+    OPENAI_API_KEY is set.
+    """
+    providers = [GeminiProvider(os.getenv("GEMINIAI_API_KEY"))]
+    if os.getenv("OPENAI_API_KEY"):
+        providers.append(OpenaiProvider())
+    return providers
@@ -0,0 +1,87 @@
+"""Client-side rate limiting for provider calls."""
+
+# Import from standard library
+import asyncio
+import threading
+import time
+
+
+class _Bucket:
+    """Token bucket refilled continuously up to `per_minute`."""
+
+    def __init__(self, per_minute: int):
+        self.capacity = float(per_minute)
+        self.tokens = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.updated = time.monotonic()
+
+    def refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait(self, amount: float) -> float:
+        """Seconds until `amount` is available (0 when it already is)."""
+        return max(0.0, (amount - self.tokens) / self.rate)
+
+
+class RateLimiter:
+    """Thread-safe limiter allowing `per_minute` calls and, optionally,
+    `tokens_per_minute` model tokens per minute.
+    Both buckets start full, so short bursts up to the limits go through at
+    once and sustained load is spread evenly over the minute. Token costs are
+    estimated up front and corrected with the real usage through settle(),
+    which may leave the token bucket in debt until it refills.
+    """
+
+    def __init__(self, per_minute: int, tokens_per_minute: int = None):
+        self.per_minute = per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self._calls = _Bucket(per_minute)
+        self._tokens = _Bucket(tokens_per_minute) if tokens_per_minute else None
+        self._lock = threading.Lock()
+
+    def _try_acquire(self, tokens: int) -> float:
+        """
+        Takes the call if it is allowed now (returns 0), otherwise returns the
+        seconds to wait before trying again.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._calls.refill(now)
+            wait = self._calls.wait(1)
+            if self._tokens:
+                self._tokens.refill(now)
+                # Uma chamada maior que a cota inteira espera só o bucket cheio
+                cost = min(tokens, self._tokens.capacity)
+                wait = max(wait, self._tokens.wait(cost))
+            if wait == 0:
+                self._calls.tokens -= 1
+                if self._tokens:
+                    self._tokens.tokens -= tokens
+            return wait
+
+    def acquire(self, tokens: int = 0):
+        """
+        Blocks until a call costing about `tokens` model tokens is allowed.
+        """
+        while wait := self._try_acquire(tokens):
+            time.sleep(wait)
+
+    async def aacquire(self, tokens: int = 0):
+        """
+        Same as acquire(), waiting without blocking the event loop.
+        """
+        while wait := self._try_acquire(tokens):
+            await asyncio.sleep(wait)
+
+    def settle(self, reserved: int, used: int):
+        """
+        Corrects the token bucket once the real usage of a call is known.
+        """
+        if not self._tokens or used is None:
+            return
+        with self._lock:
+            self._tokens.refill(time.monotonic())
+            self._tokens.tokens = min(
+                self._tokens.capacity, self._tokens.tokens + reserved - used
+            )
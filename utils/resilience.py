@@ -0,0 +1,195 @@
+"""Retries, rate limiting and circuit breaking for provider calls."""
+
+# Import from standard library
+import asyncio
+import logging
+import random
+import threading
+import time
+
+import utils.config as config
+from utils.ratelimit import RateLimiter
+
+# Exceções transitórias dos SDKs (google.api_core, openai 0.x, requests/httpx)
+RETRYABLE_ERRORS = {
+    "ResourceExhausted",
+    "TooManyRequests",
+    "ServiceUnavailable",
+    "InternalServerError",
+    "DeadlineExceeded",
+    "GatewayTimeout",
+    "RateLimitError",
+    "ServiceUnavailableError",
+    "APIConnectionError",
+    "Timeout",
+    "TryAgain",
+    "ConnectionError",
+    "ConnectTimeout",
+    "ReadTimeout",
+    "TimeoutError",
+}
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a provider whose circuit is open."""
+
+
+def is_retryable(error: Exception) -> bool:
+    """
+    Returns True for throttling (429), server (5xx) and connection errors.
+    """
+    if type(error).__name__ in RETRYABLE_ERRORS:
+        return True
+    for attr in ("code", "status_code", "http_status"):
+        status = getattr(error, attr, None)
+        if isinstance(status, int) and (status == 429 or 500 <= status < 600):
+            return True
+    return False
+
+
+def backoff(attempt: int, base: float, cap: float) -> float:
+    """
+    Returns the delay before retry `attempt` (0-based): exponential with full
+    jitter, so concurrent sessions do not retry in lockstep.
+    """
+    return random.uniform(0, min(cap, base * 2**attempt))
+
+
+class CircuitBreaker:
+    """Fails fast after `failures` consecutive retryable errors.
+    The circuit stays open for `reset_timeout` seconds, then lets a single
+    trial call through (half-open): success closes it, failure reopens it.
+    """
+
+    def __init__(self, failures: int, reset_timeout: float):
+        self.failures = failures
+        self.reset_timeout = reset_timeout
+        self._count = 0
+        self._opened = None
+        self._trial = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._opened is None:
+                return "closed"
+            if time.monotonic() - self._opened >= self.reset_timeout:
+                return "half_open"
+            return "open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._opened is None:
+                return True
+            if self._trial or time.monotonic() - self._opened < self.reset_timeout:
+                return False
+            self._trial = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._count = 0
+            self._opened = None
+            self._trial = False
+
+    def record_failure(self):
+        with self._lock:
+            self._count += 1
+            if self._trial or self._count >= self.failures:
+                self._opened = time.monotonic()
+            self._trial = False
+
+
+class Policy:
+    """Rate limiter, retries and circuit breaker shared by the calls to one
+    provider.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        rpm: int,
+        tpm: int = None,
+        attempts: int = config.RETRY_ATTEMPTS,
+        base_delay: float = config.RETRY_BASE_DELAY,
+        max_delay: float = config.RETRY_MAX_DELAY,
+        failures: int = config.BREAKER_FAILURES,
+        reset_timeout: float = config.BREAKER_RESET,
+    ):
+        self.name = name
+        self.limiter = RateLimiter(rpm, tpm)
+        self.breaker = CircuitBreaker(failures, reset_timeout)
+        self.attempts = attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def call(self, fn, *args, tokens: int = 0, record=None, **kwargs):
+        """Calls fn(*args, **kwargs) under the provider quota.
+        Retryable errors are retried with jittered exponential backoff up to
+        `attempts` times; other errors, and the last retryable one, are
+        raised. Raises CircuitOpenError without calling while the circuit is
+        open.
+        Args:
+            tokens: estimated model tokens of the call, for the TPM quota
+            record: optional metrics.CallRecord whose retries are counted
+        """
+        for attempt in range(self.attempts):
+            self._check_circuit()
+            self.limiter.acquire(tokens)
+            try:
+                result = fn(*args, **kwargs)
+            except Exception as e:
+                time.sleep(self._retry_delay(attempt, e, record))
+            else:
+                self.breaker.record_success()
+                return result
+
+    async def acall(self, fn, *args, tokens: int = 0, record=None, **kwargs):
+        """
+        Same as call() for a coroutine function: awaits fn(*args, **kwargs),
+        waiting for the quota and between retries without blocking the loop.
+        """
+        for attempt in range(self.attempts):
+            self._check_circuit()
+            await self.limiter.aacquire(tokens)
+            try:
+                result = await fn(*args, **kwargs)
+            except Exception as e:
+                await asyncio.sleep(self._retry_delay(attempt, e, record))
+            else:
+                self.breaker.record_success()
+                return result
+
+    def _check_circuit(self):
+        if not self.breaker.allow():
+            raise CircuitOpenError(f"{self.name} circuit open")
+
+    def _retry_delay(self, attempt: int, error: Exception, record) -> float:
+        """
+        Returns the backoff before retrying after `error`, or re-raises it
+        when it is not retryable or the attempts are exhausted.
+        """
+        if not is_retryable(error):
+            # O provedor respondeu: o erro é da chamada, não do serviço
+            self.breaker.record_success()
+            raise error
+        self.breaker.record_failure()
+        if attempt + 1 == self.attempts:
+            raise error
+        delay = backoff(attempt, self.base_delay, self.max_delay)
+        logging.warning(f"{self.name} call failed ({error}); retrying in {delay:.1f}s")
+        if record is not None:
+            record.retries += 1
+        return delay
+
+    def settle(self, reserved: int, used: int):
+        """
+        Corrects the TPM quota with the real token usage of a call.
+        """
+        self.limiter.settle(reserved, used)
+
+
+# Políticas compartilhadas por todas as sessões do processo
+gemini = Policy("gemini", config.GEMINI_RPM, config.GEMINI_TPM)
+openai = Policy("openai", config.OPENAI_RPM, config.OPENAI_TPM)
@@ -0,0 +1,258 @@
+"""Latency-aware routing and hedged requests across providers."""
+
+# Import from standard library
+import contextvars
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import utils.config as config
+from utils import metrics
+from utils.providers import available_providers
+
+
+class LatencyWindow:
+    """Rolling latencies and outcomes of the calls of the last `window`
+    seconds, for one provider and kind of call ("complete" or "stream").
+    """
+
+    def __init__(self, window: float = config.ROUTER_WINDOW):
+        self.window = window
+        self._samples = deque()
+        self._lock = threading.Lock()
+
+    def _expire(self, now: float):
+        while self._samples and now - self._samples[0][0] > self.window:
+            self._samples.popleft()
+
+    def add(self, latency: float, ok: bool):
+        now = time.monotonic()
+        with self._lock:
+            self._samples.append((now, latency, ok))
+            self._expire(now)
+
+    def snapshot(self) -> dict:
+        """
+        Returns {"samples", "p50", "p95", "error_rate"} (None latencies while
+        no call succeeded).
+        """
+        with self._lock:
+            self._expire(time.monotonic())
+            samples = list(self._samples)
+        latencies = sorted(latency for _, latency, ok in samples if ok)
+        errors = sum(1 for _, _, ok in samples if not ok)
+
+        def quantile(q):
+            if not latencies:
+                return None
+            return latencies[int(q * (len(latencies) - 1))]
+
+        return {
+            "samples": len(samples),
+            "p50": quantile(0.5),
+            "p95": quantile(0.95),
+            "error_rate": errors / len(samples) if samples else 0.0,
+        }
+
+
+class Router:
+    """Routes each request to the fastest healthy provider.
+    Providers are ranked by rolling p50 latency; a provider whose circuit is
+    open or whose error rate is above `max_error_rate` goes to the end of the
+    list. Providers with fewer than `min_samples` recent calls keep their
+    registration order ahead of the measured ones, so they get sampled.
+    With `hedge` on, a request still unanswered after the p95 latency of its
+    provider is also sent to the next one, and the first answer wins.
+    """
+
+    def __init__(
+        self,
+        providers: list,
+        hedge: bool = config.ROUTER_HEDGE,
+        min_samples: int = config.ROUTER_MIN_SAMPLES,
+        max_error_rate: float = config.ROUTER_MAX_ERROR_RATE,
+    ):
+        self.providers = list(providers)
+        self.hedge = hedge
+        self.min_samples = min_samples
+        self.max_error_rate = max_error_rate
+        self._windows = {
+            (p.name, kind): LatencyWindow()
+            for p in self.providers
+            for kind in ("complete", "stream")
+        }
+        self._executor = ThreadPoolExecutor(
+            max_workers=4 * config.BATCH_MAX_WORKERS, thread_name_prefix="router"
+        )
+
+    def _submit(self, fn, *args):
+        # As threads do executor não herdam os rótulos das métricas
+        return self._executor.submit(contextvars.copy_context().run, fn, *args)
+
+    def healthy(self, provider, kind: str = "complete") -> bool:
+        stats = self._windows[(provider.name, kind)].snapshot()
+        return provider.healthy() and (
+            stats["samples"] < self.min_samples
+            or stats["error_rate"] <= self.max_error_rate
+        )
+
+    def ranked(self, kind: str = "complete") -> list:
+        """
+        Returns the providers, best first.
+        """
+
+        def sort_key(item):
+            idx, provider = item
+            stats = self._windows[(provider.name, kind)].snapshot()
+            measured = stats["samples"] >= self.min_samples and stats["p50"]
+            return (
+                not self.healthy(provider, kind),
+                bool(measured),
+                stats["p50"] if measured else 0,
+                idx,
+            )
+
+        return [p for _, p in sorted(enumerate(self.providers), key=sort_key)]
+
+    def hedge_after(self, provider, kind: str = "complete") -> float:
+        """
+        Seconds to wait before hedging a request to `provider` (its p95), or
+        None while there are too few samples.
+        """
+        stats = self._windows[(provider.name, kind)].snapshot()
+        if stats["samples"] < self.min_samples:
+            return None
+        return stats["p95"]
+
+    def stats(self) -> list:
+        """
+        Returns the rolling statistics of every provider and kind of call.
+        """
+        return [
+            {"provider": repr(p), "kind": kind, **window.snapshot()}
+            for p in self.providers
+            for (name, kind), window in self._windows.items()
+            if name == p.name
+        ]
+
+    def _observe(self, provider, kind: str, started: float, ok: bool, chamadas):
+        # Respostas do cache não medem o provedor: ficariam com ~0 ms e
+        # puxariam o p50/p95 (ranking e hedge) para baixo
+        if chamadas and all(c.outcome == "cache_hit" for c in chamadas):
+            return
+        self._windows[(provider.name, kind)].add(time.monotonic() - started, ok)
+
+    def _timed(self, provider, prompt: str, cache: bool):
+        started = time.monotonic()
+        with metrics.records() as chamadas:
+            try:
+                resultado = provider.complete(prompt, cache=cache)
+            except Exception as e:
+                logging.error(f"{provider.name} call failed: {e}")
+                resultado = None
+        self._observe(provider, "complete", started, bool(resultado), chamadas)
+        return resultado
+
+    def complete(self, prompt: str, cache: bool = True, stream: bool = False):
+        """Generates the response with the fastest healthy provider.
+        Args:
+            prompt: text prompt
+            cache: set to False to bypass the response cache for this call
+            stream: return a generator of text chunks instead of the full text
+        Return: response text (or chunk generator), None when every provider
+            failed; the generator raises when the stream breaks after its
+            first chunk
+        """
+        if stream:
+            return self._stream(prompt, cache)
+        ranked = self.ranked("complete")
+        pending = {self._submit(self._timed, ranked[0], prompt, cache): 0}
+        proximo = 1
+        timeout = self.hedge_after(ranked[0]) if self.hedge else None
+        while pending:
+            done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            for future in done:
+                pending.pop(future)
+                if future.result():
+                    return future.result()
+            # Sem resposta a tempo (hedge) ou falhou: aciona o próximo provedor
+            if proximo < len(ranked) and (done or self.hedge):
+                pending[self._submit(self._timed, ranked[proximo], prompt, cache)] = (
+                    proximo
+                )
+                proximo += 1
+            timeout = None
+        return None
+
+    def _open_stream(self, provider, prompt: str, cache: bool):
+        """
+        Opens the stream of `provider` and waits for its first chunk.
+        Returns (first chunk, generator), or None when it produced nothing.
+        """
+        started = time.monotonic()
+        chunks = None
+        with metrics.records() as chamadas:
+            try:
+                chunks = iter(provider.complete(prompt, cache=cache, stream=True))
+                first = next(chunks)
+            except Exception as e:
+                if not isinstance(e, StopIteration):
+                    logging.error(f"{provider.name} stream failed: {e}")
+                self._observe(provider, "stream", started, False, chamadas)
+                return None
+        self._observe(provider, "stream", started, True, chamadas)
+        return first, chunks
+
+    def _stream(self, prompt: str, cache: bool):
+        """
+        Yields the chunks of the first provider to produce one. Hedging uses
+        the time to first chunk: the losing stream is closed.
+        """
+        ranked = self.ranked("stream")
+        pending = {self._submit(self._open_stream, ranked[0], prompt, cache): 0}
+        proximo = 1
+        timeout = self.hedge_after(ranked[0], "stream") if self.hedge else None
+        vencedor = None
+        while pending and vencedor is None:
+            done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            for future in done:
+                pending.pop(future)
+                if future.result() and vencedor is None:
+                    vencedor = future.result()
+            if vencedor is None and proximo < len(ranked) and (done or self.hedge):
+                pending[
+                    self._submit(self._open_stream, ranked[proximo], prompt, cache)
+                ] = proximo
+                proximo += 1
+            timeout = None
+        for future in pending:
+            future.add_done_callback(_close_stream)
+        if vencedor is None:
+            return
+        first, chunks = vencedor
+        yield first
+        yield from chunks
+
+
+def _close_stream(future):
+    aberto = future.result()
+    if aberto:
+        aberto[1].close()
+
+
+_router = None
+_router_lock = threading.Lock()
+
+
+def get_router() -> Router:
+    """
+    Returns the process-wide router over the configured providers.
+    """
+    global _router
+    if _router is None:
+        with _router_lock:
+            if _router is None:
+                _router = Router(available_providers())
+    return _router
@@ -0,0 +1,264 @@
+"""JSON response schemas for structured question generation."""
+
+# Import from standard library
+import functools
+import json
+
+import utils.config as config
+
+# Campos estruturados, na ordem em que são exibidos; são também as colunas
+# de questoes_gemini (sql/questoes_gemini_campos.sql)
+CAMPOS = [
+    "introducao",
+    "enunciado",
+    "codigo",
+    "alternativas",
+    "resposta_correta",
+    "explicacao",
+    "competencias_bncc",
+    "objetivos_bloom",
+]
+
+# Tipos com alternativas e tipos com um trecho de código no enunciado
+TIPOS_ALTERNATIVAS = {"Escolha Simples", "Escolha Múltipla", "Completar as Lacunas"}
+TIPOS_CODIGO = {
+    "Lógica - O que Faz",
+    "Lógica - Qual o Resultado",
+    "Lógica - Qual o Erro",
+}
+
+_TEXTO = {"type": "string"}
+
+PROPRIEDADES = {
+    "introducao": {**_TEXTO, "description": "Introdução ao conteúdo"},
+    "enunciado": {
+        **_TEXTO,
+        "description": "Enunciado da questão, incluindo tabelas e valores de entrada",
+    },
+    "codigo": {**_TEXTO, "description": "Código Python apresentado na questão"},
+    "alternativas": {
+        "type": "array",
+        "items": {
+            "type": "object",
+            "properties": {
+                "letra": _TEXTO,
+                "texto": _TEXTO,
+                "correta": {"type": "boolean"},
+                "justificativa": _TEXTO,
+            },
+            "required": ["letra", "texto", "correta"],
+        },
+    },
+    "resposta_correta": {**_TEXTO, "description": "Resposta correta"},
+    "explicacao": {**_TEXTO, "description": "Explicação da resposta"},
+    "competencias_bncc": {
+        "type": "array",
+        "items": {
+            "type": "object",
+            "properties": {
+                "numero": {"type": "integer"},
+                "titulo": _TEXTO,
+                "relacao": {
+                    **_TEXTO,
+                    "description": "Como a questão se relaciona com a competência",
+                },
+            },
+            "required": ["numero", "titulo", "relacao"],
+        },
+    },
+    "objetivos_bloom": {
+        "type": "array",
+        "items": {
+            "type": "object",
+            "properties": {
+                "nivel": {**_TEXTO, "description": "Nível da taxonomia de Bloom"},
+                "objetivo": _TEXTO,
+            },
+            "required": ["nivel", "objetivo"],
+        },
+    },
+}
+
+ROTULOS = {
+    "introducao": "Introdução",
+    "enunciado": "Enunciado",
+    "codigo": "Código",
+    "alternativas": "Alternativas",
+    "resposta_correta": "Resposta correta",
+    "explicacao": "Explicação",
+    "competencias_bncc": "Competências da BNCC",
+    "objetivos_bloom": "Objetivos de ensino (Bloom)",
+}
+
+
+def campos_do_tipo(tipo: str, tem_introducao: str, tem_resposta: str) -> list:
+    """
+    Returns the structured fields requested for a question type.
+    """
+    campos = ["enunciado", "competencias_bncc", "objetivos_bloom"]
+    if tem_introducao == "Sim":
+        campos.append("introducao")
+    if tipo in TIPOS_CODIGO:
+        campos.append("codigo")
+    if tipo in TIPOS_ALTERNATIVAS:
+        campos.append("alternativas")
+    if tem_resposta == "Sim":
+        campos += ["resposta_correta", "explicacao"]
+    return [campo for campo in CAMPOS if campo in campos]
+
+
+@functools.lru_cache(maxsize=64)
+def schema(tipo: str, tem_introducao: str = "Sim", tem_resposta: str = "Sim") -> dict:
+    """
+    Returns the JSON response schema of a question type (memoized; do not
+    modify the returned dict).
+    """
+    campos = campos_do_tipo(tipo, tem_introducao, tem_resposta)
+    return {
+        "type": "object",
+        "properties": {campo: PROPRIEDADES[campo] for campo in campos},
+        "required": campos,
+    }
+
+
+@functools.lru_cache(maxsize=64)
+def schema_lote(tipos: tuple, tem_introducao: str = "Sim", tem_resposta: str = "Sim"):
+    """
+    Returns the schema of a list of questions of the given types (see
+    prompts.render_lote): the fields of every type, plus the question number.
+    Only the fields common to all types are required.
+    """
+    campos = {
+        campo
+        for tipo in tipos
+        for campo in campos_do_tipo(tipo, tem_introducao, tem_resposta)
+    }
+    comuns = set.intersection(
+        *(set(campos_do_tipo(tipo, tem_introducao, tem_resposta)) for tipo in tipos)
+    )
+    return {
+        "type": "array",
+        "items": {
+            "type": "object",
+            "properties": {
+                "numero": {"type": "integer"},
+                **{campo: PROPRIEDADES[campo] for campo in CAMPOS if campo in campos},
+            },
+            "required": ["numero", *(campo for campo in CAMPOS if campo in comuns)],
+        },
+    }
+
+
+def generation_config(
+    tipo: str, tem_introducao: str = "Sim", tem_resposta: str = "Sim"
+) -> dict:
+    """
+    Returns config.generation_config asking Gemini for JSON in the schema of
+    the question type.
+    """
+    return {
+        **config.generation_config,
+        "response_mime_type": "application/json",
+        "response_schema": schema(tipo, tem_introducao, tem_resposta),
+    }
+
+
+def generation_config_lote(
+    tipos: tuple, tem_introducao: str = "Sim", tem_resposta: str = "Sim"
+) -> dict:
+    """
+    Same as generation_config() for a list of questions (see schema_lote()).
+    """
+    return {
+        **config.generation_config,
+        "response_mime_type": "application/json",
+        "response_schema": schema_lote(tipos, tem_introducao, tem_resposta),
+    }
+
+
+def _loads(texto: str):
+    texto = texto.strip()
+    if texto.startswith("```"):
+        texto = texto.strip("`").removeprefix("json").strip()
+    return json.loads(texto)
+
+
+def _campos(dados: dict) -> dict:
+    return {campo: dados[campo] for campo in CAMPOS if dados.get(campo) is not None}
+
+
+def parse(texto: str) -> dict:
+    """
+    Parses a structured response into {campo: valor} with only the known
+    fields. Raises ValueError when the text is not a JSON object.
+    """
+    dados = _loads(texto)
+    if not isinstance(dados, dict):
+        raise ValueError("structured response is not a JSON object")
+    return _campos(dados)
+
+
+def parse_lote(texto: str, total: int) -> list:
+    """
+    Splits a list response (see schema_lote()) into `total` questions, placed
+    by their "numero" (1-based) or, when it is missing or invalid, by their
+    position. Questions missing from the response, or without a statement,
+    are None. Raises ValueError when the text is not a JSON list.
+    """
+    dados = _loads(texto)
+    if not isinstance(dados, list):
+        raise ValueError("structured response is not a JSON list")
+    questoes = [None] * total
+    for posicao, item in enumerate(dados):
+        if not isinstance(item, dict) or not item.get("enunciado"):
+            continue
+        numero = item.get("numero")
+        idx = numero - 1 if isinstance(numero, int) else posicao
+        if not 0 <= idx < total or questoes[idx] is not None:
+            idx = posicao
+        if 0 <= idx < total and questoes[idx] is None:
+            questoes[idx] = _campos(item)
+    return questoes
+
+
+def format_alternativas(alternativas: list) -> str:
+    return "\n".join(f"{a['letra']}) {a['texto']}" for a in alternativas or [])
+
+
+def format_campo(campo: str, valor) -> str:
+    """
+    Returns the text of one structured field, as shown to the user.
+    """
+    if campo == "alternativas":
+        return format_alternativas(valor)
+    if campo == "competencias_bncc":
+        return "\n".join(
+            f"Competência {c['numero']}. {c['titulo']} - {c['relacao']}" for c in valor
+        )
+    if campo == "objetivos_bloom":
+        return "\n".join(f"- {o['objetivo']} ({o['nivel']})" for o in valor)
+    return str(valor)
+
+
+def render(campos: dict, markdown: bool = True) -> str:
+    """
+    Returns the question text built from its structured fields (stored in
+    the resultado column, so every page keeps working with free text).
+    With markdown=False the section titles are plain text (for the slides).
+    """
+
+    def titulo(rotulo):
+        return f"**{rotulo}**" if markdown else f"{rotulo}:"
+
+    secoes = []
+    for campo in CAMPOS:
+        valor = campos.get(campo)
+        if valor:
+            secoes.append(f"{titulo(ROTULOS[campo])}\n{format_campo(campo, valor)}")
+        if campo == "explicacao":
+            secoes += [
+                f"{titulo('Justificativa ' + a['letra'] + ')')}\n{a['justificativa']}"
+                for a in campos.get("alternativas") or []
+                if a.get("justificativa")
+            ]
+    return "\n\n".join(secoes)
@@ -0,0 +1,152 @@
+"""Full-text search over the question bank."""
+
+# Import from standard library
+import re
+import sqlite3
+import threading
+
+import utils.config as config
+from utils import sync
+
+COLUNAS = ["resultado", "prompt", "area", "tipo", "nivel"]
+# Pesos do bm25 por coluna, na ordem de COLUNAS
+PESOS = (1.0, 0.5, 2.0, 2.0, 2.0)
+# Palavras frequentes demais para filtrar ou ordenar (estão em quase todas as
+# questões e o bm25 percorre a lista inteira de cada termo)
+STOPWORDS = set("""a ao aos as com como da das de do dos e em na nas no nos o os ou para
+    pela pelas pelo pelos por que se sem sua suas seu seus um uma uns umas""".split())
+
+
+def build_query(texto: str) -> str:
+    """
+    Returns the FTS5 query matching every word of the text but the
+    stopwords, the last one as a prefix (so results follow the typing), or
+    "" when it has no words.
+    """
+    termos = re.findall(r"\w+", texto or "")
+    termos = [t for t in termos if t.lower() not in STOPWORDS] or termos
+    if not termos:
+        return ""
+    return " ".join([*(f'"{t}"' for t in termos[:-1]), f'"{termos[-1]}"*'])
+
+
+class SearchIndex:
+    """SQLite FTS5 mirror of questoes_gemini.
+    The unicode61 tokenizer with remove_diacritics folds case and accents,
+    so "funcao" finds "Função"; results are ranked with bm25. The mirror
+    follows the changes applied by utils.sync and is held in memory unless
+    `path` names a database file.
+    """
+
+    def __init__(self, path: str = ":memory:", rank_limit: int = 10000):
+        self.path = path
+        self.rank_limit = rank_limit
+        self.loaded = False
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(f"""CREATE VIRTUAL TABLE IF NOT EXISTS questoes USING fts5(
+                {", ".join(COLUNAS)},
+                tokenize = 'unicode61 remove_diacritics 2',
+                prefix = '2 3'
+            )""")
+        self._conn.commit()
+
+    def _upsert(self, rows: list):
+        for row in rows:
+            if not all(coluna in row for coluna in COLUNAS):
+                # Atualização parcial: completa com os valores indexados
+                atual = self._conn.execute(
+                    f"SELECT {', '.join(COLUNAS)} FROM questoes WHERE rowid = ?",
+                    (row["id"],),
+                ).fetchone()
+                if atual is None:
+                    continue
+                row = {**dict(zip(COLUNAS, atual)), **row}
+            self._conn.execute("DELETE FROM questoes WHERE rowid = ?", (row["id"],))
+            self._conn.execute(
+                f"INSERT INTO questoes (rowid, {', '.join(COLUNAS)}) "
+                f"VALUES (?, {', '.join('?' * len(COLUNAS))})",
+                (row["id"], *(row.get(coluna) for coluna in COLUNAS)),
+            )
+
+    def on_change(self, event: str, rows: list):
+        """
+        utils.sync listener keeping the mirror in step with applied changes.
+        """
+        with self._lock:
+            if event == "load":
+                self._conn.execute("DELETE FROM questoes")
+                self._conn.executemany(
+                    f"INSERT INTO questoes (rowid, {', '.join(COLUNAS)}) "
+                    f"VALUES (?, {', '.join('?' * len(COLUNAS))})",
+                    [
+                        (row["id"], *(row.get(coluna) for coluna in COLUNAS))
+                        for row in rows
+                    ],
+                )
+                # Junta os segmentos do índice: consultas mais rápidas
+                self._conn.execute("INSERT INTO questoes(questoes) VALUES ('optimize')")
+                self.loaded = True
+            elif event == "delete":
+                self._conn.executemany(
+                    "DELETE FROM questoes WHERE rowid = ?",
+                    [(row["id"],) for row in rows],
+                )
+            else:
+                self._upsert(rows)
+            self._conn.commit()
+
+    def warmup(self):
+        """
+        Starts loading the mirror behind the index, or refreshing it when
+        stale, without waiting for it.
+        """
+        sync.questions.refresh_in_background()
+
+    def search(self, texto: str, offset: int = 0, limit: int = 15) -> tuple:
+        """
+        Returns a page of the questions matching the text, best first, as
+        dicts with id, area, tipo and nivel, and the number of matches. Only
+        the `rank_limit` most recent matches are ranked (and paged), so the
+        count is capped at that.
+        """
+        consulta = build_query(texto)
+        if not consulta:
+            return [], 0
+        with self._lock:
+            # Contagem limitada ao que é ordenado e paginado
+            total = self._conn.execute(
+                """SELECT count(*) FROM (
+                    SELECT rowid FROM questoes WHERE questoes MATCH ? LIMIT ?
+                )""",
+                (consulta, self.rank_limit),
+            ).fetchone()[0]
+            # O bm25 é calculado para cada resultado: consultas muito amplas
+            # são ordenadas entre os RANK_LIMIT resultados mais recentes
+            ids = [
+                id
+                for (id,) in self._conn.execute(
+                    f"""SELECT id FROM (
+                        SELECT rowid AS id,
+                            bm25(questoes, {", ".join(map(str, PESOS))}) AS nota
+                        FROM questoes WHERE questoes MATCH ?
+                        ORDER BY rowid DESC LIMIT ?
+                    ) ORDER BY nota, id DESC LIMIT ? OFFSET ?""",
+                    (consulta, self.rank_limit, limit, offset),
+                )
+            ]
+            # As colunas exibidas só são lidas para a página de resultados
+            linhas = {
+                id: {"id": id, "area": area, "tipo": tipo, "nivel": nivel}
+                for id, area, tipo, nivel in self._conn.execute(
+                    "SELECT rowid, area, tipo, nivel FROM questoes "
+                    f"WHERE rowid IN ({', '.join('?' * len(ids))})",
+                    ids,
+                )
+            }
+        return [linhas[id] for id in ids if id in linhas], total
+
+
+# Um índice por processo, alimentado pelo espelho de utils.sync
+index = SearchIndex(config.SEARCH_PATH, config.SEARCH_RANK_LIMIT)
+sync.questions.add_listener(index.on_change)
@@ -0,0 +1,148 @@
+"""Aggregated question counts for the Dashboard."""
+
+# Import from standard library
+import logging
+import threading
+from collections import Counter
+
+# Import from 3rd party libraries
+import pandas as pd
+
+import utils.config as config
+from utils import database, sync
+
+DIMENSIONS = ("area", "tipo", "nivel", "dia")
+
+
+def _dims(row: dict) -> dict:
+    created_at = row.get("created_at")
+    return {
+        "area": row.get("area"),
+        "tipo": row.get("tipo"),
+        "nivel": row.get("nivel"),
+        "dia": created_at[:10] if created_at else None,
+    }
+
+
+class QuestionCounts:
+    """Rollup of question counts by area, tipo, nivel and creation day.
+    load() asks the database for pre-aggregated counts (the questoes_contagens
+    function or, when it is missing, one count query per known value and the
+    days counted from the creation dates). Between
+    loads the rollup follows the changes applied by utils.sync; a change it
+    cannot account for (e.g. deleting a row it never saw) marks it stale, so
+    the next read aggregates on the server again.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = None
+        self._known = {}
+        self.stale = True
+
+    def load(self):
+        """
+        Fetches the aggregated counts from the database.
+        """
+        try:
+            rows = database.count_by_dimension()
+        except Exception as e:
+            logging.warning(f"questoes_contagens unavailable, using count queries: {e}")
+            rows = self._count_queries()
+        counts = {dim: Counter() for dim in DIMENSIONS}
+        for row in rows:
+            if row["valor"] is not None:
+                counts[row["dimensao"]][row["valor"]] += row["contagem"]
+        with self._lock:
+            self._counts = counts
+            self.stale = False
+
+    @staticmethod
+    def _count_queries() -> list[dict]:
+        valores = {
+            "area": config.QST_AREAS,
+            "tipo": config.QST_TIPOS,
+            "nivel": config.QST_NIVEIS,
+        }
+        rows = [
+            {
+                "dimensao": dim,
+                "valor": valor,
+                "contagem": database.count_questions(**{dim: valor}),
+            }
+            for dim, lista in valores.items()
+            for valor in lista
+        ]
+        # Os dias não são conhecidos de antemão: conta a partir das datas
+        dias = Counter(
+            _dims(row)["dia"] for row in database.list_questions("id,created_at")
+        )
+        return rows + [
+            {"dimensao": "dia", "valor": dia, "contagem": contagem}
+            for dia, contagem in dias.items()
+        ]
+
+    def _add(self, dims: dict, delta: int):
+        if self._counts is None:
+            return
+        for dim, valor in dims.items():
+            if valor is not None:
+                self._counts[dim][valor] += delta
+                if self._counts[dim][valor] <= 0:
+                    del self._counts[dim][valor]
+
+    def on_change(self, event: str, rows: list):
+        """
+        utils.sync listener keeping the rollup in step with applied changes.
+        """
+        with self._lock:
+            if event == "load":
+                self._known = {row["id"]: _dims(row) for row in rows}
+                self._counts = {dim: Counter() for dim in DIMENSIONS}
+                for dims in self._known.values():
+                    self._add(dims, 1)
+                self.stale = False
+            elif event == "insert":
+                for row in rows:
+                    if row["id"] not in self._known:
+                        self._known[row["id"]] = _dims(row)
+                        self._add(self._known[row["id"]], 1)
+            elif event == "update":
+                for row in rows:
+                    old = self._known.get(row["id"])
+                    if old is None:
+                        self.stale = True
+                        continue
+                    new = {k: v for k, v in _dims(row).items() if v is not None}
+                    new = {**old, **new}
+                    self._add(old, -1)
+                    self._add(new, 1)
+                    self._known[row["id"]] = new
+            elif event == "delete":
+                for row in rows:
+                    old = self._known.pop(row["id"], None)
+                    if old is None and row.get("area") is not None:
+                        old = _dims(row)
+                        # Sem a data, a contagem por dia não pode ser corrigida
+                        if not row.get("created_at"):
+                            self.stale = True
+                    if old is None:
+                        self.stale = True
+                    else:
+                        self._add(old, -1)
+
+    def frame(self, dim: str) -> pd.DataFrame:
+        """
+        Returns the counts of one dimension as a DataFrame with the columns
+        [dim, "contagem_ids"], loading them from the database when stale.
+        """
+        if self.stale or self._counts is None:
+            self.load()
+        with self._lock:
+            items = sorted(self._counts[dim].items())
+        return pd.DataFrame(items, columns=[dim, "contagem_ids"])
+
+
+# Rollup compartilhado por todas as sessões do processo
+counts = QuestionCounts()
+sync.questions.add_listener(counts.on_change)
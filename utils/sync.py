@@ -0,0 +1,302 @@
+"""Incremental sync of the questoes_gemini table."""
+
+# Import from standard library
+import asyncio
+import logging
+import threading
+import time
+
+import utils.config as config
+from utils import database
+
+
+class QuestionSync:
+    """In-memory mirror of questoes_gemini kept up to date with deltas.
+    The first refresh downloads the table once; later refreshes only fetch the
+    rows above the id high-water mark and, when the table has an `updated_at`
+    column, the rows updated since the last one seen; refresh_in_background()
+    lets readers keep it fresh without waiting. Writes made by the app
+    are applied locally (apply_insert/apply_update/apply_delete) and remote
+    changes can be pushed by a Supabase Realtime subscription (subscribe()).
+    Listeners registered with add_listener() receive every applied change,
+    including the app's own writes made before the mirror is loaded.
+    The mirror lock is only held to read or swap the rows: fetches run
+    without it and listeners are called from an ordered queue outside it.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._rows = None
+        self._max_id = 0
+        self._max_updated_at = None
+        self._listeners = []
+        # Eventos na ordem em que foram aplicados, entregues por _drain()
+        self._events = []
+        self._notify_lock = threading.Lock()
+        # Escritas locais feitas durante uma busca, reaplicadas sobre ela
+        self._pending = None
+        # Uma atualização por vez, sem segurar o lock do espelho
+        self._fetch_lock = threading.Lock()
+        self._refreshed_at = None
+        self._refreshing = False
+        # Lock próprio: quem pede a atualização não espera a que está rodando
+        self._refresh_lock = threading.Lock()
+        self.subscribed = False
+
+    @property
+    def loaded(self) -> bool:
+        return self._rows is not None
+
+    def add_listener(self, callback):
+        """
+        Registers callback(event, rows), called for every applied change with
+        event "load" (full snapshot), "insert", "update" or "delete". Updated
+        rows are the merged new rows; deleted rows carry at least the id.
+        """
+        with self._lock:
+            self._listeners.append(callback)
+            rows = list(self._rows.values()) if self._rows is not None else None
+        if rows is not None:
+            callback("load", rows)
+
+    def _notify(self, event: str, rows: list):
+        # Chamado com o lock do espelho: só enfileira
+        if rows or event == "load":
+            self._events.append((event, rows))
+
+    def _drain(self):
+        # Um único thread entrega a fila; os demais voltam na hora e o que
+        # enfileiraram é entregue por ele, na mesma ordem
+        while True:
+            if not self._notify_lock.acquire(blocking=False):
+                return
+            try:
+                while True:
+                    with self._lock:
+                        events, self._events = self._events, []
+                        listeners = list(self._listeners)
+                    if not events:
+                        break
+                    for event, rows in events:
+                        for callback in listeners:
+                            try:
+                                callback(event, rows)
+                            except Exception as e:
+                                logging.error(f"Sync listener failed: {e}")
+            finally:
+                self._notify_lock.release()
+            with self._lock:
+                if not self._events:
+                    return
+
+    def _track(self, rows: list):
+        for row in rows:
+            self._max_id = max(self._max_id, row["id"])
+            updated_at = row.get("updated_at")
+            if updated_at and (
+                self._max_updated_at is None or updated_at > self._max_updated_at
+            ):
+                self._max_updated_at = updated_at
+
+    def refresh(self, reconcile: bool = None):
+        """
+        Fetches the rows changed since the last refresh (the whole table on the
+        first call). Unless a change feed is active, deletions made outside
+        this process are detected by comparing the id list, which is only
+        downloaded when the table count differs from the mirror size.
+        """
+        if reconcile is None:
+            reconcile = not self.subscribed
+        with self._fetch_lock:
+            with self._lock:
+                loaded = self._rows is not None
+                max_id, max_updated_at = self._max_id, self._max_updated_at
+                self._pending = []
+            # A busca roda sem o lock: as escritas locais seguem normalmente
+            total = None
+            try:
+                if loaded:
+                    rows = database.list_questions_since(max_id, max_updated_at)
+                    if reconcile:
+                        total = database.count_questions()
+                else:
+                    rows = database.list_questions()
+            except Exception:
+                with self._lock:
+                    self._pending = None
+                raise
+            with self._lock:
+                pending, self._pending = self._pending, None
+                if loaded:
+                    self._apply(rows, [])
+                else:
+                    self._rows = {row["id"]: row for row in rows}
+                self._track(rows)
+                self._replay(pending, loaded)
+                if not loaded:
+                    self._notify("load", list(self._rows.values()))
+                diverge = total is not None and total != len(self._rows)
+            self._drain()
+            if diverge:
+                self._reconcile()
+            self._refreshed_at = time.monotonic()
+
+    def _replay(self, pending: list, loaded: bool):
+        # Escritas locais feitas durante a busca valem sobre o que veio dela
+        for id, row in pending:
+            if loaded:
+                self._apply([row] if row else [], [] if row else [id])
+            elif row is None:
+                self._rows.pop(id, None)
+            else:
+                self._rows[id] = {**self._rows.get(id, {}), **row}
+
+    def _reconcile(self):
+        ids = database.list_ids()
+        # Só o intervalo coberto pela lista conta como apagado; os ids acima
+        # do último listado são conferidos um a um
+        coberto = max(ids, default=0)
+        vivos = set(ids)
+        with self._lock:
+            ausentes = [id for id in self._rows if id not in vivos]
+        acima = [id for id in ausentes if id > coberto]
+        if acima:
+            vivos.update(
+                row["id"] for row in database.list_questions_by_ids(acima, "id")
+            )
+        with self._lock:
+            self._apply([], [id for id in ausentes if id not in vivos])
+        self._drain()
+
+    def refresh_in_background(self, max_age: float = None, before=None):
+        """
+        Refreshes in a background thread (loading the mirror on the first
+        call), unless a refresh is running or the last one finished less than
+        `max_age` seconds ago. `before`, when given, is called first in the
+        same thread. The indexes fed by the mirror warm up through this.
+        """
+        max_age = config.SYNC_MAX_AGE if max_age is None else max_age
+        with self._refresh_lock:
+            recente = (
+                self._refreshed_at is not None
+                and time.monotonic() - self._refreshed_at < max_age
+            )
+            if self._refreshing or recente:
+                return
+            self._refreshing = True
+
+        def _run():
+            try:
+                if before is not None:
+                    before()
+                self.refresh()
+            except Exception as e:
+                logging.error(f"Could not refresh the question mirror: {e}")
+            finally:
+                self._refreshing = False
+
+        threading.Thread(target=_run, daemon=True).start()
+
+    def _apply(self, upserted: list, deleted: list):
+        inserted, updated, removed = [], [], []
+        for row in upserted:
+            old = self._rows.get(row["id"])
+            if old is None:
+                inserted.append(row)
+            else:
+                row = {**old, **row}
+                updated.append(row)
+            self._rows[row["id"]] = row
+        for id in deleted:
+            old = self._rows.pop(id, None)
+            if old is not None:
+                removed.append(old)
+        self._notify("insert", inserted)
+        self._notify("update", updated)
+        self._notify("delete", removed)
+
+    def _write(self, upserted: list, deleted: list, event: str, rows: list):
+        # Escrita do próprio app: aplica no espelho (ou só avisa `event` com
+        # `rows`, se ainda não carregou) e guarda para reaplicar sobre uma
+        # busca em andamento
+        with self._lock:
+            if self._pending is not None:
+                self._pending.extend((row["id"], row) for row in upserted)
+                self._pending.extend((id, None) for id in deleted)
+            if self._rows is None:
+                self._notify(event, rows)
+            else:
+                self._apply(upserted, deleted)
+        self._drain()
+
+    def apply_insert(self, *rows):
+        self._write(list(rows), [], "insert", list(rows))
+
+    def apply_update(self, row: dict):
+        if not row:
+            return
+        self._write([row], [], "update", [row])
+
+    def apply_delete(self, id: int, row: dict = None):
+        self._write([], [id], "delete", [row or {"id": id}])
+
+    def get(self, id: int) -> dict:
+        """
+        Returns the mirrored row with the given id, or None when it is
+        missing or the mirror is not loaded.
+        """
+        with self._lock:
+            return self._rows.get(id) if self._rows is not None else None
+
+    def subscribe(self):
+        """
+        Subscribes to Supabase Realtime changes of the table in a background
+        event loop, so remote inserts, updates and deletes are applied as
+        they happen.
+        """
+        if self.subscribed:
+            return
+
+        def _run():
+            loop = asyncio.new_event_loop()
+            try:
+                loop.run_until_complete(self._listen())
+                loop.run_forever()
+            except Exception as e:
+                logging.error(f"Realtime subscription failed: {e}")
+                self.subscribed = False
+
+        self.subscribed = True
+        threading.Thread(target=_run, daemon=True).start()
+
+    async def _listen(self):
+        client = await database.get_async_client()
+        channel = client.channel(database.TABLE)
+        channel.on_postgres_changes(
+            "*", schema="public", table=database.TABLE, callback=self._on_change
+        )
+        await channel.subscribe()
+
+    def _on_change(self, payload: dict):
+        data = payload.get("data", payload)
+        event = (data.get("type") or data.get("eventType") or "").upper()
+        if event == "DELETE":
+            old = data.get("old_record") or data.get("old") or {}
+            if "id" in old:
+                self.apply_delete(old["id"])
+        elif event in ("INSERT", "UPDATE"):
+            record = data.get("record") or data.get("new")
+            if record:
+                with self._lock:
+                    if self._pending is not None:
+                        self._pending.append((record["id"], record))
+                    if self._rows is not None:
+                        self._apply([record], [])
+                        self._track([record])
+                self._drain()
+
+
+# Espelho compartilhado por todas as sessões do processo
+questions = QuestionSync()
+if config.SYNC_REALTIME:
+    questions.subscribe()
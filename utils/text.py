@@ -0,0 +1,62 @@
+"""Text normalization and hashing shared by the similarity indexes."""
+
+# Import from standard library
+import functools
+import re
+import unicodedata
+import zlib
+
+# Import from 3rd party libraries
+import numpy as np
+
+WORD = re.compile(r"\w+")
+# Multiplicador do hash das sequências (FNV-1 de 64 bits)
+_MULT = np.uint64(0x100000001B3)
+
+
+def fold(texto: str) -> str:
+    """
+    Returns the text in lower case and without accents.
+    """
+    texto = texto.lower()
+    if texto.isascii():
+        return texto
+    texto = unicodedata.normalize("NFKD", texto).encode("ascii", "ignore")
+    return texto.decode("ascii")
+
+
+def normalize(texto: str) -> list:
+    """
+    Returns the words of a text in lower case, without accents or punctuation.
+    """
+    return WORD.findall(fold(texto or ""))
+
+
+@functools.lru_cache(maxsize=100000)
+def word_code(palavra: str) -> int:
+    """
+    Returns the hash of a word after fold() (cached: the vocabulary repeats
+    a lot).
+    """
+    return zlib.crc32(fold(palavra).encode("utf-8"))
+
+
+def word_codes(palavras: list) -> np.ndarray:
+    """
+    Returns the word_code() of each word as a uint64 array.
+    """
+    return np.fromiter(map(word_code, palavras), dtype=np.uint64, count=len(palavras))
+
+
+def window_hashes(codigos: np.ndarray, k: int) -> np.ndarray:
+    """
+    Returns the hash of each window of k consecutive codes (none when there
+    are fewer than k codes, or no codes at all).
+    """
+    total = len(codigos) - k + 1
+    if total <= 0 or not len(codigos):
+        return np.empty(0, np.uint64)
+    hashes = np.zeros(total, dtype=np.uint64)
+    for j in range(k):
+        hashes = hashes * _MULT + codigos[j : j + total]
+    return hashes ^ (hashes >> np.uint64(29))